@@ -1,25 +1,43 @@
 import os
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from datetime import timedelta
 
 load_dotenv()
 
+# Logging goes through a queue and a listener thread; configure it before the
+# routes and AI service are imported so their startup messages are captured
+from utils.logger import configure_logging, get_logging_stats
+configure_logging()
+
 app = Flask(__name__)
 
+# Bounded uploads: spooled multipart files, capped form fields, early 413
+from utils.uploads import UploadRequest, MAX_CONTENT_LENGTH
+app.request_class = UploadRequest
+
 # Configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///chat_app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
 # Initialize extensions
-from database import db
-db.init_app(app)
-jwt = JWTManager(app)
+from database import db, init_db
+from utils import metrics
+init_db(app)  # SQLITE_PROFILE=performance adds WAL and tuned pragmas/pool
+jwt = metrics.TimedJWTManager(app)
+
+# current_user is built from the token alone; chat ownership checks are cached per worker
+from utils.identity import init_identity, get_ownership_cache
+init_identity(jwt)
+
+# Per-stage timing histograms for /metrics (no hooks are installed unless METRICS_ENABLED=true)
+metrics.init_app(app, db)
 
 # Configure CORS - Simple and permissive for all origins
 CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -36,18 +54,37 @@ def after_request(response):
 from models import User, Message, ChatHistory
 
 # Routes
-from routes import auth_routes, chat_routes, message_routes
+from routes import auth_routes, chat_routes, message_routes, image_routes
+from utils.ai_executor import AIBusyError, get_executor_stats
+from utils.response_cache import get_response_cache
+from utils.similar_cache import get_similar_cache
+from utils.circuit_breaker import get_breaker_states
+from utils.image_pipeline import ImageTooLarge
+from utils.password_hasher import PasswordHasherBusy, get_password_hasher
 
 # Register blueprints
 app.register_blueprint(auth_routes.bp)
 app.register_blueprint(chat_routes.bp)
 app.register_blueprint(message_routes.bp)
+app.register_blueprint(image_routes.bp)
+
+# Schema bootstrap: run pending migrations once per process at startup instead of
+# on every request (workers booting together wait on a migration lock). Deploys that
+# run `flask migrate` up front can set AUTO_MIGRATE=false.
+from migrations import run_migrations, register_cli
+register_cli(app)
+
+# Buffered login_events writer and `flask prune-login-events`
+from utils import login_events
+login_events.init_app(app)
+
+# `flask rebuild-search-index` for the messages_fts full-text index
+from utils import search
+search.init_app(app)
 
-@app.before_request
-def before_request():
-    """Create tables before first request"""
+if os.getenv('AUTO_MIGRATE', 'true').lower() == 'true':
     with app.app_context():
-        db.create_all()
+        run_migrations(verbose=False)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -57,9 +94,47 @@ def health():
         'status': 'ok',
         'message': 'Flask AI Chat API is running',
         'gemini_ready': GEMINI_READY,
-        'api_key_exists': bool(os.getenv('GEMINI_API_KEY'))
+        'circuit_breakers': get_breaker_states(),
+        'api_key_exists': bool(os.getenv('GEMINI_API_KEY')),
+        'ai_execution': get_executor_stats(),
+        'response_cache': get_response_cache().stats(),
+        'similar_cache': get_similar_cache().stats(),
+        'chat_ownership': get_ownership_cache().stats(),
+        'password_hashing': get_password_hasher().stats(),
+        'login_events': login_events.get_login_event_writer().stats(),
+        'logging': get_logging_stats()
     }), 200
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint (404 unless METRICS_ENABLED=true)"""
+    if not metrics.is_enabled():
+        return jsonify({'error': 'Not found'}), 404
+    return metrics.render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.errorhandler(AIBusyError)
+def ai_busy(error):
+    response = jsonify({'error': 'AI service is busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    response = jsonify({'error': 'Too many sign-ins in progress, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({
+        'error': 'Upload too large',
+        'max_bytes': app.config['MAX_CONTENT_LENGTH']
+    }), 413
+
+@app.errorhandler(ImageTooLarge)
+def image_too_large(error):
+    return jsonify({'error': str(error)}), 413
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
@@ -0,0 +1 @@
+"""Offline benchmarks for the Flask API (no live server or API keys required)"""
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+Offline API benchmark suite with a results file for comparing commits
+
+Boots the app against a fresh SQLite database with the fake Gemini model
+(no network, no API key) and measures latency percentiles and throughput of
+the main endpoints under concurrent load:
+
+  register        POST /api/auth/register (a new user per request)
+  login           POST /api/auth/login
+  create_chat     POST /api/chat/create
+  send_message    POST /api/messages/<chat_id>/send (response cache off)
+  list_histories  GET  /api/chat/histories (user with --chats chats)
+  list_messages   GET  /api/messages/<chat_id>/messages (chat with --messages messages)
+
+Usage:
+    python benchmarks/bench_api.py [--requests 300] [--concurrency 8] [--output results.json]
+    python benchmarks/bench_api.py --compare baseline.json results.json [--threshold 0.15]
+
+Typical regression check:
+    git checkout main;   python benchmarks/bench_api.py -o /tmp/before.json
+    git checkout -;      python benchmarks/bench_api.py -o /tmp/after.json
+    python benchmarks/bench_api.py --compare /tmp/before.json /tmp/after.json
+
+--compare exits with status 1 if any scenario's p95 latency rose, or its
+throughput fell, by more than the threshold.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from common import load_app, auth_headers, summarize, print_stats, seed_messages
+from fake_llm import install_fake_gemini
+
+SCENARIOS = ['register', 'login', 'create_chat', 'send_message', 'list_histories', 'list_messages']
+
+
+def run_load(app, request_fn, concurrency, total):
+    """Call request_fn(client, i) `total` times over `concurrency` threads"""
+    def one_request(i):
+        client = app.test_client()
+        start = time.perf_counter()
+        status = request_fn(client, i)
+        return status, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total)))
+    elapsed = time.perf_counter() - start
+    ok = [ms for status, ms in results if status < 400]
+    stats = summarize(ok) if ok else {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    return {**stats, 'rps': len(ok) / elapsed, 'errors': total - len(ok)}
+
+
+def build_scenarios(app, args):
+    """Seed the database and return {name: request_fn(client, i) -> status}"""
+    client = app.test_client()
+    headers = auth_headers(client)
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+
+    for i in range(args.chats):
+        client.post('/api/chat/create', json={'title': f'seeded {i}'}, headers=headers)
+    history_chat = client.post('/api/chat/create', json={'title': 'history'}, headers=headers).get_json()['id']
+    seed_messages(app, history_chat, user_id, args.messages)
+    # One chat per worker thread so send_message's conversation context stays realistic
+    send_chats = [client.post('/api/chat/create', json={'title': f'send {i}'}, headers=headers).get_json()['id']
+                  for i in range(args.concurrency)]
+    new_user_ids = itertools.count()  # Warm-up and measured runs both need fresh usernames
+
+    def register(c, i):
+        n = next(new_user_ids)
+        return c.post('/api/auth/register', json={
+            'username': f'reg-{n}', 'email': f'reg-{n}@bench.local', 'password': 'bench-pass'
+        }).status_code
+
+    def login(c, i):
+        return c.post('/api/auth/login', json={'username': 'bench', 'password': 'bench-pass'}).status_code
+
+    def create_chat(c, i):
+        return c.post('/api/chat/create', json={'title': f'chat {i}'}, headers=headers).status_code
+
+    def send_message(c, i):
+        return c.post(f'/api/messages/{send_chats[i % len(send_chats)]}/send',
+                      json={'text': f'benchmark question {i}', 'cache': False}, headers=headers).status_code
+
+    def list_histories(c, i):
+        return c.get('/api/chat/histories', headers=headers).status_code
+
+    def list_messages(c, i):
+        return c.get(f'/api/messages/{history_chat}/messages', headers=headers).status_code
+
+    return {'register': register, 'login': login, 'create_chat': create_chat, 'send_message': send_message,
+            'list_histories': list_histories, 'list_messages': list_messages}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    app = load_app()
+    from utils.logger import configure_logging
+    configure_logging(level='WARNING')
+    install_fake_gemini(latency=args.llm_latency_ms / 1000, chunks=args.chunks,
+                        chunk_latency=args.chunk_latency_ms / 1000)
+    scenarios = build_scenarios(app, args)
+    selected = args.scenarios or SCENARIOS
+
+    results = {}
+    for name in selected:
+        request_fn = scenarios[name]
+        run_load(app, request_fn, args.concurrency, args.warmup)
+        results[name] = run_load(app, request_fn, args.concurrency, args.requests)
+        print_stats(name, results[name])
+        print(f"{'':<45} {results[name]['rps']:.1f} req/s, errors={results[name]['errors']}")
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'options': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+        'scenarios': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return report
+
+
+def compare(baseline_path, current_path, threshold):
+    """Print per-scenario deltas; returns True if any scenario regressed beyond threshold"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    print(f"{'scenario':<16} {'p95 before':>11} {'p95 after':>11} {'change':>8} "
+          f"{'rps before':>11} {'rps after':>10} {'change':>8}")
+    regressed = False
+    for name, after in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            print(f"{name:<16} (not in baseline)")
+            continue
+        p95_change = after['p95'] / before['p95'] - 1 if before['p95'] else 0.0
+        rps_change = after['rps'] / before['rps'] - 1 if before['rps'] else 0.0
+        flag = ''
+        if p95_change > threshold or rps_change < -threshold or after['errors'] > before['errors']:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"{name:<16} {before['p95']:>9.2f}ms {after['p95']:>9.2f}ms {p95_change:>+8.1%} "
+              f"{before['rps']:>11.1f} {after['rps']:>10.1f} {rps_change:>+8.1%}{flag}")
+    print(f"\nbaseline {baseline['meta'].get('revision')} vs current {current['meta'].get('revision')}, "
+          f"threshold {threshold:.0%}")
+    return regressed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', '-n', type=int, default=300, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per scenario')
+    parser.add_argument('--concurrency', '-c', type=int, default=8)
+    parser.add_argument('--llm-latency-ms', type=float, default=50, help='fake model time-to-first-token')
+    parser.add_argument('--chunks', type=int, default=4, help='chunks per fake model reply')
+    parser.add_argument('--chunk-latency-ms', type=float, default=5)
+    parser.add_argument('--chats', type=int, default=50, help='chats owned by the benchmark user')
+    parser.add_argument('--messages', type=int, default=2000, help='messages in the listed chat')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, help='subset to run (default: all)')
+    parser.add_argument('--output', '-o', help='write results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two results files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='relative p95/throughput change that counts as a regression')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    run_suite(args)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Load test: concurrent /api/chat throughput in sync vs async execution mode
+
+Runs the app on a local HTTP server backed by a slow fake LLM and fires
+concurrent requests at it:
+  sync  - single-threaded server, like one sync gunicorn worker
+  async - threaded server with AI_EXECUTION_MODE=async, like one gthread worker
+
+Usage:
+    python benchmarks/bench_async_mode.py [concurrency] [requests] [llm_latency_ms]
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from common import load_app, auth_headers, summarize, print_stats
+from fake_llm import install_fake_gemini
+
+
+def run_load(app, headers, threaded, concurrency, total):
+    server = make_server('127.0.0.1', 0, app, threaded=threaded)
+    url = f'http://127.0.0.1:{server.server_port}/api/chat'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def one_request(i):
+        start = time.perf_counter()
+        res = requests.post(url, json={'message': f'question {i}'}, headers=headers, timeout=300)
+        return res.status_code, (time.perf_counter() - start) * 1000
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one_request, range(total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    ok = [ms for status, ms in results if status == 200]
+    return {
+        'ok': len(ok),
+        'errors': total - len(ok),
+        'elapsed': elapsed,
+        'rps': total / elapsed,
+        'latency': summarize(ok or [0.0]),
+    }
+
+
+def main(concurrency=50, total=100, llm_latency_ms=100):
+    app = load_app()
+    from utils import ai_executor
+
+    install_fake_gemini(latency=llm_latency_ms / 1000)
+    headers = auth_headers(app.test_client())
+
+    results = {}
+    for mode in ('sync', 'async'):
+        ai_executor.AI_EXECUTION_MODE = mode
+        results[mode] = run_load(app, headers, threaded=(mode == 'async'),
+                                 concurrency=concurrency, total=total)
+
+    print("=" * 60)
+    print(f"Concurrent /api/chat load test: {total} requests, concurrency {concurrency}, "
+          f"fake LLM latency {llm_latency_ms}ms")
+    print("=" * 60)
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['rps']:8.1f} req/s  ({r['ok']} ok, {r['errors']} errors, {r['elapsed']:.2f}s)")
+        print_stats(f'  {mode} latency', r['latency'])
+    print(f"throughput gain: {results['async']['rps'] / results['sync']['rps']:.1f}x")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:4]]
+    main(*args)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Benchmark: N prompts as N POST /send requests vs one POST /send-batch
+
+Uses the fake Gemini model with a fixed latency and counts the SQL statements
+and commits each approach issues.
+
+Usage:
+    python benchmarks/bench_batch_send.py [prompts] [llm_latency_ms]
+"""
+import sys
+import time
+
+from sqlalchemy import event
+
+from common import load_app, auth_headers
+from fake_llm import install_fake_gemini
+
+
+def main(prompts=20, llm_latency_ms=200):
+    app = load_app()
+    from database import db
+    from utils.logger import configure_logging
+
+    configure_logging(level='WARNING')
+    install_fake_gemini(latency=llm_latency_ms / 1000)
+    client = app.test_client()
+    headers = auth_headers(client)
+    with app.app_context():
+        engine = db.engine
+
+    counts = {'statements': 0, 'commits': 0}
+
+    def on_statement(*args):
+        counts['statements'] += 1
+
+    def on_commit(conn):
+        counts['commits'] += 1
+
+    event.listen(engine, 'before_cursor_execute', on_statement)
+    event.listen(engine, 'commit', on_commit)
+
+    def run(label, send):
+        chat_id = client.post('/api/chat/create', json={'title': label}, headers=headers).get_json()['id']
+        counts.update(statements=0, commits=0)
+        start = time.perf_counter()
+        send(chat_id)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<28} {elapsed * 1000:>8.0f}ms  {counts['statements']:>4} statements  "
+              f"{counts['commits']:>3} commits")
+        return elapsed
+
+    def one_by_one(chat_id):
+        for i in range(prompts):
+            res = client.post(f'/api/messages/{chat_id}/send', headers=headers,
+                              json={'text': f'question {i}', 'cache': False})
+            assert res.status_code == 201
+
+    def batched(chat_id):
+        res = client.post(f'/api/messages/{chat_id}/send-batch', headers=headers,
+                          json={'messages': [f'question {i}' for i in range(prompts)], 'cache': False})
+        assert res.get_json()['succeeded'] == prompts
+
+    print("=" * 60)
+    print(f"{prompts} prompts, fake LLM latency {llm_latency_ms}ms")
+    print("=" * 60)
+    sequential = run(f'{prompts} x POST /send', one_by_one)
+    batch = run('1 x POST /send-batch', batched)
+    print(f"\nSpeedup: {sequential / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 200)
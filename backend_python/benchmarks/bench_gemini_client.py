@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: per-call overhead of the Gemini client with a fake transport
+
+Compares the old behaviour (genai.configure + new GenerativeModel on every
+call, which also throws away the SDK's cached client channel) against the
+cached per-worker model registry.
+
+Usage:
+    python benchmarks/bench_gemini_client.py [iterations] [connect_ms]
+"""
+import sys
+import io
+import contextlib
+import common  # noqa: F401  (sets up sys.path)
+from common import measure, print_stats
+from fake_llm import install_fake_gemini
+
+
+def main(iterations=2000, connect_ms=2.0):
+    from utils import ai_service
+
+    fake = install_fake_gemini(connect_latency=connect_ms / 1000)
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    def legacy_call():
+        fake.configure(api_key='fake')
+        model = fake.GenerativeModel(ai_service.DEFAULT_GEMINI_MODEL)
+        model.generate_content('hello')
+
+    def cached_call():
+        with quiet:
+            ai_service.call_gemini_api('hello')
+
+    legacy = measure(legacy_call, iterations)
+    connections_before = fake.connections
+    cached = measure(cached_call, iterations)
+
+    print("=" * 60)
+    print(f"Gemini client overhead (fake transport, simulated connect={connect_ms}ms)")
+    print("=" * 60)
+    print_stats('configure + new model per call', legacy)
+    print_stats('cached model registry', cached)
+    print(f"new channels opened by cached path: {fake.connections - connections_before}")
+    print(f"speedup: {legacy['mean'] / cached['mean']:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 2.0)
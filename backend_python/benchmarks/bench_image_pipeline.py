@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark: preparing uploaded images for Gemini, old path vs image pipeline
+
+BEFORE  upload bytes -> base64 -> decode -> PIL at native resolution -> what the
+        SDK does with a PIL image (lossless WebP re-encode)
+AFTER   upload bytes -> prepare_image (draft/thumbnail, metadata stripped,
+        JPEG/PNG re-encode), first call and cached call
+
+Reports time, peak Python memory and bytes sent to the model per image.
+Without arguments a set of large synthetic JPEG/PNG files is generated.
+
+Usage:
+    python benchmarks/bench_image_pipeline.py [iterations] [image files...]
+"""
+import base64
+import io
+import os
+import sys
+import time
+import tracemalloc
+from common import BACKEND_DIR, summarize, print_stats  # noqa: F401  (puts the backend on sys.path)
+
+
+def synthetic_images():
+    """Photo-like large images: smooth gradients plus noise, so they don't compress to nothing"""
+    from PIL import Image, ImageFilter
+
+    def photo(size):
+        noise = Image.effect_noise(size, 64).convert('RGB')
+        gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+        return Image.blend(noise.filter(ImageFilter.GaussianBlur(2)), gradient, 0.5)
+
+    samples = []
+    for name, size, fmt in (('photo_12mp.jpg', (4000, 3000), 'JPEG'),
+                            ('photo_8mp.jpg', (3264, 2448), 'JPEG'),
+                            ('screenshot_4k.png', (3840, 2160), 'PNG'),
+                            ('diagram_alpha.png', (2400, 2400), 'PNG')):
+        image = photo(size)
+        if name == 'diagram_alpha.png':
+            image.putalpha(Image.linear_gradient('L').resize(size))
+        out = io.BytesIO()
+        image.save(out, format=fmt, **({'quality': 92} if fmt == 'JPEG' else {}))
+        samples.append((name, out.getvalue()))
+    return samples
+
+
+def legacy_prepare(raw):
+    """The old path: base64 round trip, full-resolution decode, SDK lossless WebP blob"""
+    from PIL import Image
+    image_data = base64.b64encode(raw).decode('utf-8')
+    image = Image.open(io.BytesIO(base64.b64decode(image_data)))
+    out = io.BytesIO()
+    image.save(out, format='webp', lossless=True)
+    return out.getvalue()
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, (peak - baseline) / 1024 / 1024
+
+
+def main(iterations=5, paths=()):
+    from utils import image_pipeline
+
+    samples = [(os.path.basename(p), open(p, 'rb').read()) for p in paths] or synthetic_images()
+
+    print("=" * 60)
+    print(f"Image pipeline benchmark (max side {image_pipeline.IMAGE_MAX_SIDE}px)")
+    print("=" * 60)
+    for name, raw in samples:
+        before_bytes, before_mem = peak_memory(lambda: legacy_prepare(raw))
+        image_pipeline._cache.clear()
+        after, after_mem = peak_memory(lambda: image_pipeline.prepare_image(raw))
+
+        def uncached():
+            image_pipeline._cache.clear()
+            image_pipeline.prepare_image(raw)
+
+        before = timed(lambda: legacy_prepare(raw), iterations)
+        cold = timed(uncached, iterations)
+        warm = timed(lambda: image_pipeline.prepare_image(raw), iterations * 10)
+
+        print(f"\n{name}: {len(raw) / 1024:.0f} KiB upload")
+        print_stats('  BEFORE base64 + native PIL + WebP', before)
+        print_stats('  AFTER  prepare_image (cold)', cold)
+        print_stats('  AFTER  prepare_image (cached)', warm)
+        print(f"  Sent to model: {len(before_bytes) / 1024:.0f} KiB -> {len(after.data) / 1024:.0f} KiB "
+              f"({after.mime_type}, {after.size[0]}x{after.size[1]})")
+        print(f"  Peak Python memory: {before_mem:.1f} MiB -> {after_mem:.1f} MiB")
+        print(f"  Speedup: {before['mean'] / cold['mean']:.1f}x cold")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5, sys.argv[2:])
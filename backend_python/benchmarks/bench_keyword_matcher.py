@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark: knowledge base lookup, linear substring scan vs indexed PhraseMatcher
+
+Matches 10k synthetic prompts against a 5k-entry knowledge base and reports
+throughput plus how many substring false positives the old scan produced.
+
+Usage:
+    python benchmarks/bench_keyword_matcher.py [entries] [prompts]
+"""
+import random
+import sys
+import time
+import common  # noqa: F401  (sets up sys.path)
+from utils.keyword_matcher import PhraseMatcher
+
+WORDS = ("how do i build a rapid prototype with this framework what is the best way to deploy "
+         "my app explain hooks state props and thinking about performance tuning in production "
+         "why does history matter when debugging apis react python css security").split()
+
+
+def build_knowledge_base(entries, rng):
+    kb = {}
+    for word in ('react', 'javascript', 'css', 'api', 'security', 'python'):
+        kb[word] = f'answer about {word}'
+    while len(kb) < entries:
+        n = rng.choice((1, 1, 2))
+        keyword = ' '.join(f"topic{rng.randrange(entries * 4)}" for _ in range(n))
+        kb[keyword] = f'answer about {keyword}'
+    return kb
+
+
+def build_prompts(kb, count, rng):
+    keywords = list(kb)
+    prompts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(6, 30))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        prompts.append(' '.join(words))
+    return prompts
+
+
+def legacy_match(kb, text):
+    lower = text.lower()
+    for keyword, content in kb.items():
+        if keyword in lower:
+            return keyword
+    return None
+
+
+def main(entries=5000, prompts_count=10000):
+    rng = random.Random(42)
+    kb = build_knowledge_base(entries, rng)
+    prompts = build_prompts(kb, prompts_count, rng)
+
+    start = time.perf_counter()
+    matcher = PhraseMatcher(kb.items())
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    legacy = [legacy_match(kb, p) for p in prompts]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [matcher.find(p) for p in prompts]
+    indexed_s = time.perf_counter() - start
+
+    false_positives = sum(
+        1 for old, new in zip(legacy, indexed) if old is not None and (new is None or new[0] != old)
+    )
+
+    print("=" * 60)
+    print(f"Knowledge base lookup: {len(kb)} entries, {len(prompts)} prompts")
+    print("=" * 60)
+    print(f"matcher build time:        {build_ms:.1f}ms (once at import)")
+    print(f"linear substring scan:     {legacy_s:.3f}s  ({len(prompts) / legacy_s:,.0f} prompts/s)")
+    print(f"indexed phrase matcher:    {indexed_s:.3f}s  ({len(prompts) / indexed_s:,.0f} prompts/s)")
+    print(f"speedup:                   {legacy_s / indexed_s:.2f}x")
+    print(f"substring-only matches removed (e.g. 'api' in 'rapid'): {false_positives}")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark: /api/chat throughput under different logging setups
+
+Log output goes to a pipe drained by a reader thread, like a gunicorn
+worker's stdout/stderr. Scenarios:
+  sync DEBUG   every debug line formatted and written on the request thread
+               (closest to the old print() statements)
+  queue DEBUG  same records, formatted and written on the listener thread
+  queue INFO   debug logging disabled (the default)
+
+Usage:
+    python benchmarks/bench_logging.py [concurrency] [requests]
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import load_app, auth_headers, summarize, print_stats
+from fake_llm import install_fake_gemini
+
+
+def log_pipe():
+    """Writable text stream whose other end is drained by a background thread"""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, 'rb') as reader:
+            while reader.read(65536):
+                pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, 'w', buffering=1)
+
+
+def run_load(app, headers, concurrency, total):
+    def one_request(i):
+        client = app.test_client()
+        start = time.perf_counter()
+        res = client.post('/api/chat', json={'message': f'question {i}', 'cache': False}, headers=headers)
+        return res.status_code, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total)))
+    elapsed = time.perf_counter() - start
+    ok = [ms for status, ms in results if status == 200]
+    return {'rps': len(ok) / elapsed, 'errors': total - len(ok), 'latency': summarize(ok)}
+
+
+def main(concurrency=8, total=2000):
+    app = load_app()
+    from utils.logger import configure_logging, shutdown_logging
+
+    install_fake_gemini()
+    headers = auth_headers(app.test_client())
+    stream = log_pipe()
+
+    scenarios = [
+        ('sync DEBUG (print-style)', dict(level='DEBUG', use_queue=False)),
+        ('queue DEBUG', dict(level='DEBUG', use_queue=True)),
+        ('queue INFO (debug disabled)', dict(level='INFO', use_queue=True)),
+    ]
+    results = {}
+    for label, options in scenarios:
+        configure_logging(stream=stream, **options)
+        run_load(app, headers, concurrency, 100)  # warm-up
+        results[label] = run_load(app, headers, concurrency, total)
+        shutdown_logging()
+
+    print("=" * 60)
+    print(f"Logging benchmark ({total} requests, concurrency {concurrency})")
+    print("=" * 60)
+    baseline = results[scenarios[0][0]]['rps']
+    for label, result in results.items():
+        print_stats(label, result['latency'])
+        print(f"{'':<45} {result['rps']:.0f} req/s ({result['rps'] / baseline:.2f}x), errors={result['errors']}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark: recording OAuth logins, JSON blob on the user row vs login_events
+
+"Before" replays the old callback body (read users.login_history, json.loads,
+append, keep 50, json.dumps, commit) from concurrent threads for one user;
+"after" records the same logins through the buffered login_events writer.
+Reports per-login latency and how many logins actually ended up in the history
+(read-modify-write loses concurrent appends), then the cost of reading a page
+of history for a user with many events.
+
+Usage:
+    python benchmarks/bench_login_events.py [logins] [concurrency] [history_events]
+"""
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from common import load_app, auth_headers, measure, summarize, print_stats
+
+
+def run_concurrent(fn, total, concurrency):
+    def timed(i):
+        start = time.perf_counter()
+        fn(i)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return summarize(list(pool.map(timed, range(total))))
+
+
+def main(logins=400, concurrency=8, history_events=50_000):
+    app = load_app()
+    from database import db
+    from models import User, LoginEvent
+    from utils.login_events import get_login_event_writer
+    from utils.logger import configure_logging
+
+    configure_logging(level='WARNING')
+    client = app.test_client()
+    headers = auth_headers(client)
+    with app.app_context():
+        user_id = User.query.filter_by(username='bench').first().id
+
+    def legacy_record(i):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            entry = {'provider': 'google', 'timestamp': datetime.utcnow().isoformat(), 'user_agent': f'agent {i}'}
+            history = json.loads(user.login_history) if user.login_history else []
+            history.append(entry)
+            user.login_history = json.dumps(history[-50:])
+            db.session.commit()
+
+    writer = get_login_event_writer()
+
+    def buffered_record(i):
+        writer.record(user_id, 'google', f'agent {i}')
+
+    print("=" * 60)
+    print(f"{logins} logins for one user from {concurrency} threads")
+    print("=" * 60)
+    before = run_concurrent(legacy_record, logins, concurrency)
+    print_stats('BEFORE JSON blob read-modify-write', before)
+    # Under the 50-entry cap every login should survive; races drop some anyway
+    with app.app_context():
+        db.session.get(User, user_id).login_history = None
+        db.session.commit()
+    run_concurrent(legacy_record, 50, concurrency)
+    with app.app_context():
+        kept = len(json.loads(db.session.get(User, user_id).login_history))
+    print(f"{'':<45} {kept} of 50 concurrent logins kept")
+
+    after = run_concurrent(buffered_record, logins, concurrency)
+    writer.flush()
+    with app.app_context():
+        stored = LoginEvent.query.filter_by(user_id=user_id).count()
+    print_stats('AFTER  login_events (buffered)', after)
+    print(f"{'':<45} {stored} of {logins} logins stored")
+
+    start = datetime.utcnow() - timedelta(seconds=history_events)
+    with app.app_context():
+        db.session.execute(LoginEvent.__table__.insert(), [
+            {'user_id': user_id, 'provider': 'github', 'user_agent': 'seeded',
+             'timestamp': start + timedelta(seconds=i)} for i in range(history_events)])
+        db.session.commit()
+
+    def first_page():
+        return client.get('/api/auth/login-history/bench?limit=50', headers=headers).get_data()
+
+    print(f"\nHistory page (50 of {history_events + stored} events)")
+    print_stats('GET /api/auth/login-history/<username>', measure(first_page, 200))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:4]))
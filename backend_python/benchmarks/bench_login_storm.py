@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark: chat latency while a burst of logins is being verified
+
+Reader threads poll a chat's messages and the chat sidebar while login threads
+sign in as fast as they can (think: every client re-authenticating after a
+deploy). Compared modes, each in a fresh process since the hasher is
+configured at import:
+
+  no logins   chat traffic alone
+  inline      PASSWORD_HASH_WORKERS=0: hashes on the request threads
+  pool        PASSWORD_HASH_WORKERS=1 (niced): hashes in a bounded process pool,
+              logins past PASSWORD_HASH_MAX_PENDING get 503
+
+Usage:
+    python benchmarks/bench_login_storm.py [login_threads] [seconds]
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from common import load_app, auth_headers, summarize, print_stats, seed_messages
+
+MODES = [
+    ('no logins', {}, False),
+    ('inline', {'PASSWORD_HASH_WORKERS': '0', 'PASSWORD_HASH_MAX_PENDING': '1000'}, True),
+    ('pool', {'PASSWORD_HASH_WORKERS': '1', 'PASSWORD_HASH_MAX_PENDING': '4', 'PASSWORD_HASH_NICE': '10'}, True),
+]
+
+
+def child(login_threads, seconds, storm):
+    """Runs in the subprocess; prints one JSON line of results"""
+    app = load_app()
+    from utils.logger import configure_logging
+
+    configure_logging(level='ERROR')
+    client = app.test_client()
+    headers = auth_headers(client)
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+    chat_id = client.post('/api/chat/create', json={'title': 'polled'}, headers=headers).get_json()['id']
+    seed_messages(app, chat_id, user_id, 200)
+
+    stop = threading.Event()
+    chat_samples, login_status = [], {}
+
+    def poll_chat():
+        c = app.test_client()
+        i = 0
+        while not stop.is_set():
+            path = f'/api/messages/{chat_id}/messages' if i % 2 else '/api/chat/histories'
+            start = time.perf_counter()
+            c.get(path, headers=headers)
+            chat_samples.append((time.perf_counter() - start) * 1000)
+            i += 1
+            time.sleep(0.005)  # A client polling, not a tight loop
+
+    def log_in():
+        c = app.test_client()
+        while not stop.is_set():
+            status = c.post('/api/auth/login', json={'username': 'bench', 'password': 'bench-pass'}).status_code
+            login_status[status] = login_status.get(status, 0) + 1
+            if status == 503:
+                time.sleep(0.05)  # Honour Retry-After loosely
+
+    threads = [threading.Thread(target=poll_chat) for _ in range(2)]
+    if storm:
+        threads += [threading.Thread(target=log_in) for _ in range(login_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(json.dumps({'chat': summarize(chat_samples), 'chat_requests': len(chat_samples),
+                      'logins': login_status}))
+
+
+def main(login_threads=8, seconds=10):
+    print("=" * 60)
+    print(f"Login storm: {login_threads} login threads, 2 chat pollers, {seconds}s per mode")
+    print("=" * 60)
+    for label, env_overrides, storm in MODES:
+        env = dict(os.environ, **env_overrides)
+        out = subprocess.run([sys.executable, __file__, '--child', str(login_threads), str(seconds),
+                              '1' if storm else '0'], env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"\n{label}")
+        print_stats('  chat requests', result['chat'])
+        logins = result['logins']
+        if storm:
+            print(f"  logins: {logins.get('200', 0) / seconds:.1f}/s ok, {logins.get('503', 0)} rejected (503)")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(int(sys.argv[2]), float(sys.argv[3]), sys.argv[4] == '1')
+    else:
+        main(*(int(a) for a in sys.argv[1:3]))
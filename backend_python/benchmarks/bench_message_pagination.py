@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark: listing messages of a long chat, full load vs keyset pagination
+
+Seeds one chat with N messages (default 100k) and compares the old
+"serialize every message" listing against the cursor-paginated endpoint:
+first page, a page deep in the history (via `before`), and the response size.
+
+Usage:
+    python benchmarks/bench_message_pagination.py [messages] [iterations]
+"""
+import sys
+import tracemalloc
+from common import load_app, auth_headers, measure, print_stats, seed_messages
+
+
+def main(count=100_000, iterations=20):
+    app = load_app()
+    from flask import jsonify
+    from models import Message
+
+    client = app.test_client()
+    headers = auth_headers(client)
+    chat_id = client.post('/api/chat/create', json={'title': 'bench'}, headers=headers).get_json()['id']
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+    seed_messages(app, chat_id, user_id, count)
+    print(f"Seeded chat {chat_id} with {count} messages")
+
+    # "Before": the old handler body, everything loaded and serialized
+    def legacy_full_listing():
+        with app.test_request_context():
+            messages = Message.query.filter_by(chat_id=chat_id).order_by(Message.created_at).all()
+            return jsonify([msg.to_dict() for msg in messages]).get_data()
+
+    # Walk back up to 10 pages; a short chat runs out of older pages sooner
+    deep_cursor, deep_pages = None, 1
+    page = client.get(f'/api/messages/{chat_id}/messages?limit=50', headers=headers).get_json()
+    while page.get('prev_cursor') and deep_pages <= 10:
+        deep_cursor, deep_pages = page['prev_cursor'], deep_pages + 1
+        page = client.get(f'/api/messages/{chat_id}/messages?limit=50&before={deep_cursor}',
+                          headers=headers).get_json()
+
+    def first_page():
+        return client.get(f'/api/messages/{chat_id}/messages?limit=50', headers=headers).get_data()
+
+    def deep_page():
+        url = f'/api/messages/{chat_id}/messages?limit=50'
+        return client.get(f'{url}&before={deep_cursor}' if deep_cursor else url, headers=headers).get_data()
+
+    def peak_memory(fn):
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        size = len(fn())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size, peak - baseline
+
+    full_size, full_peak = peak_memory(legacy_full_listing)
+    page_size, page_peak = peak_memory(first_page)
+
+    full = measure(legacy_full_listing, iterations, warmup=1)
+    page = measure(first_page, iterations * 10, warmup=5)
+    deep_stats = measure(deep_page, iterations * 10, warmup=5)
+
+    print("=" * 60)
+    print(f"Message listing benchmark ({count} messages in one chat)")
+    print("=" * 60)
+    print_stats('BEFORE full listing', full)
+    print_stats('AFTER  first page (limit=50)', page)
+    print_stats(f'AFTER  page {deep_pages} (limit=50, before=cursor)', deep_stats)
+    print(f"Response size: {full_size / 1024 / 1024:.1f} MiB -> {page_size / 1024:.1f} KiB")
+    print(f"Peak Python memory: {full_peak / 1024 / 1024:.1f} MiB -> {page_peak / 1024 / 1024:.2f} MiB")
+    print(f"Speedup: {full['mean'] / page['mean']:.0f}x (first page), "
+          f"{full['mean'] / deep_stats['mean']:.0f}x (deep page)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Benchmark: GET /api/messages/search at scale (SQLite FTS5)
+
+Seeds N messages (default 1M) spread over U users, with words drawn from a
+Zipf-like vocabulary so there are both very common and rare terms, then times
+the search endpoint for one user: a rare word, a common word, two words, a
+prefix, and a page deep into the results via the keyset cursor. "Before" is
+the closest thing the old schema allows server-side: a LIKE scan over the
+user's messages.
+
+Usage:
+    python benchmarks/bench_message_search.py [messages] [users] [iterations]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import load_app, auth_headers, measure, print_stats
+
+VOCABULARY = [f'w{i}' for i in range(20_000)]
+_rng = random.Random(42)
+
+
+def zipf_word():
+    # Index ~ 1/rank: a few words are everywhere, most are rare
+    return VOCABULARY[min(int(_rng.paretovariate(1.1)) - 1, len(VOCABULARY) - 1)]
+
+
+def seed(app, count, users):
+    from database import db
+    from models import User, ChatHistory, Message
+
+    with app.app_context():
+        user_ids = [db.session.get(User, 1).id]
+        for i in range(users - 1):
+            user = User(username=f'seed{i}', email=f'seed{i}@bench.local', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            user_ids.append(user.id)
+        chats = {}
+        for user_id in user_ids:
+            chat = ChatHistory(user_id=user_id, title='seeded')
+            db.session.add(chat)
+            db.session.flush()
+            chats[user_id] = chat.id
+        db.session.commit()
+
+        start = datetime.utcnow() - timedelta(seconds=count)
+        batch = 20_000
+        for offset in range(0, count, batch):
+            rows = []
+            for i in range(offset, min(offset + batch, count)):
+                user_id = user_ids[i % len(user_ids)]
+                words = [zipf_word() for _ in range(_rng.randint(6, 30))]
+                rows.append({'chat_id': chats[user_id], 'user_id': user_id, 'text': ' '.join(words),
+                             'sender': 'user' if i % 2 == 0 else 'bot', 'created_at': start + timedelta(seconds=i)})
+            db.session.execute(Message.__table__.insert(), rows)
+            db.session.commit()
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+
+def main(count=1_000_000, users=100, iterations=50):
+    app = load_app()
+    from database import db
+    from models import Message
+    from utils.logger import configure_logging
+
+    configure_logging(level='WARNING')
+    client = app.test_client()
+    headers = auth_headers(client)
+
+    started = time.perf_counter()
+    seed(app, count, users)
+    print(f"Seeded {count} messages for {users} users in {time.perf_counter() - started:.0f}s "
+          f"(FTS triggers included)")
+
+    def search(q, after=None):
+        params = {'q': q, 'limit': 20, **({'after': after} if after else {})}
+        res = client.get('/api/messages/search', query_string=params, headers=headers)
+        assert res.status_code == 200, res.get_data()
+        return res.get_json()
+
+    def legacy_like(word):
+        with app.app_context():
+            return (Message.query.filter(Message.user_id == 1, Message.text.like(f'%{word}%'))
+                    .order_by(Message.id.desc()).limit(20).all())
+
+    cursor = None
+    for _ in range(5):
+        cursor = search('w0', cursor)['next_cursor']
+
+    queries = [
+        ('rare word', 'w70', None),
+        ('common word', 'w0', None),
+        ('two words', 'w2 w30', None),
+        ('prefix', 'w12', None),
+        ('common word, page 6', 'w0', cursor),
+    ]
+    print("=" * 60)
+    print(f"Search latency for one user ({count // users} of {count} messages)")
+    print("=" * 60)
+    for label, q, after in queries:
+        hits = len(search(q, after)['results'])
+        print_stats(f'{label} ({hits} results)', measure(lambda: search(q, after), iterations, warmup=3))
+    print_stats('BEFORE: LIKE scan, rare word', measure(lambda: legacy_like('w70'), max(5, iterations // 10),
+                                                         warmup=1))
+
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:4]))
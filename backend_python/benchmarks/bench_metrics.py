@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Benchmark: request throughput with /metrics instrumentation off and on
+
+Each mode runs in a fresh process because the request and database hooks are
+only installed at startup when METRICS_ENABLED=true. Uses the fake Gemini
+model with the response cache off, and also hits the chat listing, which is
+dominated by JWT verification, SQL and JSON rather than the model call.
+
+Usage:
+    python benchmarks/bench_metrics.py [concurrency] [requests]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import load_app, auth_headers, summarize, print_stats
+
+
+def run_load(app, path, headers, concurrency, total, payload=None):
+    def one_request(i):
+        client = app.test_client()
+        start = time.perf_counter()
+        if payload is None:
+            res = client.get(path, headers=headers)
+        else:
+            res = client.post(path, json={**payload, 'message': f'question {i}'}, headers=headers)
+        return res.status_code, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total)))
+    elapsed = time.perf_counter() - start
+    ok = [ms for status, ms in results if status == 200]
+    return {'rps': len(ok) / elapsed, 'errors': total - len(ok), 'latency': summarize(ok)}
+
+
+def child(concurrency, total):
+    """Runs in the subprocess; prints one JSON line of results"""
+    from fake_llm import install_fake_gemini
+    from utils.logger import configure_logging
+
+    app = load_app()
+    configure_logging(level='WARNING')
+    install_fake_gemini(latency=0.0)
+    client = app.test_client()
+    headers = auth_headers(client)
+    for i in range(20):
+        client.post('/api/chat/create', json={'title': f'chat {i}'}, headers=headers)
+
+    results = {}
+    for label, path, payload in [('POST /api/chat', '/api/chat', {'cache': False}),
+                                 ('GET /api/chat/histories', '/api/chat/histories', None)]:
+        run_load(app, path, headers, concurrency, 100, payload)  # warm-up
+        results[label] = run_load(app, path, headers, concurrency, total, payload)
+    print(json.dumps(results))
+
+
+def main(concurrency=8, total=2000):
+    results = {}
+    for enabled in ('false', 'true'):
+        env = dict(os.environ, METRICS_ENABLED=enabled)
+        out = subprocess.run([sys.executable, __file__, '--child', str(concurrency), str(total)],
+                             env=env, check=True, capture_output=True, text=True).stdout
+        results[enabled] = json.loads(out.strip().splitlines()[-1])
+
+    print("=" * 60)
+    print(f"Metrics overhead ({total} requests, concurrency {concurrency})")
+    print("=" * 60)
+    for label in results['false']:
+        off, on = results['false'][label], results['true'][label]
+        print(f"\n{label}")
+        print_stats('  METRICS_ENABLED=false', off['latency'])
+        print_stats('  METRICS_ENABLED=true', on['latency'])
+        print(f"  {off['rps']:.0f} -> {on['rps']:.0f} req/s ({on['rps'] / off['rps']:.2f}x)")
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if a != '--child']
+    concurrency = int(args[0]) if args else 8
+    total = int(args[1]) if len(args) > 1 else 2000
+    if '--child' in sys.argv:
+        child(concurrency, total)
+    else:
+        main(concurrency, total)
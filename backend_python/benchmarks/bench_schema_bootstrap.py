@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Benchmark: request latency with and without a per-request db.create_all()
+
+Compares the old behaviour (create_all in before_request) against the startup
+migration bootstrap for /health and GET /api/messages/<chat_id>/messages.
+
+Usage:
+    python benchmarks/bench_schema_bootstrap.py [iterations]
+"""
+import sys
+from common import load_app, auth_headers, measure, print_stats
+
+
+def main(iterations=500):
+    app = load_app()
+    from database import db
+
+    client = app.test_client()
+    headers = auth_headers(client)
+    chat_id = client.post('/api/chat/create', json={'title': 'bench'}, headers=headers).get_json()['id']
+    client.post(f'/api/messages/{chat_id}/send', json={'text': 'hello'}, headers=headers)
+
+    def health():
+        client.get('/health')
+
+    def list_messages():
+        client.get(f'/api/messages/{chat_id}/messages', headers=headers)
+
+    # "Before": emulate the old before_request hook
+    def legacy_create_all():
+        with app.app_context():
+            db.create_all()
+
+    hooks = app.before_request_funcs.setdefault(None, [])
+    hooks.append(legacy_create_all)
+    before = {'health': measure(health, iterations), 'messages': measure(list_messages, iterations)}
+    hooks.remove(legacy_create_all)
+
+    after = {'health': measure(health, iterations), 'messages': measure(list_messages, iterations)}
+
+    print("=" * 60)
+    print("Schema bootstrap benchmark")
+    print("=" * 60)
+    print_stats('BEFORE /health (create_all per request)', before['health'])
+    print_stats('AFTER  /health (startup migrations)', after['health'])
+    print_stats('BEFORE GET /messages (create_all per request)', before['messages'])
+    print_stats('AFTER  GET /messages (startup migrations)', after['messages'])
+    for name in ('health', 'messages'):
+        speedup = before[name]['mean'] / after[name]['mean']
+        print(f"{name}: {speedup:.2f}x faster")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Benchmark: database cost of POST /api/messages/<chat_id>/send
+
+Part 1 runs concurrent sends against a file-backed SQLite database with a slow
+fake LLM and reports throughput, commits per send and the average number of
+pool connections checked out (a connection held across the model call shows
+up here). Part 2 isolates the write path: the old three commits per
+turn (user message, bot message, chat timestamp) vs the single-commit
+_save_turns() used now, under the same concurrency.
+
+Usage:
+    python benchmarks/bench_send_transaction.py [concurrency] [sends] [llm_latency_ms]
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import event
+
+from common import load_app, auth_headers, summarize, print_stats
+from fake_llm import install_fake_gemini
+
+
+class PoolWatcher:
+    """Counts commits and the average number of pool connections checked out"""
+
+    def __init__(self, engine):
+        self.commits = 0
+        self.checked_out = 0
+        self._area = 0.0  # connection-seconds
+        self._since = self._last = time.perf_counter()
+        self._lock = threading.Lock()
+        event.listen(engine, 'commit', self._on_commit)
+        event.listen(engine.pool, 'checkout', lambda *args: self._change(1))
+        event.listen(engine.pool, 'checkin', lambda *args: self._change(-1))
+
+    def reset(self):
+        with self._lock:
+            self.commits = 0
+            self._area = 0.0
+            self._since = self._last = time.perf_counter()
+
+    def average_checked_out(self):
+        with self._lock:
+            self._change_locked(0)
+            return self._area / max(1e-9, self._last - self._since)
+
+    def _on_commit(self, conn):
+        with self._lock:
+            self.commits += 1
+
+    def _change(self, delta):
+        with self._lock:
+            self._change_locked(delta)
+
+    def _change_locked(self, delta):
+        now = time.perf_counter()
+        self._area += self.checked_out * (now - self._last)
+        self._last = now
+        self.checked_out += delta
+
+
+def run_concurrently(fn, concurrency, total):
+    start = time.perf_counter()
+    samples = []
+
+    def timed(i):
+        t = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(total)))
+    return total / (time.perf_counter() - start), summarize(samples)
+
+
+def main(concurrency=16, sends=400, llm_latency_ms=100):
+    app = load_app()
+    from database import db
+    from models import Message, ChatHistory
+    from routes.message_routes import _save_turns
+    from utils.logger import configure_logging
+
+    configure_logging(level='WARNING')
+    install_fake_gemini(latency=llm_latency_ms / 1000)
+    client = app.test_client()
+    headers = auth_headers(client)
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+    chats = [client.post('/api/chat/create', json={'title': f'chat {i}'}, headers=headers).get_json()['id']
+             for i in range(concurrency)]
+    with app.app_context():
+        watcher = PoolWatcher(db.engine)
+
+    print("=" * 60)
+    print(f"Send path: {sends} sends, concurrency {concurrency}, fake LLM {llm_latency_ms:.0f}ms")
+    print("=" * 60)
+
+    def send(i):
+        res = app.test_client().post(f'/api/messages/{chats[i % len(chats)]}/send', headers=headers,
+                                     json={'text': f'question {i}', 'cache': False})
+        assert res.status_code == 201, res.get_json()
+
+    watcher.reset()
+    rps, stats = run_concurrently(send, concurrency, sends)
+    print_stats('POST /send', stats)
+    print(f"{'':<45} {rps:.1f} sends/s, {watcher.commits / sends:.2f} commits/send, "
+          f"{watcher.average_checked_out():.1f} connections checked out on average")
+
+    print("\n" + "=" * 60)
+    print(f"Write path only: {sends} turns, concurrency {concurrency}")
+    print("=" * 60)
+
+    def legacy_write(i):
+        """The pre-refactor sequence: three commits per turn"""
+        with app.app_context():
+            chat = db.session.get(ChatHistory, chats[i % len(chats)])
+            user_message = Message(chat_id=chat.id, user_id=user_id, text=f'question {i}', sender='user')
+            db.session.add(user_message)
+            db.session.commit()
+            ai_message = Message(chat_id=chat.id, user_id=user_id, text=f'answer {i}', sender='bot')
+            db.session.add(ai_message)
+            db.session.commit()
+            chat.updated_at = datetime.utcnow()
+            db.session.commit()
+
+    def single_commit_write(i):
+        with app.app_context():
+            _save_turns(chats[i % len(chats)], user_id, [(f'question {i}', None, None, f'answer {i}')])
+
+    for label, write in [('3 commits per turn', legacy_write), ('1 commit per turn', single_commit_write)]:
+        watcher.reset()
+        rps, stats = run_concurrently(write, concurrency, sends)
+        print_stats(label, stats)
+        print(f"{'':<45} {rps:.0f} turns/s, {watcher.commits / sends:.2f} commits/turn")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 400,
+         float(sys.argv[3]) if len(sys.argv) > 3 else 100)
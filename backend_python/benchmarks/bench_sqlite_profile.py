@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark: concurrent reads and writes on one SQLite file, default vs
+SQLITE_PROFILE=performance
+
+Each worker is a separate process with its own copy of the app, like gunicorn
+sync workers sharing a database file. Writers POST /api/messages/<id>/send
+(fake Gemini, no latency); readers list the chat's messages and the chat
+sidebar. Reports throughput, latency and failed requests ("database is
+locked" surfaces as a 500) per role.
+
+Usage:
+    python benchmarks/bench_sqlite_profile.py [writers] [readers] [seconds]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_app, summarize, print_stats
+
+
+def child_seed(db_path):
+    """Create the user, the chats and some history; prints the ids as JSON"""
+    app = load_app(db_path)
+    from flask_jwt_extended import create_access_token
+    from common import auth_headers, seed_messages
+
+    client = app.test_client()
+    headers = auth_headers(client)
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+    chats = [client.post('/api/chat/create', json={'title': f'chat {i}'}, headers=headers).get_json()['id']
+             for i in range(20)]
+    seed_messages(app, chats[0], user_id, 2000)
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    print(json.dumps({'chats': chats, 'token': token}))
+
+
+def child_worker(db_path, role, seconds, seed):
+    """Hammer the app for `seconds` after the parent says go; prints latencies and failures as JSON"""
+    app = load_app(db_path)
+    from fake_llm import install_fake_gemini
+    from utils.logger import configure_logging
+
+    configure_logging(level='CRITICAL')
+    install_fake_gemini()
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {seed['token']}"}
+    chats = seed['chats']
+
+    print('ready', flush=True)
+    sys.stdin.readline()
+    samples, failures, i = [], 0, 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        t = time.perf_counter()
+        if role == 'writer':
+            res = client.post(f'/api/messages/{chats[1 + i % (len(chats) - 1)]}/send', headers=headers,
+                              json={'text': f'question {os.getpid()} {i}', 'cache': False})
+        elif i % 2:
+            res = client.get('/api/chat/histories', headers=headers)
+        else:
+            res = client.get(f'/api/messages/{chats[0]}/messages', headers=headers)
+        samples.append((time.perf_counter() - t) * 1000)
+        failures += res.status_code >= 500
+        i += 1
+    print(json.dumps({'samples': samples, 'failures': failures}))
+
+
+def run_profile(profile, writers, readers, seconds):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='sqlite-profile-'), 'bench.db')
+    env = dict(os.environ, SQLITE_PROFILE=profile, LOG_LEVEL='ERROR')
+    script = os.path.abspath(__file__)
+    seed = subprocess.run([sys.executable, script, '--seed', db_path], env=env, check=True,
+                          capture_output=True, text=True).stdout.strip().splitlines()[-1]
+
+    procs = [(role, subprocess.Popen([sys.executable, script, '--worker', db_path, role, str(seconds), seed],
+                                     env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+             for role in ['writer'] * writers + ['reader'] * readers]
+    # Start the clock only once every worker has imported the app
+    for _, proc in procs:
+        while proc.stdout.readline().strip() != 'ready':
+            pass
+    for _, proc in procs:
+        proc.stdin.write('go\n')
+        proc.stdin.flush()
+
+    results = {'writer': {'samples': [], 'failures': 0}, 'reader': {'samples': [], 'failures': 0}}
+    for role, proc in procs:
+        out = json.loads(proc.communicate()[0].strip().splitlines()[-1])
+        results[role]['samples'] += out['samples']
+        results[role]['failures'] += out['failures']
+    return results
+
+
+def main(writers=4, readers=4, seconds=10):
+    print("=" * 60)
+    print(f"SQLite profiles: {writers} writer + {readers} reader processes, {seconds}s each")
+    print("=" * 60)
+    for profile in ('default', 'performance'):
+        results = run_profile(profile, writers, readers, seconds)
+        print(f"\nSQLITE_PROFILE={profile}")
+        for role, result in results.items():
+            if not result['samples']:
+                continue
+            print_stats(f'  {role}s', summarize(result['samples']))
+            print(f"{'':<45} {len(result['samples']) / seconds:.0f} req/s, failed={result['failures']}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--seed']:
+        child_seed(sys.argv[2])
+    elif sys.argv[1:2] == ['--worker']:
+        child_worker(sys.argv[2], sys.argv[3], float(sys.argv[4]), json.loads(sys.argv[5]))
+    else:
+        main(*(int(a) for a in sys.argv[1:4]))
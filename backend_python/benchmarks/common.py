@@ -0,0 +1,85 @@
+"""
+Shared helpers for the benchmark scripts
+Boots the Flask app against a throwaway SQLite database
+"""
+import os
+import sys
+import tempfile
+import time
+import statistics
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def load_app(db_path=None):
+    """Import the Flask app bound to a temporary SQLite database"""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='chatbench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.pop('GEMINI_API_KEY', None)
+    os.environ.pop('HUGGINGFACE_API_KEY', None)
+    from app import app
+    return app
+
+
+def auth_headers(client, username='bench', password='bench-pass'):
+    """Register (if needed) and log in a user, returning Authorization headers"""
+    client.post('/api/auth/register', json={
+        'username': username, 'email': f'{username}@bench.local', 'password': password
+    })
+    res = client.post('/api/auth/login', json={'username': username, 'password': password})
+    return {'Authorization': f"Bearer {res.get_json()['token']}"}
+
+
+def seed_messages(app, chat_id, user_id, count):
+    """Bulk-insert `count` alternating user/bot messages into a chat, oldest first"""
+    from database import db
+    from models import Message
+
+    start = datetime.utcnow() - timedelta(seconds=count)
+    rows = [{
+        'chat_id': chat_id,
+        'user_id': user_id,
+        'text': f'message {i} ' + 'lorem ipsum ' * 8,
+        'sender': 'user' if i % 2 == 0 else 'bot',
+        'created_at': start + timedelta(seconds=i),
+    } for i in range(count)]
+    with app.app_context():
+        db.session.execute(Message.__table__.insert(), rows)
+        db.session.commit()
+
+
+def measure(fn, iterations=500, warmup=20):
+    """Call fn repeatedly and return latency stats in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Return mean/p50/p95/p99 for a list of millisecond samples"""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': pct(50),
+        'p95': pct(95),
+        'p99': pct(99),
+    }
+
+
+def print_stats(label, stats):
+    print(f"{label:<45} mean={stats['mean']:.3f}ms p50={stats['p50']:.3f}ms "
+          f"p95={stats['p95']:.3f}ms p99={stats['p99']:.3f}ms (n={stats['count']})")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Offline evaluation of the near-duplicate prompt cache (utils/similar_cache.py)
+
+For each group of paraphrases the first prompt is answered (stored) and the
+rest are looked up. Prompts without a group are distinct questions that must
+never be served another prompt's reply. Reports, per similarity threshold:
+
+  hit rate          paraphrases served their own group's reply
+  false-match rate  lookups served a reply stored for a different question
+  lookup latency    with --filler unrelated prompts also in the cache
+
+Corpus file (optional): JSON lines {"group": "react", "prompt": "what is react?"};
+use "group": null for prompts that should miss. Defaults to a built-in corpus.
+
+Usage:
+    python benchmarks/eval_similar_cache.py [--corpus prompts.jsonl] [--thresholds 0.5 0.6 0.7 0.8 0.9]
+"""
+import argparse
+import json
+import random
+import time
+
+from common import summarize  # also puts the backend on sys.path
+
+BUILTIN_GROUPS = {
+    'react': ['what is react?', "What's React", 'what is react', 'What is React.js?', 'what is reactjs'],
+    'python_list_sort': ['how do I sort a list in python', 'How to sort a list in Python?',
+                         'how can i sort a list in python', 'sort a list in python'],
+    'capital_france': ['what is the capital of france', "What's the capital of France?",
+                       'capital of france?', 'what is the capital city of france'],
+    'weather': ["what's the weather like today", 'what is the weather like today?',
+                'How is the weather today?'],
+    'jwt': ['what is a jwt token', 'What is a JWT token?', "what's a jwt", 'explain what a jwt token is'],
+    'reverse_string': ['how to reverse a string in javascript', 'How do I reverse a string in JavaScript?',
+                       'reverse a string in javascript'],
+    'docker': ['what is docker', 'What is Docker?', "what's docker used for", 'what is docker used for'],
+    'git_undo': ['how do i undo the last git commit', 'How to undo the last commit in git?',
+                 'undo last git commit'],
+    'sql_join': ['what is the difference between inner join and left join',
+                 "What's the difference between an inner join and a left join?",
+                 'difference between inner join and left join'],
+    'photosynthesis': ['explain photosynthesis', 'Explain photosynthesis.', 'can you explain photosynthesis',
+                       'explain photosynthesis simply'],
+    'hello': ['hello', 'Hello!', 'hello there', 'helo'],
+    'thanks': ['thank you so much', 'Thank you so much!', 'thanks so much'],
+    'css_center': ['how do i center a div', 'How do I center a div in CSS?', 'how to center a div'],
+    'ml': ['what is machine learning', 'What is machine learning?', "what's machine learning",
+           'what is machine-learning'],
+    'math_2_2': ['what is 2+2', 'What is 2 + 2?', 'whats 2+2'],
+    'celsius': ['convert celsius to fahrenheit', 'how do I convert celsius to fahrenheit?',
+                'Convert Celsius to Fahrenheit'],
+    'install_react': ['how do I install react', 'How to install React?', 'install react'],
+}
+
+# Close in wording to a group above but a different question
+BUILTIN_NEGATIVES = [
+    'what is redux?', 'what is react native', 'how do I sort a list in java', 'how do I sort a dict in python',
+    'what is the capital of spain', 'what was the weather like yesterday', 'what is a jwt secret',
+    'how to reverse an array in javascript', 'what is kubernetes', 'how do i undo the last git push',
+    'what is the difference between inner join and outer join', 'explain respiration', 'goodbye',
+    'how do i center a div vertically', 'what is deep learning', 'what is 2+3', 'what is not react',
+    'what is 3+2', 'is docker not free', 'how do I sort a list in python 3',
+    # Same words as a stored prompt, but reordered or with an opposite prefix
+    'convert fahrenheit to celsius', 'how do I uninstall react', 'how do I sort python in a list',
+    'how do i redo the last git commit',
+]
+
+
+def load_corpus(path):
+    groups, negatives = {}, []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get('group') is None:
+                negatives.append(row['prompt'])
+            else:
+                groups.setdefault(row['group'], []).append(row['prompt'])
+    return groups, negatives
+
+
+def filler_prompts(count, seed=7):
+    rng = random.Random(seed)
+    words = ('server cache python query index token image stream chat model worker batch user login '
+             'table cursor thread pool memory latency deploy config error retry backoff').split()
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(4, 10))) + '?' for _ in range(count)]
+
+
+def evaluate(groups, negatives, threshold, filler):
+    from utils.similar_cache import SimilarPromptCache
+
+    cache = SimilarPromptCache(threshold, max_entries=len(groups) + filler + 1, max_bytes=1 << 30, ttl=3600)
+    for i, prompt in enumerate(filler_prompts(filler)):
+        cache.set(prompt, f'filler:{i}')
+    for group, prompts in groups.items():
+        cache.set(prompts[0], f'group:{group}')
+
+    hits = false_matches = lookups = 0
+    samples = []
+    queries = [(group, p) for group, prompts in groups.items() for p in prompts[1:]]
+    queries += [(None, p) for p in negatives]
+    for group, prompt in queries:
+        start = time.perf_counter()
+        reply = cache.get(prompt)
+        samples.append((time.perf_counter() - start) * 1000)
+        lookups += 1
+        if reply is None:
+            continue
+        if group is not None and reply == f'group:{group}':
+            hits += 1
+        else:
+            false_matches += 1
+    paraphrases = sum(len(prompts) - 1 for prompts in groups.values())
+    return {
+        'hit_rate': hits / paraphrases if paraphrases else 0.0,
+        'false_match_rate': false_matches / lookups if lookups else 0.0,
+        'false_matches': false_matches,
+        'latency': summarize(samples),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--corpus', help='JSON lines file of {"group", "prompt"}')
+    parser.add_argument('--thresholds', nargs='+', type=float, default=[0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument('--filler', type=int, default=5000, help='unrelated prompts stored alongside')
+    args = parser.parse_args(argv)
+
+    groups, negatives = load_corpus(args.corpus) if args.corpus else (BUILTIN_GROUPS, BUILTIN_NEGATIVES)
+    paraphrases = sum(len(prompts) - 1 for prompts in groups.values())
+    print("=" * 60)
+    print(f"{len(groups)} stored prompts, {paraphrases} paraphrases, {len(negatives)} near misses, "
+          f"{args.filler} filler entries")
+    print("=" * 60)
+    print(f"{'threshold':>9} {'hit rate':>9} {'false match':>12} {'p50':>9} {'p99':>9}")
+    for threshold in args.thresholds:
+        result = evaluate(groups, negatives, threshold, args.filler)
+        print(f"{threshold:>9.2f} {result['hit_rate']:>9.1%} {result['false_match_rate']:>11.1%} "
+              f"{result['latency']['p50']:>7.3f}ms {result['latency']['p99']:>7.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Deterministic local stand-in for the google-generativeai SDK
+Lets benchmarks and tests exercise the Gemini code path without network or API keys
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class FakeResponse:
+    """Mimics the parts of GenerateContentResponse that ai_service reads"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Mimics genai.GenerativeModel with configurable latency"""
+
+    def __init__(self, genai, model_name, generation_config=None):
+        self._genai = genai
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self._channel = None
+        self.calls = 0
+        self.last_contents = None
+
+    def _ensure_channel(self):
+        # The real SDK creates its gRPC client lazily and configure() discards it
+        if self._channel is None or self._channel != self._genai.channel_id:
+            if self._genai.connect_latency:
+                time.sleep(self._genai.connect_latency)
+            self._genai.connections += 1
+            self._channel = self._genai.channel_id
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self._ensure_channel()
+        self.calls += 1
+        self.last_contents = contents
+        prompt = contents if isinstance(contents, str) else contents[0]
+        if isinstance(prompt, dict):
+            # Multi-turn contents: answer the last user turn
+            prompt = contents[-1]['parts'][0]
+        chunks = self._genai.split_reply(self._genai.reply or f"Fake answer to: {prompt}")
+        timeout = (kwargs.get('request_options') or {}).get('timeout')
+        if stream:
+            return self._stream(chunks, timeout)
+        # A blocking call takes as long as generating every chunk
+        duration = self._genai.latency + self._genai.chunk_latency * (len(chunks) - 1)
+        with self._genai.in_flight_call():
+            if timeout is not None and duration > timeout:
+                time.sleep(timeout)
+                raise TimeoutError('504 Deadline Exceeded')
+            time.sleep(duration)
+        return FakeResponse(''.join(chunks))
+
+    def _stream(self, chunks, timeout=None):
+        # The deadline covers the whole stream, as with the SDK's request_options timeout
+        remaining = float('inf') if timeout is None else timeout
+        with self._genai.in_flight_call():
+            for i, chunk in enumerate(chunks):
+                wait = self._genai.chunk_latency if i else self._genai.latency
+                if wait > remaining:
+                    time.sleep(remaining)
+                    raise TimeoutError('504 Deadline Exceeded')
+                time.sleep(wait)
+                remaining -= wait
+                yield FakeResponse(chunk)
+
+    def count_tokens(self, contents, **kwargs):
+        self._ensure_channel()
+        return len(str(contents).split())
+
+
+class FakeGenAI:
+    """Drop-in replacement for the `genai` module object used by ai_service"""
+
+    def __init__(self, latency=0.0, connect_latency=0.0, reply=None, chunks=1, chunk_latency=0.0):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.reply = reply
+        self.chunks = max(1, chunks)
+        self.chunk_latency = chunk_latency
+        self.configure_calls = 0
+        self.connections = 0
+        self.channel_id = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0  # Most calls running at once, for concurrency checks
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def in_flight_call(self):
+        """Count a model call as running for the duration of the block"""
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def configure(self, api_key=None, **kwargs):
+        self.configure_calls += 1
+        self.channel_id += 1
+
+    def split_reply(self, text):
+        """Split a reply into roughly equal chunks, as a streaming model would emit it"""
+        size = max(1, -(-len(text) // self.chunks))
+        return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+    def GenerativeModel(self, model_name, generation_config=None, **kwargs):
+        return FakeGenerativeModel(self, model_name, generation_config)
+
+
+def install_fake_gemini(latency=0.0, connect_latency=0.0, reply=None, chunks=1, chunk_latency=0.0):
+    """
+    Swap the Gemini SDK in utils.ai_service for a FakeGenAI and mark Gemini ready
+
+    Args:
+        latency: Seconds until the first chunk (time-to-first-token)
+        connect_latency: Seconds to open a new client channel (after configure())
+        reply: Fixed reply text (defaults to echoing the prompt)
+        chunks: Number of chunks a streamed reply is split into
+        chunk_latency: Seconds between streamed chunks
+
+    Returns:
+        The installed FakeGenAI instance
+    """
+    from utils import ai_service
+
+    fake = FakeGenAI(latency=latency, connect_latency=connect_latency, reply=reply,
+                     chunks=chunks, chunk_latency=chunk_latency)
+    os.environ.setdefault('GEMINI_API_KEY', 'fake-key-for-local-benchmarks')
+    os.environ['GEMINI_PREWARM'] = 'false'
+    ai_service.genai = fake
+    ai_service.GEMINI_AVAILABLE = True
+    ai_service.initialize_gemini(force_reinit=True)
+    return fake
@@ -0,0 +1,89 @@
+"""
+Shared pytest fixtures for the in-process test modules
+
+The app is a module-level singleton whose engine is bound on first import, so
+the whole session shares one throwaway SQLite database; it is configured here,
+before any test module imports the app. Tests use distinct usernames instead
+of separate databases.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+_TEST_DIR = tempfile.mkdtemp(prefix='chat-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+os.environ['BLOB_STORE_DIR'] = os.path.join(_TEST_DIR, 'blobs')
+os.environ.pop('GEMINI_API_KEY', None)
+os.environ.pop('HUGGINGFACE_API_KEY', None)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """login(username) registers the user if needed and returns Authorization headers"""
+
+    def login(username, password='pw'):
+        client.post('/api/auth/register', json={'username': username, 'email': f'{username}@test.local',
+                                                'password': password})
+        token = client.post('/api/auth/login', json={'username': username, 'password': password}).get_json()['token']
+        return {'Authorization': f'Bearer {token}'}
+
+    return login
+
+
+@pytest.fixture
+def count_queries(app):
+    """count_queries() is a context manager collecting the SQL statements run on the app's engine"""
+    from sqlalchemy import event
+    from database import db
+
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return count_queries
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """make_app(profile='default') builds a bare Flask app bound to db over a new SQLite file"""
+    from flask import Flask
+    from database import db, init_db
+
+    apps = []
+
+    def make_app(profile='default', name='fresh.db'):
+        bare = Flask(__name__)
+        bare.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / name}"
+        init_db(bare, profile=profile)
+        apps.append(bare)
+        return bare
+
+    yield make_app
+    for bare in apps:
+        with bare.app_context():
+            db.engine.dispose()
@@ -1,8 +1,84 @@
 """
 Database initialization module
 Separates database setup from app to avoid circular imports
-"""
 
+SQLITE_PROFILE=performance (opt-in, SQLite only) tunes every new connection for
+several gunicorn workers sharing one database file:
+    journal_mode=WAL       readers no longer block on a writer (and vice versa)
+    synchronous=NORMAL     fsync at checkpoints instead of every commit (safe in WAL)
+    busy_timeout           wait for the write lock instead of failing "database is locked"
+    mmap_size, cache_size  serve hot pages from memory
+and sizes the connection pool for concurrent readers.
+
+Configuration (environment):
+    SQLITE_PROFILE=default          default | performance
+    SQLITE_BUSY_TIMEOUT_MS=5000
+    SQLITE_MMAP_SIZE=268435456      bytes of the file memory-mapped per connection
+    SQLITE_CACHE_SIZE_KB=65536      page cache per connection
+    SQLITE_POOL_SIZE=10
+    SQLITE_MAX_OVERFLOW=20
+"""
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
+
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'default').lower()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '10'))
+SQLITE_MAX_OVERFLOW = int(os.getenv('SQLITE_MAX_OVERFLOW', '20'))
+
+
+def _is_sqlite_file(uri):
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') != 'sqlite:'
+
+
+def sqlite_performance_pragmas():
+    """PRAGMA statements run on every new connection under the performance profile"""
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+        f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}',
+        f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_performance_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def init_db(app, profile=None):
+    """
+    Bind db to the app, applying the SQLite performance profile when enabled
+
+    Returns the active profile name ('default' for non-SQLite databases)
+    """
+    profile = (profile or SQLITE_PROFILE).lower()
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    tuned = profile == 'performance' and _is_sqlite_file(uri)
+
+    if tuned:
+        # Pool options must be in place before the engine is created
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': SQLITE_POOL_SIZE,
+            'max_overflow': SQLITE_MAX_OVERFLOW,
+            'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000, 'check_same_thread': False},
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+        }
+    db.init_app(app)
+
+    if tuned:
+        with app.app_context():
+            event.listen(db.engine, 'connect', _apply_pragmas)
+    app.config['SQLITE_PROFILE'] = 'performance' if tuned else 'default'
+    return app.config['SQLITE_PROFILE']
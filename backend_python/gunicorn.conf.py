@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration
+
+Gunicorn only loads ./gunicorn.conf.py on its own when started from this
+directory (`gunicorn app:app`); it looks for it before --chdir takes effect, so
+from the repository root pass it explicitly:
+`gunicorn --chdir backend_python -c backend_python/gunicorn.conf.py app:app`.
+
+AI_EXECUTION_MODE=async switches to threaded workers so a single worker process can
+keep hundreds of slow LLM calls in flight instead of being pinned by one request.
+Bind address and worker count still come from $PORT and $WEB_CONCURRENCY.
+"""
+import os
+
+if os.getenv('AI_EXECUTION_MODE', 'sync').lower() == 'async':
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+    threads = int(os.getenv('GUNICORN_THREADS', '256'))
+    worker_connections = threads
+    # Long LLM round trips shouldn't trip the worker watchdog
+    timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+
+def post_fork(server, worker):
+    # The log listener thread doesn't survive fork (matters with preload_app)
+    from utils.logger import configure_logging
+    configure_logging()
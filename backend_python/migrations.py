@@ -0,0 +1,234 @@
+"""
+Schema bootstrap and versioned migrations
+Runs once at startup (or from the CLI) so the request path never touches the schema.
+Processes starting together (gunicorn workers) take turns under a migration lock;
+the first applies what is pending, the rest find the schema up to date.
+
+Usage:
+    flask --app app migrate        # apply pending migrations
+    python migrations.py           # same, without the flask CLI
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect, text
+from database import db
+from utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+log = get_logger('migrations')
+
+SCHEMA_VERSION_TABLE = 'schema_version'
+MIGRATION_LOCK_KEY = 0x6d696772  # pg_advisory_lock key ("migr")
+
+
+def _column_exists(conn, table, column):
+    """Check whether a column exists on a table"""
+    return any(col['name'] == column for col in inspect(conn).get_columns(table))
+
+
+def _index_exists(conn, table, index):
+    """Check whether an index exists on a table"""
+    return any(idx['name'] == index for idx in inspect(conn).get_indexes(table))
+
+
+def _migration_001_initial_schema(conn):
+    """Create the users, chat_histories and messages tables"""
+    # Import models so they are registered on the metadata
+    import models  # noqa: F401
+    tables = [db.metadata.tables[name] for name in ('users', 'chat_histories', 'messages')]
+    db.metadata.create_all(bind=conn, tables=tables)
+
+
+def _migration_002_message_image_digest(conn):
+    """Add messages.image_digest and move inline base64 images into the blob store"""
+    from utils.blob_store import store_image, InvalidImageData
+
+    if not _column_exists(conn, 'messages', 'image_digest'):
+        conn.execute(text("ALTER TABLE messages ADD COLUMN image_digest VARCHAR(64)"))
+
+    rows = conn.execute(text(
+        "SELECT id, image_url FROM messages WHERE image_url IS NOT NULL AND image_digest IS NULL"
+    )).fetchall()
+    for message_id, image_url in rows:
+        if image_url.startswith(('http://', 'https://', '/')):
+            continue  # A real URL, leave it alone
+        try:
+            digest = store_image(image_url)
+        except InvalidImageData:
+            continue
+        conn.execute(
+            text("UPDATE messages SET image_digest = :digest, image_url = NULL WHERE id = :id"),
+            {'digest': digest, 'id': message_id}
+        )
+
+
+def _migration_003_message_pagination_index(conn):
+    """Composite index for keyset pagination of a chat's messages"""
+    if not _index_exists(conn, 'messages', 'ix_messages_chat_created_id'):
+        conn.execute(text(
+            "CREATE INDEX ix_messages_chat_created_id ON messages (chat_id, created_at, id)"
+        ))
+
+
+def _migration_004_chat_summary(conn):
+    """Add chat_histories.summary and summary_through_id for the conversation context"""
+    if not _column_exists(conn, 'chat_histories', 'summary'):
+        conn.execute(text("ALTER TABLE chat_histories ADD COLUMN summary TEXT"))
+    if not _column_exists(conn, 'chat_histories', 'summary_through_id'):
+        conn.execute(text("ALTER TABLE chat_histories ADD COLUMN summary_through_id INTEGER"))
+
+
+def _migration_005_login_events(conn):
+    """Create login_events and move each user's login_history JSON blob into it"""
+    import json
+    import models  # noqa: F401
+    db.metadata.tables['login_events'].create(bind=conn, checkfirst=True)
+
+    rows = conn.execute(text(
+        "SELECT id, login_history FROM users WHERE login_history IS NOT NULL AND login_history != ''"
+    )).fetchall()
+    for user_id, blob in rows:
+        try:
+            entries = json.loads(blob)
+        except ValueError:
+            entries = []
+        events = []
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                timestamp = datetime.fromisoformat(entry['timestamp'])
+            except (KeyError, TypeError, ValueError):
+                continue  # Not a login we can place in time
+            events.append({
+                'user_id': user_id,
+                'provider': str(entry.get('provider') or 'unknown')[:20],
+                'user_agent': (entry.get('user_agent') or '')[:500],
+                'timestamp': timestamp,
+            })
+        if events:
+            conn.execute(db.metadata.tables['login_events'].insert(), events)
+        conn.execute(text("UPDATE users SET login_history = NULL WHERE id = :id"), {'id': user_id})
+
+
+def _migration_006_message_search(conn):
+    """FTS5 index over messages.text (SQLite only), kept in sync by triggers"""
+    from utils.search import FTS_SCHEMA, is_supported, rebuild_index
+
+    if not is_supported(conn):
+        log.warning("Skipping message search index: requires SQLite FTS5")
+        return
+    for statement in FTS_SCHEMA:
+        conn.execute(text(statement))
+    rebuild_index(conn)
+
+
+# Ordered list of (version, description, function). Append new migrations at the end,
+# never edit or reorder ones that have already shipped.
+MIGRATIONS = [
+    (1, 'initial schema: users, chat_histories, messages', _migration_001_initial_schema),
+    (2, 'messages.image_digest + move inline images to the blob store', _migration_002_message_image_digest),
+    (3, 'index messages(chat_id, created_at, id) for pagination', _migration_003_message_pagination_index),
+    (4, 'chat_histories.summary + summary_through_id', _migration_004_chat_summary),
+    (5, 'login_events table + migrate users.login_history', _migration_005_login_events),
+    (6, 'messages_fts full-text index + sync triggers', _migration_006_message_search),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(255), "
+        "applied_at TIMESTAMP)"
+    ))
+
+
+def get_current_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    _ensure_version_table(conn)
+    version = conn.execute(text(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")).scalar()
+    return version or 0
+
+
+@contextmanager
+def _migration_lock(engine):
+    """
+    Serialize migrations across processes (every gunicorn worker imports the app at
+    once): an advisory lock on PostgreSQL, a lock file next to a SQLite database
+    """
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': MIGRATION_LOCK_KEY})
+        return
+    path = engine.url.database if engine.dialect.name == 'sqlite' else None
+    if fcntl is None or not path or path == ':memory:':
+        yield  # Nothing shared to race on (or no flock on this platform)
+        return
+    with open(f'{path}.migrate.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # Waits for another process's migrations
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_migrations(verbose=True):
+    """
+    Apply all pending migrations in order, each in its own transaction
+    Must be called inside an application context. Concurrent callers wait for the
+    migration lock and then find the schema up to date.
+
+    Returns:
+        List of versions that were applied
+    """
+    with _migration_lock(db.engine):
+        return _run_pending(verbose)
+
+
+def _run_pending(verbose):
+    applied = []
+    # Read under the lock: another process may have migrated while we waited
+    with db.engine.begin() as conn:
+        current = get_current_version(conn)
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+        applied.append(version)
+        if verbose:
+            log.info("Applied migration %03d: %s", version, description)
+
+    if verbose and not applied:
+        log.info("Database schema is up to date (version %d)", current)
+    return applied
+
+
+def register_cli(app):
+    """Register the `flask migrate` command"""
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending database migrations"""
+        run_migrations()
+
+
+if __name__ == '__main__':
+    import os
+    os.environ['AUTO_MIGRATE'] = 'false'
+    from app import app
+    with app.app_context():
+        run_migrations()
@@ -1,5 +1,6 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.password_hasher import hash_password, verify_password, needs_rehash
+from utils.blob_store import signed_image_url
 from database import db
 
 class User(db.Model):
@@ -10,7 +11,7 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
-    login_history = db.Column(db.Text, default=None)  # JSON string of login history
+    login_history = db.Column(db.Text, default=None)  # Legacy JSON blob, moved to login_events by migration 005
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -19,12 +20,16 @@ class User(db.Model):
     messages = db.relationship('Message', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password (in the hashing pool; may raise PasswordHasherBusy)"""
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Check if password is correct"""
-        return check_password_hash(self.password_hash, password)
+        """Check if password is correct (in the hashing pool; may raise PasswordHasherBusy)"""
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Whether the stored hash predates the configured PASSWORD_HASH_METHOD"""
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -42,35 +47,51 @@ class ChatHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(255), default='New Chat')
+    summary = db.Column(db.Text, nullable=True)  # Rolling summary of turns older than the context window
+    summary_through_id = db.Column(db.Integer, nullable=True)  # Last message id folded into summary
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     messages = db.relationship('Message', backref='chat_history', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        """Convert to dictionary"""
+    def to_dict(self, message_count=None):
+        """Convert to dictionary; pass message_count when it was already aggregated"""
+        if message_count is None:
+            message_count = db.session.query(db.func.count(Message.id)).filter(Message.chat_id == self.id).scalar()
         return {
             'id': self.id,
             'user_id': self.user_id,
             'title': self.title,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'message_count': len(self.messages)
+            'message_count': message_count
         }
 
 class Message(db.Model):
     """Message model for storing chat messages"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Keyset pagination walks a chat in (created_at, id) order
+        db.Index('ix_messages_chat_created_id', 'chat_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     chat_id = db.Column(db.Integer, db.ForeignKey('chat_histories.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     text = db.Column(db.Text, nullable=False)
     sender = db.Column(db.String(20), default='user')  # 'user' or 'bot'
-    image_url = db.Column(db.String(500), nullable=True)
+    image_url = db.Column(db.String(500), nullable=True)  # External URL (legacy inline images are migrated out)
+    image_digest = db.Column(db.String(64), nullable=True)  # SHA-256 of the image in the blob store
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @property
+    def image(self):
+        """URL for the attached image, if any (a signed URL only the sender's client gets)"""
+        if self.image_digest:
+            return signed_image_url(self.image_digest, self.user_id)
+        return self.image_url
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -79,6 +100,28 @@ class Message(db.Model):
             'user_id': self.user_id,
             'text': self.text,
             'who': self.sender,
-            'image': self.image_url,
+            'image': self.image,
             'time': self.created_at.isoformat()
         }
+
+class LoginEvent(db.Model):
+    """One sign-in, appended in batches by utils.login_events and never updated"""
+    __tablename__ = 'login_events'
+    __table_args__ = (
+        # Login history pages walk a user's events newest first
+        db.Index('ix_login_events_user_timestamp', 'user_id', 'timestamp', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    provider = db.Column(db.String(20), nullable=False)  # 'google', 'github', ...
+    user_agent = db.Column(db.String(500), nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert to dictionary (same keys as the old login_history entries)"""
+        return {
+            'provider': self.provider,
+            'timestamp': self.timestamp.isoformat(),
+            'user_agent': self.user_agent
+        }
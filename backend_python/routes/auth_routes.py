@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import create_access_token, jwt_required, current_user
 from database import db
-from models import User
+from models import User, LoginEvent
+from utils.password_hasher import PasswordHasherBusy
+from utils.login_events import record_login, get_login_event_writer
+from utils.pagination import encode_cursor, decode_cursor, parse_limit, InvalidCursor
+from sqlalchemy import tuple_
 import requests
 import os
 from datetime import datetime
-import json
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -41,6 +43,8 @@ def register():
             'user': user.to_dict()
         }), 201
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Registration error: {str(e)}'}), 500
@@ -62,6 +66,11 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # Upgrade hashes made under an older PASSWORD_HASH_METHOD while we have the password
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+        
         # Create access token (use string identity for newer Flask-JWT-Extended)
         access_token = create_access_token(identity=str(user.id))
         
@@ -72,6 +81,8 @@ def login():
             'user': user.to_dict()
         }), 200
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({'error': f'Login error: {str(e)}'}), 500
 
@@ -85,8 +96,7 @@ def logout():
 @jwt_required()
 def get_current_user():
     """Get current user information"""
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = current_user.user
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -125,21 +135,8 @@ def google_callback():
         # Create access token
         access_token = create_access_token(identity=user.id)
         
-        # Record login history
-        login_history = {
-            'provider': 'google',
-            'timestamp': datetime.utcnow().isoformat(),
-            'user_agent': request.headers.get('User-Agent', '')
-        }
-        
-        if not hasattr(user, 'login_history') or not user.login_history:
-            user.login_history = json.dumps([login_history])
-        else:
-            history = json.loads(user.login_history)
-            history.append(login_history)
-            user.login_history = json.dumps(history[-50:])  # Keep last 50
-        
-        db.session.commit()
+        # Append to login history (buffered, written in batches)
+        record_login(user.id, 'google', request.headers.get('User-Agent', ''))
         
         return jsonify({
             'token': access_token,
@@ -150,6 +147,8 @@ def google_callback():
             }
         }), 200
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({'error': f'OAuth authentication failed: {str(e)}'}), 400
 
@@ -185,21 +184,8 @@ def github_callback():
         # Create access token
         access_token = create_access_token(identity=user.id)
         
-        # Record login history
-        login_history = {
-            'provider': 'github',
-            'timestamp': datetime.utcnow().isoformat(),
-            'user_agent': request.headers.get('User-Agent', '')
-        }
-        
-        if not hasattr(user, 'login_history') or not user.login_history:
-            user.login_history = json.dumps([login_history])
-        else:
-            history = json.loads(user.login_history)
-            history.append(login_history)
-            user.login_history = json.dumps(history[-50:])  # Keep last 50
-        
-        db.session.commit()
+        # Append to login history (buffered, written in batches)
+        record_login(user.id, 'github', request.headers.get('User-Agent', ''))
         
         return jsonify({
             'token': access_token,
@@ -210,27 +196,41 @@ def github_callback():
             }
         }), 200
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({'error': f'OAuth authentication failed: {str(e)}'}), 400
 
 @bp.route('/login-history/<username>', methods=['GET'])
 @jwt_required()
 def get_login_history(username):
-    """Get login history for a user"""
+    """Get a page of a user's login history, newest first (?limit=&before= cursor)"""
     user = User.query.filter_by(username=username).first()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    history = []
-    if hasattr(user, 'login_history') and user.login_history:
-        try:
-            history = json.loads(user.login_history)
-        except:
-            history = []
+    # This worker's own recent logins shouldn't wait for the next batch
+    get_login_event_writer().flush()
+    
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        query = LoginEvent.query.filter_by(user_id=user.id)
+        if request.args.get('before'):
+            before_key = decode_cursor(request.args['before'], datetime, int)
+            query = query.filter(tuple_(LoginEvent.timestamp, LoginEvent.id) < before_key)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    events = query.order_by(LoginEvent.timestamp.desc(), LoginEvent.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].timestamp, events[-1].id)
     
     return jsonify({
         'username': user.username,
-        'history': history
+        'history': [event.to_dict() for event in events],
+        'next_cursor': next_cursor
     }), 200
 
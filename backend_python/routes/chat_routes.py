@@ -1,11 +1,21 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from database import db
 from models import ChatHistory, Message, User
-from utils.ai_service import get_ai_response
+from utils.ai_service import generate_ai_response, stream_ai_response
+from utils.streaming import wants_stream, sse_event, sse_response
+from utils.ai_executor import run_ai_call, acquire_ai_call_slot, AIBusyError
+from utils.response_cache import cache_allowed
+from utils.similar_cache import similar_cache_allowed
+from utils.pagination import paginate_messages, parse_limit, InvalidCursor
+from utils.image_pipeline import check_image, decode_upload, ImageTooLarge, InvalidImageData
+from werkzeug.exceptions import RequestEntityTooLarge
+from utils.logger import get_logger
+from utils.identity import get_owned_chat, owns_chat, forget_chat
 import base64
 
 bp = Blueprint('chat', __name__, url_prefix='/api/chat')
+log = get_logger('chat_routes')
 
 @bp.route('/histories', methods=['GET'])
 @jwt_required()
@@ -13,9 +23,15 @@ def get_chat_histories():
     """Get all chat histories for current user"""
     user_id = get_jwt_identity()
     
-    chat_histories = ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.updated_at.desc()).all()
+    # One aggregate query instead of loading every chat's messages to count them
+    rows = (db.session.query(ChatHistory, db.func.count(Message.id))
+            .outerjoin(Message, Message.chat_id == ChatHistory.id)
+            .filter(ChatHistory.user_id == user_id)
+            .group_by(ChatHistory.id)
+            .order_by(ChatHistory.updated_at.desc())
+            .all())
     
-    return jsonify([chat.to_dict() for chat in chat_histories]), 200
+    return jsonify([chat.to_dict(message_count=count) for chat, count in rows]), 200
 
 @bp.route('/create', methods=['POST'])
 @jwt_required()
@@ -32,37 +48,46 @@ def create_chat():
     db.session.add(chat)
     db.session.commit()
     
-    return jsonify(chat.to_dict()), 201
+    return jsonify(chat.to_dict(message_count=0)), 201
 
 @bp.route('/<int:chat_id>', methods=['GET'])
 @jwt_required()
 def get_chat(chat_id):
-    """Get a specific chat with all messages"""
-    user_id = get_jwt_identity()
-    
-    chat = ChatHistory.query.filter_by(id=chat_id, user_id=user_id).first()
+    """Get a specific chat with a page of its messages (?limit=&before=&after= cursors)"""
+    chat = get_owned_chat(chat_id)
     
     if not chat:
         return jsonify({'error': 'Chat not found'}), 404
     
+    try:
+        page = paginate_messages(
+            Message.query.filter_by(chat_id=chat_id, user_id=chat.user_id),
+            limit=parse_limit(request.args.get('limit')),
+            before=request.args.get('before'),
+            after=request.args.get('after')
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
     return jsonify({
         **chat.to_dict(),
-        'messages': [msg.to_dict() for msg in chat.messages]
+        'messages': [msg.to_dict() for msg in page['messages']],
+        'prev_cursor': page['prev_cursor'],
+        'next_cursor': page['next_cursor']
     }), 200
 
 @bp.route('/<int:chat_id>/delete', methods=['DELETE'])
 @jwt_required()
 def delete_chat(chat_id):
     """Delete a chat"""
-    user_id = get_jwt_identity()
-    
-    chat = ChatHistory.query.filter_by(id=chat_id, user_id=user_id).first()
+    chat = get_owned_chat(chat_id)
     
     if not chat:
         return jsonify({'error': 'Chat not found'}), 404
     
     db.session.delete(chat)
     db.session.commit()
+    forget_chat(chat_id)
     
     return jsonify({'message': 'Chat deleted successfully'}), 200
 
@@ -70,15 +95,16 @@ def delete_chat(chat_id):
 @jwt_required()
 def clear_chat(chat_id):
     """Clear all messages in a chat"""
-    user_id = get_jwt_identity()
+    user_id = current_user.id
     
-    chat = ChatHistory.query.filter_by(id=chat_id, user_id=user_id).first()
-    
-    if not chat:
+    if not owns_chat(chat_id):
         return jsonify({'error': 'Chat not found'}), 404
     
-    # Delete all messages
-    Message.query.filter_by(chat_id=chat_id).delete()
+    # Delete all messages (and the summary of them); both statements stay scoped to
+    # the user, so a stale ownership entry can't touch anyone else's chat
+    Message.query.filter_by(chat_id=chat_id, user_id=user_id).delete()
+    ChatHistory.query.filter_by(id=chat_id, user_id=user_id).update(
+        {'summary': None, 'summary_through_id': None})
     db.session.commit()
     
     return jsonify({'message': 'Chat cleared successfully'}), 200
@@ -88,9 +114,6 @@ def clear_chat(chat_id):
 def send_message():
     """Send a message and get AI response"""
     try:
-        auth_header = request.headers.get('Authorization', 'NO HEADER')
-        print(f"[DEBUG] Authorization header: {auth_header[:50] if auth_header else 'EMPTY'}")
-        
         user_id = int(get_jwt_identity())
         data = request.get_json()
         
@@ -98,12 +121,20 @@ def send_message():
         if not message:
             return jsonify({'error': 'Message cannot be empty'}), 400
         
-        print(f"[DEBUG] User {user_id} sent message: {message[:50]}...")
+        log.debug("User %s sent message: %.50r", user_id, message)
+        
+        if wants_stream(request, data):
+            # The slot is taken up front (503 when busy) and held until the stream closes
+            release_slot = acquire_ai_call_slot()
+            return sse_response(_stream_chat_reply(message, cache_allowed(request, data),
+                                                   similar_cache_allowed(request, data)),
+                                on_close=release_slot)
         
         # Get AI response
-        print(f"[DEBUG] Calling get_ai_response...")
-        reply = get_ai_response(message)
-        print(f"[DEBUG] Got reply: {reply[:100] if reply else 'EMPTY'}...")
+        result = run_ai_call(generate_ai_response, message, use_cache=cache_allowed(request, data),
+                             use_similar=similar_cache_allowed(request, data))
+        reply = result.text
+        log.debug("Got reply: %.100r", reply)
         
         if not reply:
             return jsonify({'error': 'Failed to get AI response - API may be unavailable'}), 500
@@ -112,13 +143,28 @@ def send_message():
             'message': message,
             'reply': reply,
             'response': reply
-        }), 200
+        }), 200, result.response_headers()
+    except (AIBusyError, RequestEntityTooLarge):
+        raise
     except Exception as e:
-        print(f"[ERROR] Chat endpoint error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Chat endpoint error: %s", e)
         return jsonify({'error': f'Chat error: {str(e)}'}), 500
 
+def _stream_chat_reply(message, use_cache=True, use_similar=False):
+    """SSE generator: one `data` event per chunk, then a `done` event with the full reply"""
+    parts = []
+    try:
+        for chunk in stream_ai_response(message, use_cache=use_cache, use_similar=use_similar):
+            parts.append(chunk)
+            yield sse_event({'delta': chunk})
+    except Exception as e:
+        log.error("Chat stream error: %s", e)
+        yield sse_event({'error': f'Chat error: {str(e)}'}, event='error')
+        return
+    
+    reply = ''.join(parts)
+    yield sse_event({'message': message, 'reply': reply, 'response': reply}, event='done')
+
 @bp.route('/image', methods=['POST'])
 @jwt_required()
 def analyze_image():
@@ -126,70 +172,58 @@ def analyze_image():
     try:
         user_id = int(get_jwt_identity())
         
-        print(f"\n[DEBUG] ===== IMAGE ENDPOINT CALLED =====")
-        print(f"[DEBUG] Request method: {request.method}")
-        print(f"[DEBUG] Content-Type: {request.content_type}")
-        print(f"[DEBUG] Files keys: {list(request.files.keys())}")
-        print(f"[DEBUG] Form keys: {list(request.form.keys())}")
-        
         # Get image and question from request
         image_data = None
         question = request.form.get('question', 'What is in this image?').strip()
         
-        print(f"[DEBUG] Question received: {question[:50]}...")
+        log.debug("Image question from user %s: %.50r (files=%s, form=%s)",
+                  user_id, question, list(request.files), list(request.form))
         
         # Check if file was uploaded
         if 'image' in request.files:
             image_file = request.files['image']
-            print(f"[DEBUG] Found image in files: {image_file.filename}")
-            file_content = image_file.read()
-            print(f"[DEBUG] File size: {len(file_content)} bytes")
-            image_file.seek(0)  # Reset file pointer
-            
-            import base64
-            image_data = base64.b64encode(file_content).decode('utf-8')
-            print(f"[DEBUG] Encoded as base64: {len(image_data)} chars")
+            # The spooled upload goes straight to the image pipeline: no read() into
+            # memory, no base64 round trip. Size and dimensions are checked from the header.
+            image_data = image_file.stream
+            image_format, (width, height) = check_image(image_data)
+            log.debug("Upload %r: %s %dx%d", image_file.filename, image_format, width, height)
             
         else:
             # Try to get from form data (for data URLs or base64 strings)
             image_form = request.form.get('image', '')
-            print(f"[DEBUG] No file found, checking form data. Length: {len(image_form)}")
             
             if image_form:
                 # Check if it's a data URL
                 if image_form.startswith('data:'):
-                    print(f"[DEBUG] Data URL detected")
                     if ',' in image_form:
-                        image_data = image_form.split(',', 1)[1]
-                        print(f"[DEBUG] Extracted base64 from data URL: {len(image_data)} chars")
+                        image_data = decode_upload(image_form)
                     else:
-                        print(f"[ERROR] Data URL missing comma separator")
+                        log.warning("Data URL missing comma separator")
                 else:
                     # Assume it's already base64
-                    image_data = image_form
-                    print(f"[DEBUG] Using base64 string directly: {len(image_data)} chars")
+                    image_data = decode_upload(image_form)
+                if image_data:
+                    log.debug("Decoded form image: %d bytes", len(image_data))
         
         if not image_data:
-            print(f"[ERROR] No image data found after all checks")
-            print(f"[DEBUG] Request files: {request.files}")
-            print(f"[DEBUG] Request form: {dict(request.form)}")
+            log.info("No image data in request (files=%s, form=%s)", list(request.files), list(request.form))
             return jsonify({'error': 'No image provided'}), 400
         
-        print(f"[DEBUG] Image data ready, length: {len(image_data)}")
-        print(f"[DEBUG] First 50 chars of image data: {image_data[:50]}")
-        
         # Get AI response for image
-        print(f"[DEBUG] Calling get_ai_response with image...")
-        reply = get_ai_response(f"{question}\n\n[Image Analysis]", image_data)
-        print(f"[DEBUG] Got reply: {reply[:100]}...")
+        result = run_ai_call(generate_ai_response, f"{question}\n\n[Image Analysis]", image_data,
+                             use_cache=cache_allowed(request))
+        reply = result.text
+        log.debug("Got reply: %.100r", reply)
         
         return jsonify({
             'question': question,
             'reply': reply,
             'response': reply
-        }), 200
+        }), 200, result.response_headers()
+    except InvalidImageData as e:
+        return jsonify({'error': str(e)}), 400
+    except (AIBusyError, ImageTooLarge, RequestEntityTooLarge):
+        raise
     except Exception as e:
-        print(f"[ERROR] Image analysis error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Image analysis error: %s", e)
         return jsonify({'error': f'Image analysis error: {str(e)}'}), 500
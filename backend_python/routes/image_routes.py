@@ -0,0 +1,51 @@
+from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import verify_jwt_in_request, current_user
+from database import db
+from models import Message
+from utils.blob_store import get_blob_store, verify_image_signature, DIGEST_RE, IMAGE_URL_TTL
+
+bp = Blueprint('images', __name__, url_prefix='/api/images')
+
+def _authorized_for(digest):
+    """
+    Seconds the response may be cached for, or None if the caller may not see the image
+    Accepts the signed URL from a message's `image` field, or a JWT whose user sent the image
+    """
+    if request.args.get('s'):
+        return verify_image_signature(digest, request.args.get('u'), request.args.get('e'), request.args.get('s'))
+    if verify_jwt_in_request(optional=True) is None:
+        return None
+    owned = db.session.query(
+        Message.query.filter_by(image_digest=digest, user_id=current_user.id).exists()
+    ).scalar()
+    return IMAGE_URL_TTL if owned else None
+
+@bp.route('/<digest>', methods=['GET'])
+def get_image(digest):
+    """Serve a user's image from the content-addressed blob store"""
+    store = get_blob_store()
+
+    # Not found rather than forbidden, so the endpoint doesn't reveal which images exist
+    if not DIGEST_RE.match(digest):
+        return jsonify({'error': 'Image not found'}), 404
+    max_age = _authorized_for(digest)
+    if max_age is None or not store.exists(digest):
+        return jsonify({'error': 'Image not found'}), 404
+    mimetype = store.content_type(digest)
+    if not mimetype.startswith('image/'):
+        return jsonify({'error': 'Image not found'}), 404
+
+    # Blobs never change (the URL is their hash), but they are personal: browsers may
+    # keep them, shared caches and CDNs must not
+    response = send_file(
+        store.path_for(digest),
+        mimetype=mimetype,
+        etag=digest,
+        max_age=max_age,
+        conditional=True
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -1,12 +1,30 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from datetime import datetime
 from database import db
 from models import Message, ChatHistory, User
-from utils.ai_service import get_ai_response
+from utils.ai_service import generate_ai_response, stream_ai_response
+from utils.streaming import wants_stream, sse_event, sse_response
+from utils.ai_executor import run_ai_call, acquire_ai_call_slot, AIBusyError
+from utils.response_cache import cache_allowed
+from utils.similar_cache import similar_cache_allowed
+from utils.blob_store import store_image, InvalidImageData
+from utils.image_pipeline import decode_upload, ImageTooLarge
+from utils.logger import get_logger
+from utils.identity import get_owned_chat, owns_chat
+from utils.pagination import paginate_messages, parse_limit, InvalidCursor
+from utils.search import search_messages, SearchUnavailable
+from utils.context_builder import build_context
+from concurrent.futures import ThreadPoolExecutor
 import base64
+import os
 
 bp = Blueprint('message', __name__, url_prefix='/api/messages')
+log = get_logger('message_routes')
+
+# Batch send: prompts per request, and how many of them are answered concurrently
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '50'))
+BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', '8'))
 
 @bp.route('/<int:chat_id>/send', methods=['POST'])
 @jwt_required()
@@ -16,7 +34,7 @@ def send_message(chat_id):
     data = request.get_json()
     
     # Verify chat belongs to user
-    chat = ChatHistory.query.filter_by(id=chat_id, user_id=user_id).first()
+    chat = get_owned_chat(chat_id)
     if not chat:
         return jsonify({'error': 'Chat not found'}), 404
     
@@ -32,40 +50,207 @@ def send_message(chat_id):
     if not message_text.strip():
         return jsonify({'error': 'Message cannot be empty'}), 400
     
-    # Save user message
-    user_message = Message(
-        chat_id=chat_id,
-        user_id=user_id,
-        text=message_text,
-        sender='user',
-        image_url=image_data
-    )
+    # Images live in the blob store; the row only keeps the digest
+    image_digest = None
+    if image_data:
+        try:
+            # Decode once (size and header checked, 413 if too large); the blob
+            # store and the image pipeline both take the raw bytes
+            image_data = decode_upload(image_data)
+            image_digest = store_image(image_data)
+        except InvalidImageData as e:
+            return jsonify({'error': str(e)}), 400
     
-    db.session.add(user_message)
-    db.session.commit()
+    # Earlier turns for the model; built before the new message so it isn't included twice
+    context = build_context(chat)
+    turn = (message_text, image_digest, datetime.utcnow())
+    use_cache = cache_allowed(request, data)
+    use_similar = similar_cache_allowed(request, data)
+    
+    # Nothing is written until the reply is in: no connection is held during the
+    # model call, and a failed call leaves no unanswered user message behind
+    chat_updates = _release_connection(chat)
+    
+    if wants_stream(request, data):
+        # The slot is taken up front (503 when busy) and held until the stream closes
+        release_slot = acquire_ai_call_slot()
+        return sse_response(_stream_bot_reply(chat_id, user_id, turn, chat_updates, image_data,
+                                              use_cache, context, use_similar),
+                            on_close=release_slot)
     
     # Get AI response (pass image data for analysis if present)
-    ai_response_text = get_ai_response(message_text, image_data)
+    result = run_ai_call(generate_ai_response, message_text, image_data,
+                         use_cache=use_cache, context=context, use_similar=use_similar)
     
-    # Save AI response
-    ai_message = Message(
-        chat_id=chat_id,
-        user_id=user_id,
-        text=ai_response_text,
-        sender='bot'
-    )
+    [(user_message, ai_message)] = _save_turns(chat_id, user_id, [(*turn, result.text)], chat_updates)
     
-    db.session.add(ai_message)
-    db.session.commit()
+    return jsonify({
+        'user_message': user_message,
+        'ai_message': ai_message
+    }), 201, result.response_headers()
+
+@bp.route('/<int:chat_id>/send-batch', methods=['POST'])
+@jwt_required()
+def send_batch(chat_id):
+    """
+    Send many prompts to a chat in one request
     
-    # Update chat timestamp
-    chat.updated_at = datetime.utcnow()
-    db.session.commit()
+    Body: {"messages": [{"text": ..., "image": optional}, ...] (or plain strings),
+           "cache": optional, "max_parallel": optional}
+    Each prompt is answered independently with the chat's context as it was before
+    the batch. Answers are fetched concurrently (at most BATCH_MAX_PARALLEL at a time),
+    then every user/bot message pair is written in a single transaction. Results
+    come back in request order; failed items carry an error and save nothing.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    
+    chat = get_owned_chat(chat_id)
+    if not chat:
+        return jsonify({'error': 'Chat not found'}), 404
+    
+    items = data.get('messages')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'messages must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BATCH_MAX_ITEMS} messages per batch'}), 400
+    
+    # Validate every item up front; only valid ones go to the model
+    prompts = []
+    results = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {'text': item}
+        text = item.get('text', '') if isinstance(item, dict) else ''
+        if not isinstance(text, str):
+            results.append({'index': index, 'error': 'text must be a string'})
+            continue
+        text = text.strip()
+        if not text:
+            results.append({'index': index, 'error': 'Message cannot be empty'})
+            continue
+        image_data = image_digest = None
+        if item.get('image'):
+            try:
+                image_data = decode_upload(item['image'])
+                image_digest = store_image(image_data)
+            except (InvalidImageData, ImageTooLarge) as e:
+                results.append({'index': index, 'error': str(e)})
+                continue
+        prompts.append((index, text, image_data, image_digest))
+        results.append(None)
+    
+    context = build_context(chat)
+    use_cache = cache_allowed(request, data)
+    use_similar = similar_cache_allowed(request, data)
+    chat_updates = _release_connection(chat)
+    
+    def answer(prompt):
+        _, text, image_data, _ = prompt
+        try:
+            return run_ai_call(generate_ai_response, text, image_data, use_cache=use_cache, context=context,
+                               use_similar=use_similar), None
+        except AIBusyError:
+            return None, 'AI service is busy, please retry shortly'
+        except Exception as e:
+            log.exception("Batch item failed: %s", e)
+            return None, f'AI error: {str(e)}'
+    
+    parallel = BATCH_MAX_PARALLEL
+    if isinstance(data.get('max_parallel'), int) and data['max_parallel'] > 0:
+        parallel = min(parallel, data['max_parallel'])
+    answers = []
+    if prompts:
+        with ThreadPoolExecutor(max_workers=min(parallel, len(prompts)), thread_name_prefix='batch-send') as pool:
+            answers = list(pool.map(answer, prompts))
+    
+    # One transaction for the whole batch
+    saved, turns = [], []
+    for (index, text, _, image_digest), (result, error) in zip(prompts, answers):
+        if error:
+            results[index] = {'index': index, 'error': error}
+            continue
+        saved.append((index, result.winner))
+        turns.append((text, image_digest, None, result.text))
+    if turns:
+        for (index, backend), (user_message, ai_message) in zip(saved, _save_turns(chat_id, user_id, turns,
+                                                                                    chat_updates)):
+            results[index] = {
+                'index': index,
+                'user_message': user_message,
+                'ai_message': ai_message,
+                'backend': backend
+            }
     
     return jsonify({
-        'user_message': user_message.to_dict(),
-        'ai_message': ai_message.to_dict()
-    }), 201
+        'results': results,
+        'succeeded': len(saved),
+        'failed': len(results) - len(saved)
+    }), 200
+
+def _stream_bot_reply(chat_id, user_id, turn, chat_updates, image_data, use_cache=True, context=None,
+                      use_similar=False):
+    """SSE generator: forwards AI chunks, then saves the turn once the stream completes"""
+    parts = []
+    try:
+        for chunk in stream_ai_response(turn[0], image_data, use_cache=use_cache, context=context,
+                                        use_similar=use_similar):
+            parts.append(chunk)
+            yield sse_event({'delta': chunk})
+    except Exception as e:
+        log.error("Message stream error: %s", e)
+        yield sse_event({'error': f'Stream error: {str(e)}'}, event='error')
+        return
+    
+    [(user_message, ai_message)] = _save_turns(chat_id, user_id, [(*turn, ''.join(parts))], chat_updates)
+    
+    yield sse_event({
+        'user_message': user_message,
+        'ai_message': ai_message
+    }, event='done')
+
+def _release_connection(chat):
+    """
+    End the request's read transaction before a slow model call
+    
+    Returns the chat columns build_context() changed (the rolling summary), to be
+    written by _save_turns() together with the new messages
+    """
+    updates = {}
+    if db.session.is_modified(chat):
+        updates = {'summary': chat.summary, 'summary_through_id': chat.summary_through_id}
+    db.session.close()
+    return updates
+
+def _save_turns(chat_id, user_id, turns, chat_updates=None):
+    """
+    Write user/bot message pairs and touch the chat in a single commit
+    
+    Args:
+        turns: List of (user_text, image_digest, sent_at, reply_text); sent_at=None
+               means now
+        chat_updates: Other ChatHistory columns to set in the same UPDATE
+    
+    Returns:
+        List of (user_message, ai_message) dicts, serialized before the commit so
+        the rows aren't reloaded one at a time afterwards
+    """
+    pairs = []
+    for text, image_digest, sent_at, reply in turns:
+        # Explicit timestamps keep each pair in order for the (created_at, id) listing
+        user_message = Message(chat_id=chat_id, user_id=user_id, text=text, sender='user',
+                               image_digest=image_digest, created_at=sent_at or datetime.utcnow())
+        ai_message = Message(chat_id=chat_id, user_id=user_id, text=reply, sender='bot',
+                             created_at=datetime.utcnow())
+        db.session.add(user_message)
+        db.session.add(ai_message)
+        pairs.append((user_message, ai_message))
+    
+    ChatHistory.query.filter_by(id=chat_id).update({**(chat_updates or {}), 'updated_at': datetime.utcnow()})
+    db.session.flush()
+    serialized = [(user_message.to_dict(), ai_message.to_dict()) for user_message, ai_message in pairs]
+    db.session.commit()
+    return serialized
 
 @bp.route('/<int:chat_id>/send-image-query', methods=['POST'])
 @jwt_required()
@@ -75,7 +260,7 @@ def send_image_query(chat_id):
     data = request.get_json()
     
     # Verify chat belongs to user
-    chat = ChatHistory.query.filter_by(id=chat_id, user_id=user_id).first()
+    chat = get_owned_chat(chat_id)
     if not chat:
         return jsonify({'error': 'Chat not found'}), 404
     
@@ -85,54 +270,73 @@ def send_image_query(chat_id):
     if not image_data:
         return jsonify({'error': 'Image data required'}), 400
     
-    # Save user message with image
-    user_message = Message(
-        chat_id=chat_id,
-        user_id=user_id,
-        text=f"Image Query: {query_text}",
-        sender='user',
-        image_url=image_data
-    )
+    try:
+        image_data = decode_upload(image_data)
+        image_digest = store_image(image_data)
+    except InvalidImageData as e:
+        return jsonify({'error': str(e)}), 400
     
-    db.session.add(user_message)
-    db.session.commit()
+    context = build_context(chat)
+    sent_at = datetime.utcnow()
+    chat_updates = _release_connection(chat)
     
     # Get AI response for image analysis
-    ai_response_text = get_ai_response(query_text, image_data)
-    
-    # Save AI response
-    ai_message = Message(
-        chat_id=chat_id,
-        user_id=user_id,
-        text=ai_response_text,
-        sender='bot'
-    )
+    result = run_ai_call(generate_ai_response, query_text, image_data,
+                         use_cache=cache_allowed(request, data), context=context)
     
-    db.session.add(ai_message)
-    db.session.commit()
-    
-    # Update chat timestamp
-    chat.updated_at = datetime.utcnow()
-    db.session.commit()
+    # Save the user message with its image and the AI response together
+    [(user_message, ai_message)] = _save_turns(
+        chat_id, user_id, [(f"Image Query: {query_text}", image_digest, sent_at, result.text)], chat_updates)
     
     return jsonify({
-        'user_message': user_message.to_dict(),
-        'ai_message': ai_message.to_dict()
-    }), 201
+        'user_message': user_message,
+        'ai_message': ai_message
+    }), 201, result.response_headers()
 
 @bp.route('/<int:chat_id>/messages', methods=['GET'])
 @jwt_required()
 def get_messages(chat_id):
-    """Get all messages in a chat"""
-    user_id = get_jwt_identity()
+    """Get a page of messages in a chat (?limit=&before=&after= cursors)"""
+    user_id = current_user.id
     
-    chat = ChatHistory.query.filter_by(id=chat_id, user_id=user_id).first()
-    if not chat:
+    # Polled constantly: ownership comes from the per-worker cache when possible, and
+    # the user_id filter keeps a stale entry from ever returning someone else's rows
+    if not owns_chat(chat_id):
         return jsonify({'error': 'Chat not found'}), 404
     
-    messages = Message.query.filter_by(chat_id=chat_id).order_by(Message.created_at).all()
+    try:
+        page = paginate_messages(
+            Message.query.filter_by(chat_id=chat_id, user_id=user_id),
+            limit=parse_limit(request.args.get('limit')),
+            before=request.args.get('before'),
+            after=request.args.get('after')
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'messages': [msg.to_dict() for msg in page['messages']],
+        'prev_cursor': page['prev_cursor'],
+        'next_cursor': page['next_cursor']
+    }), 200
+
+@bp.route('/search', methods=['GET'])
+@jwt_required()
+def search():
+    """Search the user's messages across all chats (?q=&limit=&after= cursor), best match first"""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    
+    try:
+        page = search_messages(current_user.id, q, limit=parse_limit(request.args.get('limit'), default=20),
+                               after=request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except SearchUnavailable as e:
+        return jsonify({'error': str(e)}), 501
     
-    return jsonify([msg.to_dict() for msg in messages]), 200
+    return jsonify(page), 200
 
 @bp.route('/<int:message_id>', methods=['DELETE'])
 @jwt_required()
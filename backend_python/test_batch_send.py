@@ -0,0 +1,104 @@
+"""
+Tests for POST /api/messages/<chat_id>/send-batch
+Runs in-process with the fake Gemini model: no live server or API key needed
+
+    python -m pytest test_batch_send.py
+"""
+import base64
+import io
+
+from sqlalchemy import event
+from database import db
+from benchmarks.fake_llm import install_fake_gemini
+
+
+def _create_chat(client, headers):
+    return client.post('/api/chat/create', json={'title': 'batch'}, headers=headers).get_json()['id']
+
+
+def test_batch_results_in_order_with_item_errors(app, client, login):
+    fake = install_fake_gemini(latency=0.1)
+    headers = login('batcher')
+    chat_id = _create_chat(client, headers)
+
+    commits = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn: commits.append(1)
+    event.listen(engine, 'commit', listener)
+    try:
+        res = client.post(f'/api/messages/{chat_id}/send-batch', headers=headers, json={
+            'messages': [f'question {i}' for i in range(6)] + [{'text': '  '}, {'text': 'last', 'image': 'not-an-image'}],
+            'cache': False
+        })
+    finally:
+        event.remove(engine, 'commit', listener)
+
+    assert res.status_code == 200
+    body = res.get_json()
+    assert body['succeeded'] == 6 and body['failed'] == 2
+    results = body['results']
+    assert [r['index'] for r in results] == list(range(8))
+    for i in range(6):
+        assert results[i]['user_message']['text'] == f'question {i}'
+        assert results[i]['ai_message']['text'] == f'Fake answer to: question {i}'
+    assert 'error' in results[6] and 'error' in results[7]
+    # The six model calls overlapped, and all rows were written in one commit
+    assert fake.peak_in_flight > 1
+    assert len(commits) == 1
+
+    listing = client.get(f'/api/messages/{chat_id}/messages', headers=headers).get_json()['messages']
+    assert [m['text'] for m in listing[:2]] == ['question 0', 'Fake answer to: question 0']
+    assert len(listing) == 12
+
+
+def test_batch_checks_ownership_and_size(client, login):
+    owner = login('batch-owner')
+    other = login('batch-other')
+    chat_id = _create_chat(client, owner)
+
+    res = client.post(f'/api/messages/{chat_id}/send-batch', headers=other, json={'messages': ['hi']})
+    assert res.status_code == 404
+    res = client.post(f'/api/messages/{chat_id}/send-batch', headers=owner, json={'messages': []})
+    assert res.status_code == 400
+    res = client.post(f'/api/messages/{chat_id}/send-batch', headers=owner, json={'messages': ['q'] * 1000})
+    assert res.status_code == 400
+
+
+def test_non_string_items_are_item_errors(client, login):
+    install_fake_gemini()
+    headers = login('batch-types')
+    chat_id = _create_chat(client, headers)
+
+    res = client.post(f'/api/messages/{chat_id}/send-batch', headers=headers, json={
+        'messages': [{'text': 42}, {'text': ['a']}, {'text': None}, 7, 'fine'],
+        'cache': False
+    })
+    assert res.status_code == 200
+    results = res.get_json()['results']
+    assert [r.get('error') for r in results[:3]] == ['text must be a string'] * 3
+    assert 'error' in results[3]
+    assert 'ai_message' in results[4]
+
+
+def test_oversized_image_is_an_item_error(client, login, monkeypatch):
+    from PIL import Image
+    from utils import image_pipeline
+
+    install_fake_gemini()
+    headers = login('batch-images')
+    chat_id = _create_chat(client, headers)
+    out = io.BytesIO()
+    Image.new('RGB', (64, 64), 'red').save(out, format='PNG')
+    image = 'data:image/png;base64,' + base64.b64encode(out.getvalue()).decode('ascii')
+    monkeypatch.setattr(image_pipeline, 'IMAGE_MAX_PIXELS', 32 * 32)
+
+    res = client.post(f'/api/messages/{chat_id}/send-batch', headers=headers, json={
+        'messages': ['before', {'text': 'too big', 'image': image}, 'after'],
+        'cache': False
+    })
+    assert res.status_code == 200
+    body = res.get_json()
+    assert (body['succeeded'], body['failed']) == (2, 1)
+    assert 'pixels' in body['results'][1]['error']
+    assert body['results'][2]['ai_message']['text'] == 'Fake answer to: after'
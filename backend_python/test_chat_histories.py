@@ -0,0 +1,47 @@
+"""
+Regression test: the chat sidebar listing must not issue a query per chat
+Runs in-process: no live server or API key needed
+
+    python -m pytest test_chat_histories.py
+"""
+
+
+def _create_chats(client, headers, count, messages_per_chat=2):
+    for i in range(count):
+        chat_id = client.post('/api/chat/create', json={'title': f'chat {i}'}, headers=headers).get_json()['id']
+        for j in range(messages_per_chat):
+            client.post(f'/api/messages/{chat_id}/send', json={'text': f'message {j}'}, headers=headers)
+
+
+def _list_histories(client, count_queries, headers):
+    with count_queries() as statements:
+        res = client.get('/api/chat/histories', headers=headers)
+    assert res.status_code == 200
+    return res.get_json(), len(statements)
+
+
+def test_histories_query_count_is_constant(client, login, count_queries):
+    headers = login('sidebar')
+
+    _create_chats(client, headers, 3)
+    histories, queries_small = _list_histories(client, count_queries, headers)
+    assert len(histories) == 3
+
+    _create_chats(client, headers, 30)
+    histories, queries_large = _list_histories(client, count_queries, headers)
+    assert len(histories) == 33
+    assert queries_large == queries_small
+
+
+def test_histories_message_counts(client, login, count_queries):
+    headers = login('counter')
+
+    empty_id = client.post('/api/chat/create', json={'title': 'empty'}, headers=headers).get_json()['id']
+    _create_chats(client, headers, 1, messages_per_chat=3)
+
+    histories, _ = _list_histories(client, count_queries, headers)
+    counts = {chat['id']: chat['message_count'] for chat in histories}
+    assert counts.pop(empty_id) == 0
+    # Each send stores the user message and the bot reply
+    assert list(counts.values()) == [6]
+
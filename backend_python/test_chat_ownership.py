@@ -0,0 +1,55 @@
+"""
+Regression test: polling a chat's messages repeats no user or ownership lookups
+Runs in-process: no live server or API key needed
+
+    python -m pytest test_chat_ownership.py
+"""
+from utils.identity import get_ownership_cache
+
+
+def _poll(client, count_queries, headers, chat_id):
+    with count_queries() as statements:
+        res = client.get(f'/api/messages/{chat_id}/messages', headers=headers)
+    return res, statements
+
+
+def test_polling_skips_ownership_query(client, login, count_queries):
+    headers = login('poller')
+    chat_id = client.post('/api/chat/create', json={'title': 'poll'}, headers=headers).get_json()['id']
+    client.post(f'/api/messages/{chat_id}/send', json={'text': 'hello'}, headers=headers)
+    get_ownership_cache().clear()
+
+    res, first = _poll(client, count_queries, headers, chat_id)
+    assert res.status_code == 200
+    res, second = _poll(client, count_queries, headers, chat_id)
+    assert res.status_code == 200
+    assert len(res.get_json()['messages']) == 2
+
+    # The first poll confirms ownership; later ones only read the page
+    assert len(second) == len(first) - 1
+    assert not any('FROM users' in s for s in first + second)
+    assert not any('FROM chat_histories' in s for s in second)
+
+
+def test_me_loads_user_once(client, login, count_queries):
+    headers = login('whoami')
+
+    with count_queries() as statements:
+        res = client.get('/api/auth/me', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json()['username'] == 'whoami'
+    assert len([s for s in statements if 'FROM users' in s]) == 1
+
+
+def test_other_user_and_deleted_chat_are_not_found(client, login):
+    owner = login('owner')
+    intruder = login('intruder')
+    chat_id = client.post('/api/chat/create', json={'title': 'private'}, headers=owner).get_json()['id']
+
+    assert client.get(f'/api/messages/{chat_id}/messages', headers=owner).status_code == 200
+    assert client.get(f'/api/messages/{chat_id}/messages', headers=intruder).status_code == 404
+    assert client.post(f'/api/chat/{chat_id}/clear', headers=intruder).status_code == 404
+
+    assert client.delete(f'/api/chat/{chat_id}/delete', headers=owner).status_code == 200
+    assert client.get(f'/api/messages/{chat_id}/messages', headers=owner).status_code == 404
+
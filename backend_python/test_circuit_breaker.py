@@ -0,0 +1,110 @@
+"""
+State machine tests for the per-backend circuit breaker, on a fake clock
+
+    python -m pytest test_circuit_breaker.py
+"""
+from utils.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def _breaker(clock, **overrides):
+    options = {'window_seconds': 60, 'min_requests': 4, 'error_threshold': 0.5, 'open_seconds': 30,
+               'half_open_probes': 1, 'clock': clock, **overrides}
+    return CircuitBreaker('test', **options)
+
+
+def _open(breaker):
+    for _ in range(breaker.min_requests):
+        breaker.record_failure('boom')
+    assert breaker.state == OPEN
+
+
+def test_trips_at_error_threshold_after_min_requests():
+    breaker = _breaker(FakeClock())
+    for _ in range(3):
+        breaker.record_failure('boom')
+    assert breaker.state == CLOSED  # Fewer than min_requests calls
+
+    breaker = _breaker(FakeClock())
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure('boom')
+    assert breaker.state == CLOSED
+    breaker.record_failure('boom')  # 2 of 4 failed
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.times_opened == 1
+    assert breaker.snapshot()['last_error'] == 'boom'
+
+
+def test_old_failures_leave_the_window():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record_failure('boom')
+    clock.advance(61)
+    breaker.record_failure('boom')
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['requests'] == 1
+
+
+def test_cooldown_then_half_open():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    _open(breaker)
+    clock.advance(29.9)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()['retry_in_seconds'] == 0.1
+    assert not breaker.allow_request()
+    clock.advance(0.1)
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_probe_limit_and_release():
+    clock = FakeClock()
+    breaker = _breaker(clock, half_open_probes=2)
+    _open(breaker)
+    clock.advance(30)
+    assert breaker.allow_request() and breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.release()  # An abandoned probe gives its slot back
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_probe_success_closes_and_clears_window():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    _open(breaker)
+    clock.advance(30)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['requests'] == 0
+    for _ in range(3):
+        breaker.record_failure('boom')  # The pre-open failures no longer count
+    assert breaker.state == CLOSED
+
+
+def test_probe_failure_reopens():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    _open(breaker)
+    clock.advance(30)
+    assert breaker.allow_request()
+    breaker.record_failure('still down')
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow_request()
+    clock.advance(30)
+    assert breaker.allow_request()  # A fresh cool-down, then a fresh probe
@@ -0,0 +1,112 @@
+"""
+Tests for the conversation context: the token budget, eviction into the rolling
+summary, summary capping and chats longer than the scan window
+
+    python -m pytest test_context_builder.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from database import db
+from models import ChatHistory, Message
+from utils import context_builder
+from utils.context_builder import build_context, fold_into_summary, estimate_tokens
+
+
+@pytest.fixture
+def new_chat(app, client, login):
+    """new_chat(username, texts) creates a chat holding one message per text; returns (chat_id, ids)"""
+
+    def new_chat(username, texts, created_at=None):
+        headers = login(username)
+        chat_id = client.post('/api/chat/create', json={'title': 'context'}, headers=headers).get_json()['id']
+        user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+        with app.app_context():
+            messages = [Message(chat_id=chat_id, user_id=user_id, text=text, sender='user' if i % 2 == 0 else 'bot',
+                                created_at=created_at[i] if created_at else None)
+                        for i, text in enumerate(texts)]
+            db.session.add_all(messages)
+            db.session.commit()
+            return chat_id, [m.id for m in messages]
+
+    return new_chat
+
+
+def _build(chat_id, budget):
+    chat = db.session.get(ChatHistory, chat_id)
+    context = build_context(chat, budget=budget)
+    db.session.commit()
+    return context, chat
+
+
+def test_turns_over_budget_are_folded_into_summary(app, new_chat):
+    texts = [f'turn {i}. ' + 'x' * 36 for i in range(6)]  # 12 tokens each
+    chat_id, ids = new_chat('context-evict', texts)
+
+    with app.app_context():
+        context, chat = _build(chat_id, budget=36)
+        assert [text for _, text in context.turns] == texts[3:]  # Newest turns that fit, oldest first
+        assert context.summary.split('\n') == ['User: turn 0.', 'Assistant: turn 1.', 'User: turn 2.']
+        assert chat.summary_through_id == ids[2]
+
+        # Nothing is folded twice; the next build only reads past summary_through_id
+        again, chat = _build(chat_id, budget=36)
+        assert again.summary == context.summary and again.turns == context.turns
+        assert chat.summary_through_id == ids[2]
+
+
+def test_zero_budget_and_empty_chat(app, new_chat):
+    chat_id, _ = new_chat('context-empty', [])
+    with app.app_context():
+        assert not _build(chat_id, budget=2000)[0]
+        assert not _build(chat_id, budget=0)[0]
+
+
+def test_chat_longer_than_the_scan_window(app, new_chat, monkeypatch):
+    monkeypatch.setattr(context_builder, 'CONTEXT_MAX_MESSAGES', 5)
+    texts = [f'message {i}' for i in range(12)]
+    chat_id, ids = new_chat('context-long', texts)
+
+    with app.app_context():
+        context, chat = _build(chat_id, budget=2000)
+        assert [text for _, text in context.turns] == texts[7:]
+        # Everything before the window is summarized, not skipped
+        assert context.summary.split('\n') == [f"{'User' if i % 2 == 0 else 'Assistant'}: message {i}" for i in range(7)]
+        assert chat.summary_through_id == ids[6]
+
+        # A tight budget afterwards evicts in-window turns behind the older ones
+        context, chat = _build(chat_id, budget=estimate_tokens('message 10') * 2)
+        assert [text for _, text in context.turns] == texts[10:]
+        assert context.summary.split('\n')[7:] == ['Assistant: message 7', 'User: message 8', 'Assistant: message 9']
+        assert chat.summary_through_id == ids[9]
+
+
+def test_order_follows_ids_not_timestamps(app, new_chat):
+    # Clock skew: later messages carrying earlier timestamps
+    start = datetime(2024, 1, 1)
+    texts = ['first', 'second', 'third', 'fourth']
+    chat_id, ids = new_chat('context-skew', texts, created_at=[start + timedelta(seconds=s) for s in (3, 2, 1, 1)])
+
+    with app.app_context():
+        context, chat = _build(chat_id, budget=estimate_tokens('third') + estimate_tokens('fourth'))
+        assert [text for _, text in context.turns] == ['third', 'fourth']
+        assert context.summary.split('\n') == ['User: first', 'Assistant: second']
+        assert chat.summary_through_id == ids[1]
+
+
+def test_fold_into_summary_caps_and_shortens_lines():
+    class Turn:
+        def __init__(self, sender, text):
+            self.sender, self.text = sender, text
+
+    summary = fold_into_summary(None, [Turn('user', 'How do   I deploy?\nIt keeps failing.'),
+                                       Turn('bot', ''), Turn('bot', 'y' * 400)])
+    lines = summary.split('\n')
+    assert lines[0] == 'User: How do I deploy?'  # First sentence, whitespace collapsed
+    assert len(lines) == 2  # Empty texts add nothing
+    assert lines[1].endswith('...') and len(lines[1]) == len('Assistant: ') + context_builder.SUMMARY_LINE_CHARS
+
+    capped = fold_into_summary(summary, [Turn('user', f'question {i}') for i in range(20)], max_tokens=20)
+    assert estimate_tokens(capped) <= 20
+    assert capped.split('\n')[-1] == 'User: question 19'  # Oldest lines are dropped first
+    assert fold_into_summary(None, [], max_tokens=20) is None
@@ -0,0 +1,187 @@
+"""
+Behavioural tests for the AI fallback orchestrator, driven by fake backends:
+sequential fallback, hedging and priority, per-backend timeouts, the overall
+deadline and circuit breaker bookkeeping
+
+    python -m pytest test_fallback.py
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from utils.fallback import Backend, FallbackOrchestrator
+from utils.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN
+from benchmarks.fake_llm import install_fake_gemini
+
+
+@pytest.fixture(scope='module')
+def executor():
+    pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='test-fallback')
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _backend(name, reply=None, delay=0.0, error=None, **options):
+    """A Backend that sleeps `delay`, then raises `error` or returns `reply`; records its start times"""
+    starts = []
+
+    def fn(user_input, image_data=None):
+        starts.append(time.perf_counter())
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return reply
+
+    backend = Backend(name, fn, **options)
+    backend.starts = starts
+    return backend
+
+
+def _run(executor, backends, deadline=2.0, hedge_delay=None):
+    orchestrator = FallbackOrchestrator(backends, final_backend=_backend('canned', 'canned', local=True),
+                                        deadline=deadline, hedge_delay=hedge_delay, executor=executor)
+    return orchestrator.run('question')
+
+
+def _statuses(result):
+    return {a.name: a.status for a in result.attempts}
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker('test', min_requests=1, open_seconds=0)
+    breaker.record_failure('down')
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def test_sequential_fallback_in_priority_order(executor):
+    first = _backend('first', None, delay=0.05)
+    second = _backend('second', error=RuntimeError('boom'))
+    third = _backend('third', 'third answer')
+    started = time.perf_counter()
+    result = _run(executor, [first, second, third])
+
+    assert (result.text, result.winner) == ('third answer', 'third')
+    assert _statuses(result) == {'first': 'miss', 'second': 'error', 'third': 'ok'}
+    assert result.attempts[1].error == 'boom'
+    # Without hedging each backend starts only after the one before it finished
+    assert second.starts[0] - started >= 0.05
+    assert third.starts[0] >= second.starts[0]
+    assert set(result.timings()) == {'first', 'second', 'third'}
+
+
+def test_everything_misses_uses_final_backend(executor):
+    result = _run(executor, [_backend('only', None), _backend('off', 'x', enabled=lambda: False)])
+    assert (result.text, result.winner) == ('canned', 'canned')
+    assert _statuses(result) == {'only': 'miss', 'off': 'skipped', 'canned': 'ok'}
+
+
+def test_hedged_backend_starts_after_delay_but_priority_wins(executor):
+    slow_primary = _backend('primary', 'primary answer', delay=0.15)
+    fast_secondary = _backend('secondary', 'secondary answer', delay=0.01)
+    started = time.perf_counter()
+    result = _run(executor, [slow_primary, fast_secondary], hedge_delay=0.03)
+    elapsed = time.perf_counter() - started
+
+    hedge_after = fast_secondary.starts[0] - started
+    assert 0.03 <= hedge_after < 0.1
+    # The secondary answered first, but the primary was still running and answered in time
+    assert (result.text, result.winner) == ('primary answer', 'primary')
+    assert elapsed >= 0.15
+
+
+def test_hedged_answer_wins_when_primary_fails(executor):
+    failing_primary = _backend('primary', error=RuntimeError('boom'), delay=0.1)
+    secondary = _backend('secondary', 'secondary answer', delay=0.01)
+    started = time.perf_counter()
+    result = _run(executor, [failing_primary, secondary], hedge_delay=0.02)
+    elapsed = time.perf_counter() - started
+
+    assert result.winner == 'secondary'
+    assert _statuses(result) == {'primary': 'error', 'secondary': 'ok'}
+    assert 0.1 <= elapsed < 0.3  # Waited for the primary's verdict, not for a sequential retry
+
+
+def test_backend_timeout_moves_on_and_counts_as_failure(executor):
+    breaker = CircuitBreaker('slow', min_requests=1, error_threshold=1.0)
+    slow = _backend('slow', 'too late', delay=0.3, timeout=0.05, breaker=breaker)
+    fast = _backend('fast', 'fast answer')
+    started = time.perf_counter()
+    result = _run(executor, [slow, fast])
+    elapsed = time.perf_counter() - started
+
+    assert result.winner == 'fast'
+    assert _statuses(result)['slow'] == 'timeout'
+    assert elapsed < 0.2
+    assert breaker.snapshot()['failures'] == 1
+
+
+def test_deadline_falls_back_to_final_backend(executor):
+    result_start = time.perf_counter()
+    result = _run(executor, [_backend('hung', 'never', delay=0.5)], deadline=0.1)
+    elapsed = time.perf_counter() - result_start
+
+    assert result.winner == 'canned'
+    assert _statuses(result)['hung'] == 'timeout'
+    assert 0.1 <= elapsed < 0.3
+
+
+def test_abandoned_probe_releases_breaker(executor):
+    breaker = _half_open_breaker()
+    primary = _backend('primary', 'primary answer', delay=0.05)
+    probe = _backend('probe', 'late', delay=0.3, breaker=breaker)
+    result = _run(executor, [primary, probe], hedge_delay=0.01)
+
+    assert result.winner == 'primary'
+    assert _statuses(result)['probe'] == 'cancelled'
+    # The losing probe's outcome is unknown: its slot is given back, the circuit stays half-open
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_breaker_outcomes(executor):
+    breaker = _half_open_breaker()
+    result = _run(executor, [_backend('flaky', 'recovered', breaker=breaker)])
+    assert result.winner == 'flaky'
+    assert breaker.state == CLOSED  # A successful probe closes the circuit
+
+    breaker = _half_open_breaker()
+    assert breaker.allow_request()  # Another request holds the only probe slot
+    result = _run(executor, [_backend('flaky', 'unused', breaker=breaker), _backend('next', 'next answer')])
+    assert _statuses(result)['flaky'] == 'circuit_open'
+    assert result.winner == 'next'
+
+    breaker = _half_open_breaker()
+    _run(executor, [_backend('empty', None, breaker=breaker, miss_is_failure=True)])
+    assert breaker.times_opened == 2  # An empty answer from a backend that hides its errors re-opens it
+
+
+def test_gemini_calls_carry_sdk_timeout(monkeypatch):
+    from utils import ai_service
+
+    fake = install_fake_gemini(latency=0.3)
+    monkeypatch.setattr(ai_service, 'GEMINI_TIMEOUT', 0.05)
+    started = time.perf_counter()
+    assert ai_service.call_gemini_api('are you there?') is None
+    assert time.perf_counter() - started < 0.2  # The call itself gave up; no pool thread left behind
+    fake.latency = 0.0
+    assert ai_service.call_gemini_api('are you there?') == 'Fake answer to: are you there?'
+
+
+def test_gemini_streams_carry_sdk_timeout(monkeypatch):
+    from utils import ai_service
+
+    fake = install_fake_gemini(latency=0.3)
+    monkeypatch.setattr(ai_service, 'GEMINI_TIMEOUT', 0.05)
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        list(ai_service.stream_gemini_api('are you there?'))
+    assert time.perf_counter() - started < 0.2
+
+    # The deadline covers the whole stream, not just the first chunk
+    fake.latency, fake.chunks, fake.chunk_latency = 0.0, 3, 0.3
+    stream = ai_service.stream_gemini_api('are you still there?')
+    assert next(stream)
+    with pytest.raises(TimeoutError):
+        next(stream)
+    assert fake.in_flight == 0
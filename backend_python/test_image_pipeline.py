@@ -0,0 +1,141 @@
+"""
+Tests for the image pipeline: resize bounds, format conversion, EXIF handling,
+the prepared-image cache and oversize rejection
+
+    python -m pytest test_image_pipeline.py
+"""
+import base64
+import io
+
+import pytest
+from PIL import Image
+from utils import image_pipeline
+from utils.image_pipeline import (ImageTooLarge, InvalidImageData, PreparedImage, _PreparedImageCache, check_image,
+                                  check_encoded_size, decode_upload, prepare_image, process_image)
+
+
+def _encode(image, format, **params):
+    out = io.BytesIO()
+    image.save(out, format=format, **params)
+    return out.getvalue()
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(image_pipeline, '_cache', _PreparedImageCache(1024 * 1024))
+
+
+@pytest.mark.parametrize('format', ['JPEG', 'PNG'])
+def test_longest_side_is_capped_and_aspect_kept(format):
+    raw = _encode(Image.new('RGB', (3000, 1500), 'navy'), format)
+    data, mime_type, size = process_image(raw, max_side=1536)
+    assert size == (1536, 768)
+    assert _open(data).size == size
+
+    # Draft decoding of a JPEG must not undershoot the target on the short side
+    assert process_image(_encode(Image.new('RGB', (4000, 1000)), format), max_side=100)[2] == (100, 25)
+
+
+def test_small_images_are_not_upscaled():
+    assert process_image(_encode(Image.new('RGB', (40, 30)), 'PNG'), max_side=1536)[2] == (40, 30)
+
+
+def test_format_conversion():
+    opaque = process_image(_encode(Image.new('RGB', (16, 16), 'red'), 'PNG'))
+    assert opaque[1] == 'image/jpeg' and _open(opaque[0]).format == 'JPEG'
+
+    grey = process_image(_encode(Image.new('L', (16, 16), 128), 'PNG'))
+    assert grey[1] == 'image/jpeg'
+
+    expected = 'image/webp' if image_pipeline._webp_supported() else 'image/png'
+    rgba = process_image(_encode(Image.new('RGBA', (16, 16), (255, 0, 0, 0)), 'PNG'))
+    assert rgba[1] == expected
+    assert _open(rgba[0]).mode in ('RGBA', 'LA')  # Transparency survives
+
+    palette = Image.new('P', (16, 16), 0)
+    assert process_image(_encode(palette, 'PNG', transparency=0))[1] == expected
+
+
+def test_exif_orientation_applied_and_metadata_dropped():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+    exif[0x010F] = 'Camera Maker'
+    exif[0x0131] = 'Secret Editor 1.0'
+    raw = _encode(Image.new('RGB', (40, 20), 'white'), 'JPEG', exif=exif.tobytes())
+    assert _open(raw).getexif()[0x010F] == 'Camera Maker'
+
+    data, _, size = process_image(raw)
+    assert size == (20, 40)  # Portrait, as displayed
+    out = _open(data)
+    assert not out.getexif()
+    assert 'exif' not in out.info and 'icc_profile' not in out.info
+
+
+def test_prepare_image_caches_by_digest(monkeypatch):
+    raw = _encode(Image.new('RGB', (32, 32), 'green'), 'PNG')
+    calls = []
+    real_process_image = image_pipeline.process_image
+    monkeypatch.setattr(image_pipeline, 'process_image', lambda source: calls.append(1) or real_process_image(source))
+
+    first = prepare_image(raw)
+    assert isinstance(first, PreparedImage) and first.mime_type == 'image/jpeg'
+    # The same bytes as base64, a data URL or a stream hit the cache
+    assert prepare_image(base64.b64encode(raw).decode('ascii')) is first
+    assert prepare_image('data:image/png;base64,' + base64.b64encode(raw).decode('ascii')) is first
+    assert prepare_image(io.BytesIO(raw)) is first
+    assert prepare_image(first) is first
+    assert len(calls) == 1
+
+    # The cache key includes the output settings
+    monkeypatch.setattr(image_pipeline, 'IMAGE_MAX_SIDE', 16)
+    assert prepare_image(raw).size == (16, 16)
+    assert len(calls) == 2
+
+
+def test_cache_is_bounded_in_bytes():
+    cache = _PreparedImageCache(max_bytes=10)
+    for key in 'abc':
+        cache.set(key, PreparedImage(b'x' * 4, 'image/jpeg', (1, 1), key))
+    assert cache.get('a') is None  # Oldest evicted once over 10 bytes
+    assert cache.get('b') is not None and cache.get('c') is not None
+    cache.set('big', PreparedImage(b'x' * 11, 'image/jpeg', (1, 1), 'big'))
+    assert cache.get('big') is None  # Larger than the whole cache: never stored
+    assert cache.get('b') is not None
+
+
+def test_oversize_uploads_are_rejected(monkeypatch):
+    raw = _encode(Image.new('RGB', (100, 100)), 'PNG')
+    assert check_image(raw) == ('PNG', (100, 100))
+
+    monkeypatch.setattr(image_pipeline, 'IMAGE_MAX_BYTES', len(raw) - 1)
+    with pytest.raises(ImageTooLarge):
+        check_image(raw)
+    with pytest.raises(ImageTooLarge):
+        check_image(io.BytesIO(raw))
+    with pytest.raises(ImageTooLarge):
+        check_encoded_size(base64.b64encode(raw + b'pad').decode('ascii'))
+    with pytest.raises(ImageTooLarge):
+        decode_upload(base64.b64encode(raw).decode('ascii'))
+
+    monkeypatch.setattr(image_pipeline, 'IMAGE_MAX_BYTES', len(raw))
+    monkeypatch.setattr(image_pipeline, 'IMAGE_MAX_PIXELS', 100 * 100 - 1)
+    with pytest.raises(ImageTooLarge):
+        check_image(raw)
+    with pytest.raises(ImageTooLarge):
+        process_image(raw)
+
+
+def test_streams_are_rewound_and_garbage_rejected():
+    stream = io.BytesIO(_encode(Image.new('RGB', (10, 10)), 'JPEG'))
+    assert check_image(stream) == ('JPEG', (10, 10))
+    assert stream.tell() == 0
+
+    for payload in (b'definitely not an image', b'\x89PNG\r\n\x1a\n truncated'):
+        with pytest.raises(InvalidImageData):
+            check_image(payload)
+        with pytest.raises(InvalidImageData):
+            prepare_image(payload)
@@ -0,0 +1,150 @@
+"""
+Tests for the content-addressed image store and GET /api/images: dedup,
+content validation, signed URLs, owner checks and conditional requests
+
+    python -m pytest test_images.py
+"""
+import base64
+import io
+import os
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+from sqlalchemy import text
+from database import db
+from models import Message
+from migrations import _migration_002_message_image_digest
+from utils.blob_store import (BlobStore, InvalidImageData, get_blob_store, store_image, signed_image_url,
+                              IMAGE_URL_TTL)
+from benchmarks.fake_llm import install_fake_gemini
+
+
+def _png(color='red', size=(8, 8)):
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, format='PNG')
+    return out.getvalue()
+
+
+def _data_url(data):
+    return 'data:image/png;base64,' + base64.b64encode(data).decode('ascii')
+
+
+def _send_image(client, headers, data, text='what is this?'):
+    chat_id = client.post('/api/chat/create', json={'title': 'pictures'}, headers=headers).get_json()['id']
+    res = client.post(f'/api/messages/{chat_id}/send', headers=headers,
+                      json={'text': text, 'image': _data_url(data), 'cache': False})
+    assert res.status_code == 201, res.get_json()
+    return res.get_json()['user_message']['image']
+
+
+def test_blob_store_dedup_and_sharding(tmp_path):
+    store = BlobStore(str(tmp_path))
+    data = _png()
+    digest = store.put(data)
+    assert store.put(data) == digest
+    assert store.path_for(digest) == os.path.join(str(tmp_path), digest[:2], digest[2:4], digest)
+    assert store.read(digest) == data
+    assert store.content_type(digest) == 'image/png'
+    assert [name for _, _, files in os.walk(tmp_path) for name in files] == [digest]  # No temp files left
+    assert not store.exists('../../etc/passwd')
+
+
+def test_store_image_validates_content():
+    data = _png()
+    digest = store_image(_data_url(data))
+    assert get_blob_store().read(digest) == data
+    wrapped = base64.encodebytes(data).decode('ascii')  # Line breaks every 76 characters
+    assert store_image(wrapped) == digest
+
+    for payload in ('not base64 at all!', base64.b64encode(b'#!/bin/sh\nrm -rf /').decode('ascii'),
+                    'data:image/png;base64,' + base64.b64encode(b'<html>').decode('ascii'), 42):
+        with pytest.raises(InvalidImageData):
+            store_image(payload)
+
+
+def test_signed_url_serves_owner_privately(app, client, login):
+    install_fake_gemini()
+    headers = login('photographer')
+    url = _send_image(client, headers, _png('blue'))
+    path, query = urlsplit(url).path, parse_qs(urlsplit(url).query)
+    assert set(query) == {'u', 'e', 's'}
+
+    res = client.get(url)  # No Authorization header, as from an <img> tag
+    assert res.status_code == 200
+    assert res.mimetype == 'image/png'
+    cache_control = res.headers['Cache-Control']
+    assert 'private' in cache_control and 'public' not in cache_control
+    assert res.headers['X-Content-Type-Options'] == 'nosniff'
+    assert 0 < res.cache_control.max_age <= 2 * IMAGE_URL_TTL
+    etag = res.headers['ETag']
+    assert etag.strip('"') == path.rsplit('/', 1)[1]
+
+    res = client.get(url, headers={'If-None-Match': etag})
+    assert res.status_code == 304
+
+    # The listing hands out the same URL within a TTL window
+    chat_id = client.get('/api/chat/histories', headers=headers).get_json()[0]['id']
+    listed = client.get(f'/api/messages/{chat_id}/messages', headers=headers).get_json()['messages']
+    assert listed[0]['image'] == url
+
+
+def test_unsigned_tampered_and_expired_urls_are_not_found(app, client, login):
+    install_fake_gemini()
+    headers = login('private-eye')
+    url = _send_image(client, headers, _png('green'))
+    path, query = urlsplit(url).path, parse_qs(urlsplit(url).query)
+    user_id, expires, signature = query['u'][0], query['e'][0], query['s'][0]
+
+    assert client.get(path).status_code == 404
+    assert client.get(path, query_string={'u': user_id, 'e': expires, 's': '0' * 32}).status_code == 404
+    assert client.get(path, query_string={'u': int(user_id) + 1, 'e': expires, 's': signature}).status_code == 404
+    assert client.get(path, query_string={'u': user_id, 'e': int(expires) + 1, 's': signature}).status_code == 404
+    with app.app_context():
+        stale = signed_image_url(path.rsplit('/', 1)[1], user_id, now=0)
+    assert client.get(stale).status_code == 404
+    assert client.get('/api/images/not-a-digest').status_code == 404
+
+
+def test_jwt_owner_check(client, login):
+    install_fake_gemini()
+    owner = login('jwt-owner')
+    other = login('jwt-other')
+    path = urlsplit(_send_image(client, owner, _png('yellow'))).path
+
+    assert client.get(path, headers=owner).status_code == 200
+    assert client.get(path, headers=other).status_code == 404
+
+
+def test_identical_uploads_share_one_blob(app, client, login):
+    install_fake_gemini()
+    data = _png('purple')
+    first = urlsplit(_send_image(client, login('sharer-a'), data)).path
+    second = urlsplit(_send_image(client, login('sharer-b'), data)).path
+    assert first == second
+    digest = first.rsplit('/', 1)[1]
+    with app.app_context():
+        assert Message.query.filter_by(image_digest=digest).count() == 2
+
+
+def test_migration_skips_payloads_that_are_not_images(app, client, login):
+    headers = login('legacy-images')
+    chat_id = client.post('/api/chat/create', json={'title': 'old'}, headers=headers).get_json()['id']
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+    image = _png('orange')
+    with app.app_context():
+        rows = [Message(chat_id=chat_id, user_id=user_id, text=str(i), image_url=payload)
+                for i, payload in enumerate([_data_url(image), base64.b64encode(b'plain text').decode('ascii'),
+                                             'https://example.com/cat.png'])]
+        db.session.add_all(rows)
+        db.session.commit()
+        ids = [m.id for m in rows]
+        with db.engine.begin() as conn:
+            _migration_002_message_image_digest(conn)
+            migrated = conn.execute(text("SELECT id, image_url, image_digest FROM messages WHERE id IN (:a, :b, :c)"
+                                         " ORDER BY id"), dict(zip('abc', ids))).fetchall()
+
+    assert migrated[0].image_url is None and get_blob_store().read(migrated[0].image_digest) == image
+    assert migrated[1].image_digest is None and migrated[1].image_url  # Left alone, nothing stored
+    assert migrated[2].image_url == 'https://example.com/cat.png'
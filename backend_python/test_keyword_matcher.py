@@ -0,0 +1,79 @@
+"""
+Tests for the whole-word phrase matcher behind the knowledge base and canned replies
+
+    python -m pytest test_keyword_matcher.py
+"""
+import json
+
+from utils.keyword_matcher import PhraseMatcher, tokenize, load_knowledge_file
+
+
+def test_only_whole_words_match():
+    greetings = PhraseMatcher(['hi', 'hello'])
+    assert greetings.find('this is a test') is None  # "hi" inside "this"
+    assert greetings.find('which one?') is None
+    assert greetings.find('Hi!') == ('hi', 'hi')
+    assert greetings.find('oh, hi there') == ('hi', 'hi')
+
+    topics = PhraseMatcher([('api', 'API answer')])
+    assert topics.find('a rapid prototype') is None  # "api" inside "rapid"
+    assert topics.find('therapist notes') is None
+    assert topics.find('How do I call this API?') == ('api', 'API answer')
+
+
+def test_plurals_of_single_words():
+    topics = PhraseMatcher([('api', 'API answer'), ('thank you', 'thanks')])
+    assert topics.find('list the APIs') == ('api', 'API answer')
+    assert topics.find('thank yous') is None  # Plurals only stand in for one-word phrases
+    assert PhraseMatcher(['api'], match_plurals=False).find('apis') is None
+
+
+def test_multi_word_phrases():
+    matcher = PhraseMatcher(['good morning', 'see you', 'can you'])
+    assert matcher.find('Good   morning, team') == ('good morning', 'good morning')
+    assert matcher.find('good, morning') == ('good morning', 'good morning')  # Punctuation separates words
+    assert matcher.find('a good day this morning') is None  # Words must be adjacent
+    assert matcher.find('morning good') is None  # And in order
+    assert matcher.find('ok, see you later') == ('see you', 'see you')
+    assert matcher.find('you can') is None
+
+
+def test_earlier_phrases_have_priority():
+    matcher = PhraseMatcher([('react', 'React answer'), ('javascript', 'JS answer'), ('api', 'API answer')])
+    # Priority follows insertion order, not position in the input
+    assert matcher.find('javascript api for react') == ('react', 'React answer')
+    assert matcher.find('an api in javascript') == ('javascript', 'JS answer')
+
+    matcher = PhraseMatcher(['good', 'good morning'])
+    assert matcher.find('good morning') == ('good', 'good')
+    matcher = PhraseMatcher(['good morning', 'good'])
+    assert matcher.find('good morning') == ('good morning', 'good morning')
+
+    matcher.add('evening')
+    assert len(matcher) == 3
+    assert matcher.find('good evening') == ('good', 'good')  # Added phrases rank below existing ones
+
+
+def test_tokenize_keeps_language_names():
+    assert tokenize('C++ and C# vs. Node.js!') == ['c++', 'and', 'c#', 'vs', 'node', 'js']
+    assert PhraseMatcher(['c++']).contains_any('I write C++ daily')
+    assert not PhraseMatcher(['c']).contains_any('I write C++ daily')
+
+
+def test_load_knowledge_file_formats(tmp_path):
+    mapping = tmp_path / 'mapping.json'
+    mapping.write_text(json.dumps({'docker': 'Docker answer', 'k8s': 'Kubernetes answer'}))
+    assert load_knowledge_file(str(mapping)) == [('docker', 'Docker answer'), ('k8s', 'Kubernetes answer')]
+
+    grouped = tmp_path / 'grouped.json'
+    grouped.write_text(json.dumps([{'keywords': ['kubernetes', 'k8s'], 'content': 'Kubernetes answer'}]))
+    assert load_knowledge_file(str(grouped)) == [('kubernetes', 'Kubernetes answer'), ('k8s', 'Kubernetes answer')]
+
+
+def test_canned_replies_use_whole_words():
+    from utils.ai_service import generate_intelligent_response, match_knowledge_base
+
+    assert match_knowledge_base('a rapid prototype') is None
+    assert match_knowledge_base('what is a REST api?').startswith('REST APIs')
+    assert not generate_intelligent_response('this is a test').startswith('Hi there')
+    assert generate_intelligent_response('hi').startswith('Hi there')
@@ -0,0 +1,84 @@
+"""
+Tests for the append-only login_events table: OAuth logins, paging, retention and
+the migration of the old users.login_history JSON blob
+Runs in-process: no live server or API key needed
+
+    python -m pytest test_login_events.py
+"""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from database import db
+from models import User, LoginEvent
+from migrations import _migration_005_login_events
+from utils.login_events import get_login_event_writer, prune_login_events
+
+
+def _history(client, headers, username, **params):
+    res = client.get(f'/api/auth/login-history/{username}', query_string=params, headers=headers)
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def test_oauth_logins_are_paged_newest_first(client, login):
+    headers = login('viewer')
+    for i in range(5):
+        res = client.post('/api/auth/google/callback', json={'code': 'pagedcode'},
+                          headers={'User-Agent': f'agent {i}'})
+        assert res.status_code == 200
+
+    first = _history(client, headers, 'google_user_pagedcod', limit=3)
+    assert [e['user_agent'] for e in first['history']] == ['agent 4', 'agent 3', 'agent 2']
+    assert first['history'][0]['provider'] == 'google'
+    second = _history(client, headers, 'google_user_pagedcod', limit=3, before=first['next_cursor'])
+    assert [e['user_agent'] for e in second['history']] == ['agent 1', 'agent 0']
+    assert second['next_cursor'] is None
+
+    res = client.get('/api/auth/login-history/google_user_pagedcod?before=!!', headers=headers)
+    assert res.status_code == 400
+
+
+def test_events_are_written_in_batches(app):
+    writer = get_login_event_writer()
+    writer.flush()
+    with app.app_context():
+        user_id = User.query.filter_by(username='viewer').first().id
+        before = LoginEvent.query.count()
+    for i in range(10):
+        writer.record(user_id, 'github', f'batch {i}')
+    assert writer.flush() == 10
+    with app.app_context():
+        assert LoginEvent.query.count() == before + 10
+
+
+def test_prune_keeps_recent_events(app):
+    writer = get_login_event_writer()
+    with app.app_context():
+        user_id = User.query.filter_by(username='viewer').first().id
+    writer.record(user_id, 'github', 'ancient', timestamp=datetime.utcnow() - timedelta(days=400))
+    writer.record(user_id, 'github', 'recent')
+    writer.flush()
+    with app.app_context():
+        assert prune_login_events(days=90, chunk_size=1) >= 1
+        agents = {e.user_agent for e in LoginEvent.query.filter_by(user_id=user_id)}
+    assert 'recent' in agents and 'ancient' not in agents
+
+
+def test_migration_moves_json_history(app, login):
+    login('legacy-json')
+    blob = json.dumps([
+        {'provider': 'google', 'timestamp': '2024-01-01T10:00:00', 'user_agent': 'old browser'},
+        {'provider': 'github', 'timestamp': 'not a date'},
+        {'provider': 'github', 'timestamp': '2024-02-01T10:00:00', 'user_agent': 'newer browser'},
+    ])
+    with app.app_context():
+        db.session.execute(text("UPDATE users SET login_history = :blob WHERE username = 'legacy-json'"), {'blob': blob})
+        db.session.commit()
+        with db.engine.begin() as conn:
+            _migration_005_login_events(conn)
+        user = User.query.filter_by(username='legacy-json').first()
+        assert user.login_history is None
+        events = LoginEvent.query.filter_by(user_id=user.id).order_by(LoginEvent.timestamp).all()
+    assert [(e.provider, e.user_agent) for e in events] == [('google', 'old browser'), ('github', 'newer browser')]
+
@@ -0,0 +1,94 @@
+"""
+Tests for keyset pagination of GET /api/messages/<chat_id>/messages: before/after
+cursors, ties on created_at, invalid cursors and limit bounds
+
+    python -m pytest test_message_pagination.py
+"""
+from datetime import datetime, timedelta
+
+from database import db
+from models import Message
+from utils.pagination import MAX_PAGE_SIZE, encode_cursor
+
+
+def _seed(app, client, headers, timestamps):
+    """Insert one message per timestamp, in list order; returns (chat_id, ids)"""
+    chat_id = client.post('/api/chat/create', json={'title': 'pages'}, headers=headers).get_json()['id']
+    user_id = int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+    with app.app_context():
+        messages = [Message(chat_id=chat_id, user_id=user_id, text=f'message {i}', sender='user', created_at=ts)
+                    for i, ts in enumerate(timestamps)]
+        db.session.add_all(messages)
+        db.session.commit()
+        return chat_id, [m.id for m in messages]
+
+
+def _page(client, headers, chat_id, **params):
+    res = client.get(f'/api/messages/{chat_id}/messages', query_string=params, headers=headers)
+    assert res.status_code == 200, res.get_json()
+    body = res.get_json()
+    return [m['id'] for m in body['messages']], body['prev_cursor'], body['next_cursor']
+
+
+def test_walk_back_and_forward(app, client, login):
+    headers = login('pager')
+    start = datetime(2024, 1, 1)
+    chat_id, ids = _seed(app, client, headers, [start + timedelta(seconds=i) for i in range(7)])
+
+    page, prev_cursor, next_cursor = _page(client, headers, chat_id, limit=3)
+    assert page == ids[4:7]  # Most recent page, oldest first
+    assert next_cursor is None  # Nothing newer
+    page, prev_cursor, next_cursor = _page(client, headers, chat_id, limit=3, before=prev_cursor)
+    assert page == ids[1:4]
+    assert next_cursor is not None
+    page, prev_cursor, _ = _page(client, headers, chat_id, limit=3, before=prev_cursor)
+    assert page == ids[0:1]
+    assert prev_cursor is None  # Reached the start of the chat
+
+    page, _, next_cursor = _page(client, headers, chat_id, limit=3, after=encode_cursor(start, ids[0]))
+    assert page == ids[1:4]
+    page, _, next_cursor = _page(client, headers, chat_id, limit=3, after=next_cursor)
+    assert page == ids[4:7]
+    assert next_cursor is None  # Caught up with the newest message
+
+    page, prev_cursor, next_cursor = _page(client, headers, chat_id, limit=50)
+    assert page == ids and prev_cursor is None and next_cursor is None
+
+
+def test_equal_timestamps_are_ordered_by_id(app, client, login):
+    headers = login('tie-breaker')
+    same = datetime(2024, 1, 1, 12, 0, 0)
+    chat_id, ids = _seed(app, client, headers, [same] * 5)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor, _ = _page(client, headers, chat_id, limit=2, **({'before': cursor} if cursor else {}))
+        seen = page + seen
+        if cursor is None:
+            break
+    assert seen == ids  # Every message exactly once, despite identical created_at
+
+    seen, cursor = [], encode_cursor(same, ids[0])
+    while cursor:
+        page, _, cursor = _page(client, headers, chat_id, limit=2, after=cursor)
+        seen += page
+    assert seen == ids[1:]
+
+
+def test_invalid_cursor_and_limit_bounds(app, client, login):
+    headers = login('bounds')
+    chat_id, ids = _seed(app, client, headers, [datetime(2024, 1, 1) + timedelta(seconds=i)
+                                                for i in range(MAX_PAGE_SIZE + 5)])
+    url = f'/api/messages/{chat_id}/messages'
+
+    for cursor in ('not-a-cursor', encode_cursor(1, 2, 3), encode_cursor('yesterday', 5)):
+        assert client.get(url, query_string={'before': cursor}, headers=headers).status_code == 400
+        assert client.get(url, query_string={'after': cursor}, headers=headers).status_code == 400
+    assert client.get(url, query_string={'limit': 'ten'}, headers=headers).status_code == 400
+
+    assert len(_page(client, headers, chat_id, limit=0)[0]) == 1
+    assert len(_page(client, headers, chat_id, limit=-5)[0]) == 1
+    assert len(_page(client, headers, chat_id, limit=10_000)[0]) == MAX_PAGE_SIZE
+    assert len(_page(client, headers, chat_id)[0]) == 50  # Default page size
+
+    assert client.get(url, headers=login('stranger')).status_code == 404
@@ -0,0 +1,96 @@
+"""
+Tests for GET /api/messages/search (SQLite FTS5): ranking, user scoping, paging,
+trigger sync on delete and the index rebuild
+Runs in-process: no live server or API key needed
+
+    python -m pytest test_message_search.py
+"""
+from database import db
+from models import Message
+from utils.search import rebuild_index
+
+
+def _user_id(client, headers):
+    return int(client.get('/api/auth/me', headers=headers).get_json()['id'])
+
+
+def _add_messages(app, client, headers, texts, title='search'):
+    """Insert user messages directly (no model call); returns the chat id"""
+    chat_id = client.post('/api/chat/create', json={'title': title}, headers=headers).get_json()['id']
+    user_id = _user_id(client, headers)
+    with app.app_context():
+        for text in texts:
+            db.session.add(Message(chat_id=chat_id, user_id=user_id, text=text, sender='user'))
+        db.session.commit()
+    return chat_id
+
+
+def _search(client, headers, q, **params):
+    res = client.get('/api/messages/search', query_string={'q': q, **params}, headers=headers)
+    assert res.status_code == 200, res.get_json()
+    return res.get_json()
+
+
+def test_ranked_snippets_scoped_to_user(app, client, login):
+    alice = login('alice')
+    bob = login('bob')
+    _add_messages(app, client, alice, [
+        'Kubernetes pods keep restarting',
+        'Notes on kubernetes: kubernetes services, kubernetes ingress',
+        'Lunch plans <script>alert(1)</script> kubernetes',
+        'Nothing relevant here',
+    ], title='infra')
+    _add_messages(app, client, bob, ['kubernetes kubernetes kubernetes'])
+
+    page = _search(client, alice, 'kubernetes')
+    results = page['results']
+    assert len(results) == 3
+    assert results[0]['snippet'].count('<mark>') == 3  # Most mentions ranks first
+    assert all(r['chat_title'] == 'infra' for r in results)
+    assert '&lt;script&gt;' in results[2]['snippet'] and '<script>' not in results[2]['snippet']
+    assert page['next_cursor'] is None
+
+    assert len(_search(client, alice, 'kuber')['results']) == 3  # Last word matches as a prefix
+    assert len(_search(client, alice, 'pods restarting')['results']) == 1
+    assert _search(client, alice, 'kubernetes" OR user_id : "2')['results'] == []  # Operators are plain text
+    assert len(_search(client, bob, 'kubernetes')['results']) == 1
+
+
+def test_keyset_pagination(app, client, login):
+    headers = login('search-pager')
+    _add_messages(app, client, headers, [f'graphql resolver {"graphql " * (i % 4)}note {i}' for i in range(25)])
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {'limit': 10, **({'after': cursor} if cursor else {})}
+        page = _search(client, headers, 'graphql', **params)
+        seen += [r['message_id'] for r in page['results']]
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 25
+
+    res = client.get('/api/messages/search?q=graphql&after=not-a-cursor', headers=headers)
+    assert res.status_code == 400
+    assert client.get('/api/messages/search?q=', headers=headers).status_code == 400
+
+
+def test_deletes_and_rebuild_keep_index_in_sync(app, client, login):
+    headers = login('deleter')
+    chat_id = _add_messages(app, client, headers, ['ephemeral zebra one', 'ephemeral zebra two'])
+    results = _search(client, headers, 'zebra')['results']
+    assert len(results) == 2
+
+    assert client.delete(f"/api/messages/{results[0]['message_id']}", headers=headers).status_code == 200
+    assert len(_search(client, headers, 'zebra')['results']) == 1
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            rebuild_index(conn)
+    assert len(_search(client, headers, 'zebra')['results']) == 1
+
+    client.post(f'/api/chat/{chat_id}/clear', headers=headers)
+    assert _search(client, headers, 'zebra')['results'] == []
+
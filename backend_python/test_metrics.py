@@ -0,0 +1,62 @@
+"""
+Tests for the Prometheus /metrics endpoint and the histogram exposition format
+Runs in-process with the fake Gemini model: no live server or API key needed
+
+    python -m pytest test_metrics.py
+"""
+from utils import metrics
+from benchmarks.fake_llm import install_fake_gemini
+
+
+def _set_enabled(enabled):
+    # Request hooks are installed at import time only when METRICS_ENABLED=true;
+    # the stage histograms and the endpoint check the flag on every call
+    metrics._enabled = enabled
+    metrics.reset_metrics()
+
+
+def test_histogram_exposition_format():
+    _set_enabled(True)
+    try:
+        histogram = metrics.Histogram('demo_seconds', 'Demo', (0.1, 1), ('stage',))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, stage='a"b')
+        assert histogram.render() == [
+            '# HELP demo_seconds Demo',
+            '# TYPE demo_seconds histogram',
+            'demo_seconds_bucket{stage="a\\"b",le="0.1"} 1',
+            'demo_seconds_bucket{stage="a\\"b",le="1.0"} 2',
+            'demo_seconds_bucket{stage="a\\"b",le="+Inf"} 3',
+            'demo_seconds_sum{stage="a\\"b"} 5.55',
+            'demo_seconds_count{stage="a\\"b"} 3',
+        ]
+    finally:
+        _set_enabled(False)
+
+
+def test_metrics_disabled_by_default(client):
+    _set_enabled(False)
+    assert client.get('/metrics').status_code == 404
+    metrics.JWT_VERIFY.observe(0.1)
+    assert metrics.JWT_VERIFY.render() == ['# HELP jwt_verify_duration_seconds JWT decode and signature verification',
+                                           '# TYPE jwt_verify_duration_seconds histogram']
+
+
+def test_chat_request_records_stage_timings(client, login):
+    install_fake_gemini(reply='measured')
+    headers = login('metrics')
+    _set_enabled(True)
+    try:
+        res = client.post('/api/chat', json={'message': 'time me', 'cache': False}, headers=headers)
+        assert res.status_code == 200
+        res = client.get('/metrics')
+        assert res.status_code == 200
+        assert res.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = res.get_data(as_text=True)
+    finally:
+        _set_enabled(False)
+
+    assert 'jwt_verify_duration_seconds_count 1' in body
+    assert 'ai_backend_duration_seconds_count{backend="gemini",status="ok"} 1' in body
+    assert '# TYPE http_request_duration_seconds histogram' in body
+
@@ -0,0 +1,147 @@
+"""
+Tests for the versioned migrations: a fresh database, a database created before
+migrations existed, re-running on an up-to-date schema and processes migrating
+at the same time
+
+    python -m pytest test_migrations.py
+"""
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import create_engine, inspect, text
+from database import db
+from migrations import MIGRATIONS, get_current_version, run_migrations
+from utils.blob_store import get_blob_store
+
+LATEST = MIGRATIONS[-1][0]
+
+# The schema db.create_all() produced before migrations were introduced
+LEGACY_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE,
+        password_hash VARCHAR(255) NOT NULL, login_history TEXT, created_at DATETIME, updated_at DATETIME)""",
+    """CREATE TABLE chat_histories (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), title VARCHAR(255),
+        created_at DATETIME, updated_at DATETIME)""",
+    """CREATE TABLE messages (
+        id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL REFERENCES chat_histories (id),
+        user_id INTEGER NOT NULL REFERENCES users (id), text TEXT NOT NULL, sender VARCHAR(20),
+        image_url VARCHAR(500), created_at DATETIME)""",
+]
+
+
+def _png():
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new('RGB', (4, 4), 'teal').save(out, format='PNG')
+    return out.getvalue()
+
+
+def _schema(conn):
+    inspector = inspect(conn)
+    return {table: ({c['name'] for c in inspector.get_columns(table)}, {i['name'] for i in inspector.get_indexes(table)})
+            for table in inspector.get_table_names()}
+
+
+def test_fresh_database(make_app):
+    with make_app().app_context():
+        assert run_migrations(verbose=False) == [version for version, _, _ in MIGRATIONS]
+        with db.engine.connect() as conn:
+            assert get_current_version(conn) == LATEST
+            schema = _schema(conn)
+        assert {'users', 'chat_histories', 'messages', 'login_events', 'messages_fts', 'schema_version'} <= set(schema)
+        assert {'image_digest'} <= schema['messages'][0]
+        assert 'ix_messages_chat_created_id' in schema['messages'][1]
+        assert {'summary', 'summary_through_id'} <= schema['chat_histories'][0]
+
+        assert run_migrations(verbose=False) == []
+        with db.engine.connect() as conn:
+            assert _schema(conn) == schema
+            assert conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == len(MIGRATIONS)
+
+
+def test_pre_existing_database(make_app):
+    image = _png()
+    with make_app().app_context():
+        with db.engine.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO users (id, username, email, password_hash, login_history) "
+                              "VALUES (1, 'old-timer', 'old@test.local', 'x', :history)"),
+                         {'history': json.dumps([{'timestamp': '2023-05-01T10:00:00', 'provider': 'local',
+                                                  'user_agent': 'curl'}, {'provider': 'no timestamp'}])})
+            conn.execute(text("INSERT INTO chat_histories (id, user_id, title) VALUES (1, 1, 'old chat')"))
+            conn.execute(text("INSERT INTO messages (id, chat_id, user_id, text, sender, image_url) "
+                              "VALUES (1, 1, 1, 'what colour is this?', 'user', :image)"),
+                         {'image': 'data:image/png;base64,' + base64.b64encode(image).decode('ascii')})
+
+        assert run_migrations(verbose=False) == [version for version, _, _ in MIGRATIONS]
+        with db.engine.connect() as conn:
+            message = conn.execute(text("SELECT image_url, image_digest FROM messages WHERE id = 1")).one()
+            assert message.image_url is None and get_blob_store().read(message.image_digest) == image
+            events = conn.execute(text("SELECT user_id, provider, user_agent FROM login_events")).fetchall()
+            assert [tuple(e) for e in events] == [(1, 'local', 'curl')]
+            assert conn.execute(text("SELECT login_history FROM users WHERE id = 1")).scalar() is None
+            # Existing rows are indexed for search
+            assert conn.execute(text("SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'colour'")).scalar() == 1
+            schema = _schema(conn)
+
+        assert run_migrations(verbose=False) == []
+        with db.engine.connect() as conn:
+            assert _schema(conn) == schema
+            assert conn.execute(text("SELECT COUNT(*) FROM login_events")).scalar() == 1
+
+
+def test_migrations_tolerate_an_already_current_schema(make_app):
+    # A database built by create_all() from the current models, with no version table
+    with make_app().app_context():
+        import models  # noqa: F401
+        db.create_all()
+        assert run_migrations(verbose=False) == [version for version, _, _ in MIGRATIONS]
+
+        # Each step is safe to repeat, e.g. after a crash between a migration and its version row
+        with db.engine.begin() as conn:
+            for _, _, migrate in MIGRATIONS:
+                migrate(conn)
+        with db.engine.connect() as conn:
+            assert get_current_version(conn) == LATEST
+
+
+MIGRATE_SCRIPT = """
+import sys, time
+from flask import Flask
+from database import init_db
+from migrations import run_migrations
+
+app = Flask('migrate-worker')
+app.config['SQLALCHEMY_DATABASE_URI'] = sys.argv[1]
+init_db(app, profile='default')
+while time.time() < float(sys.argv[2]):
+    pass
+with app.app_context():
+    print(','.join(map(str, run_migrations(verbose=False))))
+"""
+
+
+def test_concurrent_processes_migrate_once(tmp_path):
+    # Every gunicorn worker imports the app (and migrates) at the same moment
+    uri = f"sqlite:///{tmp_path / 'shared.db'}"
+    start_at = str(time.time() + 2.0)
+    workers = [subprocess.Popen([sys.executable, '-c', MIGRATE_SCRIPT, uri, start_at], cwd=os.path.dirname(__file__),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for _ in range(4)]
+    results = [worker.communicate(timeout=120) + (worker.returncode,) for worker in workers]
+
+    for stdout, stderr, returncode in results:
+        assert returncode == 0, stderr
+    applied = [int(v) for stdout, _, _ in results for v in stdout.strip().split(',') if v]
+    assert sorted(applied) == [version for version, _, _ in MIGRATIONS]  # Each one by exactly one process
+    engine = create_engine(uri)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == len(MIGRATIONS)
+    engine.dispose()
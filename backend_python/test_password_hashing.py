@@ -0,0 +1,108 @@
+"""
+Tests for pooled password hashing: saturation returns 503, stale hashes are upgraded on login
+Runs in-process: no live server or API key needed
+
+    python -m pytest test_password_hashing.py
+"""
+import os
+import signal
+
+from werkzeug.security import generate_password_hash
+from database import db
+from models import User
+from utils.password_hasher import get_password_hasher, normalize_method
+
+
+def _register(client, username, password='pw'):
+    return client.post('/api/auth/register', json={'username': username, 'email': f'{username}@test.local',
+                                                   'password': password})
+
+
+def _stored_hash(app, username):
+    with app.app_context():
+        return User.query.filter_by(username=username).first().password_hash
+
+
+def test_register_and_login_use_configured_method(app, client):
+    assert _register(client, 'pooled').status_code == 201
+    assert _stored_hash(app, 'pooled').startswith(get_password_hasher().method + '$')
+
+    assert client.post('/api/auth/login', json={'username': 'pooled', 'password': 'pw'}).status_code == 200
+    assert client.post('/api/auth/login', json={'username': 'pooled', 'password': 'nope'}).status_code == 401
+
+
+def test_login_rehashes_outdated_hash(app, client):
+    _register(client, 'legacy-hash')
+    with app.app_context():
+        user = User.query.filter_by(username='legacy-hash').first()
+        user.password_hash = generate_password_hash('pw', 'pbkdf2:sha256:1000')
+        db.session.commit()
+    assert get_password_hasher().needs_rehash(_stored_hash(app, 'legacy-hash'))
+
+    assert client.post('/api/auth/login', json={'username': 'legacy-hash', 'password': 'pw'}).status_code == 200
+    upgraded = _stored_hash(app, 'legacy-hash')
+    assert not get_password_hasher().needs_rehash(upgraded)
+    # The upgraded hash still verifies
+    assert client.post('/api/auth/login', json={'username': 'legacy-hash', 'password': 'pw'}).status_code == 200
+    assert _stored_hash(app, 'legacy-hash') == upgraded
+
+
+def test_saturated_pool_returns_503(client):
+    _register(client, 'storm')
+    hasher = get_password_hasher()
+    max_pending, rejected = hasher.max_pending, hasher.rejected
+    hasher.max_pending = 0
+    try:
+        res = client.post('/api/auth/login', json={'username': 'storm', 'password': 'pw'})
+        assert res.status_code == 503
+        assert res.headers['Retry-After'] == '1'
+        assert _register(client, 'storm2').status_code == 503
+    finally:
+        hasher.max_pending = max_pending
+    assert hasher.rejected == rejected + 2
+    assert client.post('/api/auth/login', json={'username': 'storm', 'password': 'pw'}).status_code == 200
+
+
+def test_saturated_pool_returns_503_for_oauth(client):
+    hasher = get_password_hasher()
+    max_pending = hasher.max_pending
+    hasher.max_pending = 0
+    try:
+        for provider in ('google', 'github'):
+            res = client.post(f'/api/auth/{provider}/callback', json={'code': f'{provider}-busy-code'})
+            assert res.status_code == 503
+            assert res.headers['Retry-After'] == '1'
+    finally:
+        hasher.max_pending = max_pending
+    assert client.post('/api/auth/github/callback', json={'code': 'github-busy-code'}).status_code == 200
+
+
+def test_pool_does_not_fork_the_web_worker():
+    hasher = get_password_hasher()
+    if hasher.workers == 0:
+        return
+    hasher.hash('pw')
+    assert hasher._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+
+def test_broken_pool_is_replaced():
+    hasher = get_password_hasher()
+    if hasher.workers == 0:
+        return
+    stored = hasher.hash('pw')
+    pool, restarts = hasher._pool, hasher.pool_restarts
+    for pid in list(pool._processes):
+        os.kill(pid, signal.SIGKILL)  # As if the OOM killer took a hashing process
+
+    assert hasher.verify(stored, 'pw')
+    assert hasher._pool is not pool
+    assert hasher.pool_restarts == restarts + 1
+    assert hasher.verify(stored, 'pw')
+
+
+def test_normalize_method():
+    assert normalize_method('pbkdf2') == 'pbkdf2:sha256:600000'
+    assert normalize_method('pbkdf2:sha512') == 'pbkdf2:sha512:600000'
+    assert normalize_method('scrypt') == 'scrypt:32768:8:1'
+    assert normalize_method('scrypt:16384:8:1') == 'scrypt:16384:8:1'
+
@@ -0,0 +1,132 @@
+"""
+Tests for the exact-match response cache: LRU/TTL/byte cap on both backends,
+hit/miss counters and the per-request opt-out
+
+    python -m pytest test_response_cache.py
+"""
+import threading
+import time
+
+from flask import request
+from utils.response_cache import (MemoryCacheBackend, SQLiteCacheBackend, ResponseCache, cache_allowed,
+                                  make_cache_key, get_response_cache)
+from benchmarks.fake_llm import install_fake_gemini
+
+
+def test_memory_lru_and_byte_cap():
+    backend = MemoryCacheBackend(ttl=3600, max_bytes=10)
+    backend.set('a', 'aaaa')
+    backend.set('b', 'bbbb')
+    assert backend.get('a') == 'aaaa'  # Now most recently used
+    backend.set('c', 'cccc')
+    assert backend.get('b') is None
+    assert backend.get('a') == 'aaaa' and backend.get('c') == 'cccc'
+    assert backend.stats() == {'entries': 2, 'bytes': 8, 'evictions': 1}
+
+    backend.set('a', 'xx')  # Replacing an entry frees its old size
+    assert backend.stats()['bytes'] == 6
+    backend.set('huge', 'x' * 11)  # Larger than the whole cache: not stored, nothing evicted
+    assert backend.get('huge') is None
+    assert backend.stats()['entries'] == 2
+
+
+def test_memory_ttl():
+    backend = MemoryCacheBackend(ttl=0.05, max_bytes=100)
+    backend.set('k', 'v')
+    assert backend.get('k') == 'v'
+    time.sleep(0.1)
+    assert backend.get('k') is None
+    assert backend.stats() == {'entries': 0, 'bytes': 0, 'evictions': 0}
+
+
+def test_sqlite_backend_shared_lru_and_ttl(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    worker_a = SQLiteCacheBackend(path, ttl=3600, max_bytes=10)
+    worker_b = SQLiteCacheBackend(path, ttl=3600, max_bytes=10)
+    worker_a.set('a', 'aaaa')
+    assert worker_b.get('a') == 'aaaa'  # Visible to every worker on the host
+    time.sleep(0.01)
+    worker_b.set('b', 'bbbb')
+    time.sleep(0.01)
+    assert worker_a.get('a') == 'aaaa'  # Refreshes last_access
+    worker_a.set('c', 'cccc')
+    assert worker_b.get('b') is None
+    assert worker_b.get('a') == 'aaaa'
+    assert worker_a.stats()['entries'] == 2 and worker_a.evictions == 1
+
+    short = SQLiteCacheBackend(str(tmp_path / 'ttl.db'), ttl=0.05, max_bytes=100)
+    short.set('k', 'v')
+    assert short.get('k') == 'v'
+    time.sleep(0.1)
+    assert short.get('k') is None
+
+
+def test_counters_and_errors():
+    cache = ResponseCache(MemoryCacheBackend(ttl=3600, max_bytes=1000))
+    cache.set('k', 'v')
+    cache.set('empty', '')  # Empty replies are never cached
+    assert cache.get('k') == 'v'
+    assert cache.get('empty') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+    class Broken:
+        name = 'broken'
+
+        def get(self, key):
+            raise OSError('disk gone')
+
+        def stats(self):
+            return {}
+
+    assert ResponseCache(Broken()).get('k') is None  # Read errors are a miss, not a 500
+    assert ResponseCache(None).stats() == {'backend': 'off'}
+
+
+def test_counters_are_exact_under_concurrency():
+    cache = ResponseCache(MemoryCacheBackend(ttl=3600, max_bytes=1000))
+    cache.set('hit', 'v')
+
+    def lookups():
+        for i in range(2000):
+            cache.get('hit' if i % 2 else 'miss')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (cache.hits, cache.misses) == (8000, 8000)
+
+
+def test_cache_key_normalizes_prompt():
+    assert make_cache_key('What is React?', 'm') == make_cache_key('  what   is react ', 'm')
+    assert make_cache_key('what is react', 'm') != make_cache_key('what is react', 'other-model')
+    assert make_cache_key('what is react', 'm') != make_cache_key('what is react', 'm', context='abc')
+
+
+def test_per_request_opt_out(app, client, login):
+    with app.test_request_context(json={'message': 'hi'}):
+        assert cache_allowed(request, request.get_json())
+    with app.test_request_context(json={'message': 'hi', 'cache': False}):
+        assert not cache_allowed(request, request.get_json())
+    with app.test_request_context(headers={'Cache-Control': 'no-store'}):
+        assert not cache_allowed(request)
+    with app.test_request_context(method='POST', data={'cache': 'false'}):
+        assert not cache_allowed(request)
+
+    install_fake_gemini()
+    headers = login('cache-user')
+    get_response_cache().clear()
+
+    def ask(**options):
+        res = client.post('/api/chat', json={'message': 'what is the response cache?', **options},
+                          headers=headers)
+        assert res.status_code == 200
+        return res.headers['X-AI-Backend']
+
+    assert ask(cache=False) == 'gemini'
+    assert ask(cache=False) == 'gemini'  # Opted out: nothing was stored
+    assert ask() == 'gemini'
+    assert ask() == 'cache'
+    assert ask(cache=False) == 'gemini'  # Opted out: the stored reply isn't served either
@@ -0,0 +1,68 @@
+"""
+Tests for the send path's transaction handling: one commit per turn, no
+connection held during the model call, nothing saved when the call fails
+Runs in-process with the fake Gemini model: no live server or API key needed
+
+    python -m pytest test_send_transaction.py
+"""
+from sqlalchemy import event
+from database import db
+from benchmarks.fake_llm import install_fake_gemini, FakeGenerativeModel
+
+
+def _messages(client, headers, chat_id):
+    return client.get(f'/api/messages/{chat_id}/messages', headers=headers).get_json()['messages']
+
+
+def test_single_commit_and_no_connection_during_model_call(app, client, login):
+    install_fake_gemini()
+    headers = login('sender')
+    chat_id = client.post('/api/chat/create', json={'title': 'tx'}, headers=headers).get_json()['id']
+
+    with app.app_context():
+        engine = db.engine
+    commits, held_during_call = [], []
+    on_commit = lambda conn: commits.append(1)
+    event.listen(engine, 'commit', on_commit)
+    original = FakeGenerativeModel.generate_content
+
+    def watched_call(self, *args, **kwargs):
+        held_during_call.append(engine.pool.checkedout())
+        return original(self, *args, **kwargs)
+
+    FakeGenerativeModel.generate_content = watched_call
+    try:
+        res = client.post(f'/api/messages/{chat_id}/send', headers=headers, json={'text': 'hello', 'cache': False})
+    finally:
+        FakeGenerativeModel.generate_content = original
+        event.remove(engine, 'commit', on_commit)
+
+    assert res.status_code == 201
+    assert res.get_json()['user_message']['text'] == 'hello'
+    assert len(commits) == 1
+    assert held_during_call == [0]
+    assert [m['who'] for m in _messages(client, headers, chat_id)] == ['user', 'bot']
+
+
+def test_failed_model_call_saves_nothing(app, client, login):
+    install_fake_gemini()
+    headers = login('failer')
+    chat_id = client.post('/api/chat/create', json={'title': 'fail'}, headers=headers).get_json()['id']
+
+    from routes import message_routes
+    original = message_routes.run_ai_call
+
+    def failing_call(*args, **kwargs):
+        raise RuntimeError('model exploded')
+
+    message_routes.run_ai_call = failing_call
+    try:
+        app.config['PROPAGATE_EXCEPTIONS'] = False
+        res = client.post(f'/api/messages/{chat_id}/send', headers=headers, json={'text': 'lost?', 'cache': False})
+    finally:
+        message_routes.run_ai_call = original
+        app.config['PROPAGATE_EXCEPTIONS'] = None
+
+    assert res.status_code == 500
+    assert _messages(client, headers, chat_id) == []
+
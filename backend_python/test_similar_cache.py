@@ -0,0 +1,95 @@
+"""
+Tests for the near-duplicate prompt cache and its per-route opt-in
+Runs in-process with the fake Gemini model: no live server or API key needed
+
+    python -m pytest test_similar_cache.py
+"""
+from utils import similar_cache
+from utils.similar_cache import SimilarPromptCache, get_similar_cache, _words_conflict
+from utils.response_cache import get_response_cache
+from benchmarks.fake_llm import install_fake_gemini
+
+
+def _cache(**overrides):
+    options = {'threshold': 0.7, 'max_entries': 100, 'max_bytes': 1 << 20, 'ttl': 3600, **overrides}
+    return SimilarPromptCache(**options)
+
+
+def test_paraphrases_hit_and_near_misses_do_not():
+    cache = _cache()
+    cache.set('what is react?', 'react answer')
+    cache.set('how do I sort a list in python', 'sort answer')
+
+    assert cache.get("What's React") == 'react answer'
+    assert cache.get('What is React.js?') == 'react answer'
+    assert cache.get('sort a list in Python?') == 'sort answer'
+    assert cache.get('what is redux?') is None
+    assert cache.get('how do I sort a list in python 3') is None  # Numbers must match
+    assert cache.get('what is not react') is None  # So must negation
+    assert cache.get("What's React", namespace='other-model') is None
+
+
+def test_word_order_and_opposite_prefixes_do_not_match():
+    cache = _cache()
+    cache.set('convert celsius to fahrenheit', 'c to f')
+    cache.set('how do I install react', 'install answer')
+    cache.set('how do I upload a file to s3', 'upload answer')
+
+    assert cache.get('Convert Celsius to Fahrenheit?') == 'c to f'
+    assert cache.get('convert fahrenheit to celsius') is None  # Same trigrams, other direction
+    assert cache.get('How to install React?') == 'install answer'
+    assert cache.get('how do I uninstall react') is None
+    assert cache.get('how do I download a file to s3') is None
+
+
+def test_word_guards():
+    assert _words_conflict(('convert', 'celsius', 'fahrenheit'), ('convert', 'fahrenheit', 'celsius'))
+    assert _words_conflict(('install', 'react'), ('uninstall', 'react'))
+    assert _words_conflict(('enable', 'dark', 'mode'), ('disable', 'dark', 'mode'))
+    assert _words_conflict(('encrypt', 'file'), ('decrypt', 'file'))
+    assert not _words_conflict(('capital', 'france'), ('capital', 'city', 'france'))  # Extra words are fine
+    assert not _words_conflict(('react',), ('react', 'js'))
+    assert not _words_conflict(('hello',), ('helo',))
+    assert not _words_conflict(('undo', 'commit'), ('do', 'commit'))  # Stems shorter than 4 letters don't count
+
+
+def test_lru_and_byte_cap():
+    cache = _cache(max_entries=2)
+    cache.set('what is docker', 'docker')
+    cache.set('what is kubernetes', 'kubernetes')
+    assert cache.get('What is Docker?') == 'docker'  # Now most recently used
+    cache.set('what is terraform', 'terraform')
+    assert cache.get('what is kubernetes?') is None
+    assert cache.get('what is docker?') == 'docker'
+    assert cache.stats()['evictions'] == 1
+
+    cache = _cache(max_bytes=10)
+    cache.set('what is docker', 'x' * 8)
+    cache.set('what is kubernetes', 'y' * 8)
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] == 8
+
+
+def test_route_opt_in(client, login):
+    install_fake_gemini()
+    headers = login('similar')
+
+    def ask(message):
+        res = client.post('/api/chat', json={'message': message}, headers=headers)
+        assert res.status_code == 200
+        return res.headers['X-AI-Backend']
+
+    get_response_cache().clear()
+    get_similar_cache().clear()
+    assert ask('what is react?') == 'gemini'
+    assert ask("What's React") == 'gemini'  # Route not opted in
+
+    similar_cache.SIMILAR_CACHE_ROUTES.add('chat.send_message')
+    try:
+        assert ask('what is flask?') == 'gemini'
+        assert ask("What's Flask") == 'similar_cache'
+        res = client.post('/api/chat', json={'message': 'What is Flask', 'cache': False}, headers=headers)
+        assert res.headers['X-AI-Backend'] == 'gemini'  # Per-request opt-out still applies
+    finally:
+        similar_cache.SIMILAR_CACHE_ROUTES.discard('chat.send_message')
+
@@ -0,0 +1,50 @@
+"""
+Tests for SQLITE_PROFILE=performance: WAL and the tuned pragmas are applied to
+every new connection, and only to SQLite database files
+
+    python -m pytest test_sqlite_profile.py
+"""
+import database
+from database import db, init_db
+
+
+def _pragmas(conn):
+    return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')}
+
+
+def test_performance_profile_applies_pragmas_on_connect(make_app, monkeypatch):
+    monkeypatch.setattr(database, 'SQLITE_BUSY_TIMEOUT_MS', 1234)
+    monkeypatch.setattr(database, 'SQLITE_CACHE_SIZE_KB', 4096)
+    monkeypatch.setattr(database, 'SQLITE_MMAP_SIZE', 1024 * 1024)
+    app = make_app('performance')
+    assert app.config['SQLITE_PROFILE'] == 'performance'
+
+    with app.app_context():
+        assert db.engine.pool.size() == database.SQLITE_POOL_SIZE
+        # Two connections open at once: both are new, and both are tuned
+        with db.engine.connect() as first, db.engine.connect() as second:
+            for conn in (first, second):
+                assert _pragmas(conn) == {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 1234,
+                                          'cache_size': -4096, 'mmap_size': 1024 * 1024, 'temp_store': 2}
+
+
+def test_default_profile_leaves_sqlite_defaults(make_app):
+    app = make_app('default', name='plain.db')
+    assert app.config['SQLITE_PROFILE'] == 'default'
+    with app.app_context(), db.engine.connect() as conn:
+        pragmas = _pragmas(conn)
+    assert pragmas['journal_mode'] == 'delete'
+    assert pragmas['synchronous'] == 2  # FULL
+    assert pragmas['mmap_size'] == 0
+
+
+def test_in_memory_database_is_not_tuned():
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    assert init_db(app, profile='performance') == 'default'
+    assert 'pool_size' not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    with app.app_context(), db.engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'memory'
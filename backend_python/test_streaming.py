@@ -0,0 +1,132 @@
+"""
+Streaming (SSE) tests against a fake streaming Gemini backend
+Runs in-process: no live server or API key needed
+
+    python -m pytest test_streaming.py
+"""
+import json
+import time
+
+from models import Message
+from benchmarks.fake_llm import install_fake_gemini
+
+FIRST_CHUNK_DELAY = 0.05
+CHUNK_DELAY = 0.05
+CHUNKS = 6
+
+
+def _read_events(response, start):
+    """Read an SSE response, returning [(seconds_since_start, event, data)]"""
+    events, buffer = [], ''
+    for raw in response.response:
+        buffer += raw.decode() if isinstance(raw, bytes) else raw
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            event, data = 'message', None
+            for line in block.splitlines():
+                if line.startswith('event: '):
+                    event = line[len('event: '):]
+                elif line.startswith('data: '):
+                    data = json.loads(line[len('data: '):])
+            events.append((time.perf_counter() - start, event, data))
+    return events
+
+
+def test_chat_stream_time_to_first_token(client, login, record_property):
+    install_fake_gemini(latency=FIRST_CHUNK_DELAY, chunks=CHUNKS, chunk_latency=CHUNK_DELAY)
+    headers = login('streamer')
+
+    start = time.perf_counter()
+    res = client.post('/api/chat?stream=1', json={'message': 'tell me a story'}, headers=headers, buffered=False)
+    assert res.mimetype == 'text/event-stream'
+    events = _read_events(res, start)
+
+    deltas = [e for e in events if e[1] == 'message']
+    done = [e for e in events if e[1] == 'done']
+    assert len(deltas) == CHUNKS
+    assert len(done) == 1
+    assert done[0][2]['reply'] == ''.join(d[2]['delta'] for d in deltas)
+
+    ttft, total = deltas[0][0], done[0][0]
+    record_property('time_to_first_token_ms', round(ttft * 1000))
+    record_property('total_ms', round(total * 1000))
+    # First token arrives well before the whole generation finishes
+    assert ttft < total / 2
+
+
+def test_message_stream_persists_bot_message(app, client, login):
+    install_fake_gemini(latency=FIRST_CHUNK_DELAY, chunks=CHUNKS, chunk_latency=CHUNK_DELAY)
+    headers = login('streamer')
+    chat_id = client.post('/api/chat/create', json={'title': 'stream'}, headers=headers).get_json()['id']
+
+    res = client.post(f'/api/messages/{chat_id}/send', json={'text': 'hello', 'stream': True},
+                      headers=headers, buffered=False)
+    events = _read_events(res, time.perf_counter())
+    done = events[-1]
+    assert done[1] == 'done'
+    reply = ''.join(e[2]['delta'] for e in events if e[1] == 'message')
+    assert done[2]['ai_message']['text'] == reply
+
+    with app.app_context():
+        bot = Message.query.filter_by(chat_id=chat_id, sender='bot').all()
+        assert [m.text for m in bot] == [reply]
+
+
+def test_non_streaming_response_unchanged(client, login):
+    install_fake_gemini(reply='plain reply')
+    headers = login('streamer')
+
+    res = client.post('/api/chat', json={'message': 'hi'}, headers=headers)
+    assert res.status_code == 200
+    assert res.get_json() == {'message': 'hi', 'reply': 'plain reply', 'response': 'plain reply'}
+
+
+def test_disconnect_mid_stream_releases_probe_slot(monkeypatch):
+    from utils import ai_service
+    from utils.circuit_breaker import CircuitBreaker, HALF_OPEN
+
+    install_fake_gemini(chunks=CHUNKS)
+    breaker = CircuitBreaker('gemini-test', min_requests=1, open_seconds=0)
+    breaker.record_failure('down')
+    assert breaker.state == HALF_OPEN
+    monkeypatch.setattr(ai_service, 'GEMINI_BREAKER', breaker)
+
+    stream = ai_service.stream_ai_response('tell me a story', use_cache=False)
+    next(stream)  # The probe is in flight
+    assert not breaker.allow_request()
+    stream.close()  # What the WSGI server does when the client goes away
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()  # The next request may probe again
+
+
+def test_streams_hold_an_ai_call_slot(app, client, login, monkeypatch):
+    import threading
+    from utils import ai_executor
+
+    monkeypatch.setattr(ai_executor, 'AI_EXECUTION_MODE', 'async')
+    monkeypatch.setattr(ai_executor, '_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(ai_executor, 'AI_SLOT_TIMEOUT', 0.01)
+    install_fake_gemini(chunks=CHUNKS)
+    headers = login('slot-streamer')
+    chat_id = client.post('/api/chat/create', json={'title': 'slots'}, headers=headers).get_json()['id']
+
+    first = client.post('/api/chat?stream=1', json={'message': 'one'}, headers=headers, buffered=False)
+    assert first.status_code == 200
+    assert ai_executor.get_executor_stats()['inflight'] == 1
+    # The only slot is held by the open stream: other AI calls, streamed or not, are turned away
+    busy = client.post(f'/api/messages/{chat_id}/send', json={'text': 'two', 'stream': True}, headers=headers)
+    assert busy.status_code == 503 and busy.headers['Retry-After'] == '1'
+    assert client.post('/api/chat', json={'message': 'three'}, headers=headers).status_code == 503
+
+    _read_events(first, time.perf_counter())
+    first.close()
+    assert ai_executor.get_executor_stats()['inflight'] == 0
+
+    # A stream closed before it was read (the client went away) gives its slot back too
+    client.post('/api/chat?stream=1', json={'message': 'four'}, headers=headers, buffered=False).close()
+    assert ai_executor.get_executor_stats()['inflight'] == 0
+    res = client.post(f'/api/messages/{chat_id}/send', json={'text': 'five', 'stream': True}, headers=headers)
+    assert res.status_code == 200 and 'event: done' in res.get_data(as_text=True)
+    res.close()  # As the WSGI server does once the body is sent
+    assert ai_executor.get_executor_stats()['inflight'] == 0
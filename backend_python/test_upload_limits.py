@@ -0,0 +1,155 @@
+"""
+Upload limit and memory-profile tests for POST /api/chat/image
+Starts the app on a local threaded server and streams 20 MB uploads to it
+concurrently, checking that peak RSS stays bounded (uploads are spooled to
+disk and images are downscaled while decoding, not held in memory whole).
+
+    python -m pytest test_upload_limits.py
+"""
+import http.client
+import io
+import json
+import os
+import resource
+import tempfile
+import threading
+import uuid
+
+import pytest
+from werkzeug.serving import make_server
+from utils import image_pipeline
+from benchmarks.fake_llm import install_fake_gemini
+
+UPLOAD_BYTES = 20 * 1024 * 1024
+UPLOAD_LIMIT = 24 * 1024 * 1024
+CONCURRENT_UPLOADS = 6
+CHUNK = 256 * 1024
+
+
+@pytest.fixture(autouse=True)
+def upload_limits(app, monkeypatch):
+    """Raise the limits above UPLOAD_BYTES on the live objects, for this module's tests only"""
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', UPLOAD_LIMIT)
+    monkeypatch.setattr(image_pipeline, 'IMAGE_MAX_BYTES', UPLOAD_LIMIT)
+    monkeypatch.setattr(image_pipeline._cache, 'max_bytes', 0)  # Every upload goes through the full pipeline
+
+
+def _make_large_jpeg(path, target_bytes=UPLOAD_BYTES):
+    """A ~20 MB, 12 MP JPEG: noisy pixels at quality 100, padded with comment segments"""
+    from PIL import Image
+    image = Image.effect_noise((4000, 3000), 40).convert('RGB')
+    image.save(path, format='JPEG', quality=100)
+    with open(path, 'rb') as f:
+        data = f.read()
+    # COM segments (max 64 KB each) right after SOI; decoders skip them
+    padding = b''
+    while len(data) + len(padding) < target_bytes:
+        padding += b'\xff\xfe\xff\xff' + b'\0' * 0xfffd
+    with open(path, 'wb') as f:
+        f.write(data[:2] + padding + data[2:])
+    return os.path.getsize(path)
+
+
+def _stream_upload(port, headers, path):
+    """POST a multipart upload, streaming the file from disk so the client side stays small"""
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="question"\r\n\r\nwhat is this?\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="big.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n').encode()
+    tail = f'\r\n--{boundary}--\r\n'.encode()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    conn.putrequest('POST', '/api/chat/image')
+    conn.putheader('Content-Type', f'multipart/form-data; boundary={boundary}')
+    conn.putheader('Content-Length', str(len(head) + os.path.getsize(path) + len(tail)))
+    for key, value in headers.items():
+        conn.putheader(key, value)
+    conn.endheaders()
+    conn.send(head)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            conn.send(chunk)
+    conn.send(tail)
+    response = conn.getresponse()
+    body = json.loads(response.read() or b'{}')
+    conn.close()
+    return response.status, body
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def test_concurrent_20mb_uploads_bounded_memory(app, login, record_property):
+    install_fake_gemini(reply='a noisy picture')
+    headers = login('uploader')
+    path = os.path.join(tempfile.mkdtemp(), 'big.jpg')
+    size = _make_large_jpeg(path)
+    assert size >= UPLOAD_BYTES
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        # Warm up imports, the DB and PIL's decoders before taking the baseline
+        status, body = _stream_upload(server.port, headers, path)
+        assert status == 200, body
+        baseline = _peak_rss_mb()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(_stream_upload(server.port, headers, path)))
+                   for _ in range(CONCURRENT_UPLOADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        growth = _peak_rss_mb() - baseline
+    finally:
+        server.shutdown()
+
+    assert [status for status, _ in results] == [200] * CONCURRENT_UPLOADS
+    assert all(body['reply'] == 'a noisy picture' for _, body in results)
+    record_property('peak_rss_growth_mb', round(growth))
+    # Buffering each upload plus a base64 copy and a full-resolution decode took
+    # ~100 MB per request; a spooled, draft-decoded upload needs about a fifth of that
+    assert growth < CONCURRENT_UPLOADS * 40, \
+        f"{CONCURRENT_UPLOADS} concurrent {size / 1024 / 1024:.0f} MB uploads: peak RSS +{growth:.0f} MB"
+
+
+def test_oversized_request_rejected_with_413(app, client, login):
+    headers = login('uploader')
+    limit = app.config['MAX_CONTENT_LENGTH']
+    res = client.post('/api/chat/image', headers=headers, content_type='multipart/form-data',
+                      data={'image': (io.BytesIO(b'\0' * (limit + 1)), 'big.jpg')})
+    assert res.status_code == 413
+    assert res.get_json()['max_bytes'] == limit
+
+
+def test_pixel_limit_checked_from_header(client, login):
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new('L', (9000, 9000)).save(out, format='PNG')  # Tiny file, 81 MP
+    assert len(out.getvalue()) < image_pipeline.IMAGE_MAX_BYTES
+    res = client.post('/api/chat/image', headers=login('uploader'), content_type='multipart/form-data',
+                      data={'image': (io.BytesIO(out.getvalue()), 'huge.png')})
+    assert res.status_code == 413
+    assert 'pixels' in res.get_json()['error']
+
+
+
+def test_truncated_upload_answers_like_base64(client, login):
+    import base64
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.effect_noise((64, 64), 40).convert('RGB').save(out, format='JPEG')
+    truncated = out.getvalue()[:len(out.getvalue()) // 2]  # Valid header, body cut off
+    install_fake_gemini(reply='a broken picture')
+    headers = login('uploader')
+
+    res = client.post('/api/chat/image', headers=headers, content_type='multipart/form-data',
+                      data={'image': (io.BytesIO(truncated), 'cut.jpg'), 'question': 'what is this?'})
+    assert res.status_code == 200, res.get_json()
+    as_form = client.post('/api/chat/image', headers=headers, content_type='multipart/form-data',
+                          data={'image': base64.b64encode(truncated).decode('ascii'), 'question': 'what is this?'})
+    assert as_form.status_code == 200, as_form.get_json()
+    assert res.get_json()['reply'] == as_form.get_json()['reply']
@@ -0,0 +1,85 @@
+"""
+Execution control for AI-bound calls
+
+AI_EXECUTION_MODE=sync   (default) AI calls run inline, one request per sync worker
+AI_EXECUTION_MODE=async  workers are threaded (see gunicorn.conf.py) and in-flight
+                         AI calls are bounded by AI_MAX_INFLIGHT; requests over the
+                         limit get a fast 503 instead of queueing behind the model.
+                         Streamed (SSE) replies hold their slot until the response closes.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+AI_EXECUTION_MODE = os.getenv('AI_EXECUTION_MODE', 'sync').lower()
+AI_MAX_INFLIGHT = int(os.getenv('AI_MAX_INFLIGHT', '256'))
+AI_SLOT_TIMEOUT = float(os.getenv('AI_SLOT_TIMEOUT', '0.5'))  # seconds to wait for a free slot
+
+_slots = threading.BoundedSemaphore(AI_MAX_INFLIGHT)
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+class AIBusyError(Exception):
+    """Raised when every AI call slot is taken"""
+
+
+def is_async_mode():
+    return AI_EXECUTION_MODE == 'async'
+
+
+def acquire_ai_call_slot():
+    """
+    Take an in-flight slot for a call that outlives the caller's frame (a streamed response)
+
+    Returns:
+        An idempotent release function (a no-op in sync mode)
+
+    Raises:
+        AIBusyError: when no slot frees up within AI_SLOT_TIMEOUT
+    """
+    global _inflight
+    if not is_async_mode():
+        return lambda: None
+
+    if not _slots.acquire(timeout=AI_SLOT_TIMEOUT):
+        raise AIBusyError(f'Too many AI requests in flight (limit {AI_MAX_INFLIGHT})')
+    with _inflight_lock:
+        _inflight += 1
+    held = [True]
+
+    def release():
+        global _inflight
+        with _inflight_lock:
+            if not held[0]:
+                return
+            held[0] = False
+            _inflight -= 1
+        _slots.release()
+
+    return release
+
+
+@contextmanager
+def ai_call_slot():
+    """Hold one in-flight AI call slot (no-op in sync mode)"""
+    release = acquire_ai_call_slot()
+    try:
+        yield
+    finally:
+        release()
+
+
+def run_ai_call(fn, *args, **kwargs):
+    """Run an AI-bound function under the in-flight limit"""
+    with ai_call_slot():
+        return fn(*args, **kwargs)
+
+
+def get_executor_stats():
+    """Execution mode and current in-flight count, for /health"""
+    return {
+        'mode': AI_EXECUTION_MODE,
+        'inflight': _inflight,
+        'max_inflight': AI_MAX_INFLIGHT,
+    }
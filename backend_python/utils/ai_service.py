@@ -5,7 +5,19 @@ Supports multiple backends: Gemini (PRIMARY), HuggingFace, transformers, spacy,
 import os
 import requests
 import json
+import threading
+import time
 from datetime import datetime
+from utils.response_cache import get_response_cache, make_cache_key, image_digest
+from utils.similar_cache import get_similar_cache, make_namespace
+from utils.fallback import Backend, FallbackOrchestrator, FallbackResult, get_fallback_executor
+from utils.circuit_breaker import get_breaker
+from utils.keyword_matcher import PhraseMatcher, load_knowledge_file
+from utils.image_pipeline import prepare_image, InvalidImageData, ImageTooLarge
+from utils.logger import get_logger
+from utils.metrics import AI_BACKEND
+
+log = get_logger('ai_service')
 
 # Initialize Gemini API
 try:
@@ -13,41 +25,134 @@ try:
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
-    print("Note: google-generativeai not installed. Install with: pip install google-generativeai")
+    log.warning("google-generativeai not installed. Install with: pip install google-generativeai")
 
 _GEMINI_INITIALIZED = False
 GEMINI_READY = False
 
+DEFAULT_GEMINI_MODEL = 'gemini-2.5-flash'
+
+# Process-wide registry of GenerativeModel instances, keyed by (model name, generation config)
+_MODEL_REGISTRY = {}
+_REGISTRY_LOCK = threading.Lock()
+
+# Backoff for re-initializing a failed backend (seconds)
+GEMINI_INIT_BACKOFF_BASE = float(os.getenv('GEMINI_INIT_BACKOFF_BASE', '5'))
+GEMINI_INIT_BACKOFF_MAX = float(os.getenv('GEMINI_INIT_BACKOFF_MAX', '300'))
+_init_failures = 0
+_next_init_attempt = 0.0
+_REINIT_LOCK = threading.Lock()
+
 def initialize_gemini(force_reinit=False):
     """Initialize Gemini API with API key from environment"""
     global _GEMINI_INITIALIZED, GEMINI_READY
     
-    # Allow re-initialization if force_reinit=True (for runtime updates)
-    if _GEMINI_INITIALIZED and not force_reinit:
-        return GEMINI_READY
+    with _REGISTRY_LOCK:
+        # Allow re-initialization if force_reinit=True (for runtime updates)
+        if _GEMINI_INITIALIZED and not force_reinit:
+            return GEMINI_READY
+        
+        _GEMINI_INITIALIZED = True
+        _MODEL_REGISTRY.clear()
+        
+        if not GEMINI_AVAILABLE:
+            log.warning("Gemini API not available. Install google-generativeai package.")
+            GEMINI_READY = False
+            return False
+        
+        api_key = os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            log.warning("GEMINI_API_KEY not found in environment variables")
+            GEMINI_READY = False
+            return False
+        
+        try:
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(DEFAULT_GEMINI_MODEL)
+            _MODEL_REGISTRY[_registry_key(DEFAULT_GEMINI_MODEL, None)] = model
+            log.info("Gemini API initialized (model %s)", DEFAULT_GEMINI_MODEL)
+            GEMINI_READY = True
+        except Exception as e:
+            log.error("Error initializing Gemini: %s", e)
+            GEMINI_READY = False
+            return False
     
-    _GEMINI_INITIALIZED = True
+    if os.getenv('GEMINI_PREWARM', 'true').lower() == 'true':
+        threading.Thread(target=_prewarm_model, args=(model,), daemon=True).start()
+    return True
+
+def _prewarm_model(model):
+    """Open the client connection in the background so the first request skips the handshake"""
+    try:
+        model.count_tokens('ping')
+    except Exception as e:
+        log.warning("Gemini pre-warm failed (will connect on first request): %s", e)
+
+def _registry_key(model_name, generation_config):
+    """Build a hashable registry key from a model name and generation config"""
+    if not generation_config:
+        return (model_name, None)
+    return (model_name, json.dumps(generation_config, sort_keys=True))
+
+def get_gemini_model(model_name: str = DEFAULT_GEMINI_MODEL, generation_config: dict = None):
+    """
+    Return a cached GenerativeModel for this worker, creating it on first use
     
-    if not GEMINI_AVAILABLE:
-        print("Gemini API not available. Install google-generativeai package.")
-        GEMINI_READY = False
-        return False
+    Args:
+        model_name: Gemini model name
+        generation_config: Optional generation config dict (part of the cache key)
+    
+    Returns:
+        GenerativeModel instance, or None if Gemini is not ready
+    """
+    if not GEMINI_READY:
+        return None
+    
+    key = _registry_key(model_name, generation_config)
+    model = _MODEL_REGISTRY.get(key)
+    if model is not None:
+        return model
     
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
-        print("Warning: GEMINI_API_KEY not found in environment variables")
-        GEMINI_READY = False
+    with _REGISTRY_LOCK:
+        model = _MODEL_REGISTRY.get(key)
+        if model is None:
+            if generation_config:
+                model = genai.GenerativeModel(model_name, generation_config=generation_config)
+            else:
+                model = genai.GenerativeModel(model_name)
+            _MODEL_REGISTRY[key] = model
+        return model
+
+def maybe_reinitialize_gemini():
+    """
+    Retry initialization of a failed Gemini backend, throttled by exponential backoff
+    so a missing key or outage isn't retried on every message
+    """
+    global _init_failures, _next_init_attempt
+    
+    if GEMINI_READY:
+        return True
+    
+    now = time.monotonic()
+    if now < _next_init_attempt:
         return False
     
+    # Only one thread retries; the others keep using the fallbacks meanwhile
+    if not _REINIT_LOCK.acquire(blocking=False):
+        return False
     try:
-        genai.configure(api_key=api_key)
-        print(f"[OK] Gemini API initialized successfully with key: {api_key[:20]}...")
-        GEMINI_READY = True
-        return True
-    except Exception as e:
-        print(f"Error initializing Gemini: {e}")
-        GEMINI_READY = False
+        if initialize_gemini(force_reinit=True):
+            _init_failures = 0
+            _next_init_attempt = 0.0
+            return True
+        
+        _init_failures += 1
+        delay = min(GEMINI_INIT_BACKOFF_BASE * (2 ** (_init_failures - 1)), GEMINI_INIT_BACKOFF_MAX)
+        _next_init_attempt = now + delay
+        log.warning("Gemini init failed, next retry in %.0fs", delay)
         return False
+    finally:
+        _REINIT_LOCK.release()
 
 # Try to initialize now, but don't fail if .env not loaded yet
 # It will be initialized on first use
@@ -272,153 +377,350 @@ Best Practices:
 • Use docstrings for documentation"""
 }
 
-def get_ai_response(user_input: str, image_data: str = None) -> str:
+# Extra entries can be loaded from a JSON data file (built-in keywords take priority)
+KNOWLEDGE_BASE_FILE = os.getenv('KNOWLEDGE_BASE_FILE')
+if KNOWLEDGE_BASE_FILE:
+    try:
+        for _keyword, _content in load_knowledge_file(KNOWLEDGE_BASE_FILE):
+            KNOWLEDGE_BASE.setdefault(_keyword.lower(), _content)
+        log.info("Loaded knowledge base file %s (%d keywords)", KNOWLEDGE_BASE_FILE, len(KNOWLEDGE_BASE))
+    except Exception as e:
+        log.error("Error loading knowledge base file %s: %s", KNOWLEDGE_BASE_FILE, e)
+
+# Whole-word matchers, compiled once at import
+KNOWLEDGE_MATCHER = PhraseMatcher(KNOWLEDGE_BASE.items())
+
+GREETINGS = {
+    'hello': "Hello! 👋 How can I assist you today?",
+    'hi': "Hi there! 👋 What can I help you with?",
+    'hey': "Hey! 😊 What's on your mind?",
+    'good morning': "Good morning! ☀️ Ready to help!",
+    'good afternoon': "Good afternoon! ☀️ What do you need?",
+    'good evening': "Good evening! 🌙 How can I help?",
+}
+GREETING_MATCHER = PhraseMatcher(GREETINGS.items())
+QUESTION_MATCHER = PhraseMatcher(['what', 'who', 'where', 'when', 'why', 'how'])
+HELP_MATCHER = PhraseMatcher(['help', 'support', 'assist', 'can you'])
+THANKS_MATCHER = PhraseMatcher(['thanks', 'thank you', 'appreciate', 'grateful'])
+GOODBYE_MATCHER = PhraseMatcher(['bye', 'goodbye', 'see you', 'farewell'])
+
+def get_ai_response(user_input: str, image_data: str = None, use_cache: bool = True, context=None,
+                    use_similar: bool = False) -> str:
     """
     Get AI response for user input with optional image analysis
-    Tries Gemini API first (PRIMARY), then falls back to intelligent response generation
+    Tries the response cache, then Gemini API (PRIMARY), then falls back to intelligent response generation
     
     Args:
         user_input: User's message text
         image_data: Optional base64 encoded image data
+        use_cache: Set False to bypass the response cache (e.g. personal data)
+        context: Optional ConversationContext (recent turns + summary) sent to Gemini
+        use_similar: Also serve replies to near-duplicate prompts (see utils/similar_cache.py)
     
     Returns:
         AI generated response text
     """
-    
+    return generate_ai_response(user_input, image_data, use_cache, context, use_similar).text
+
+def generate_ai_response(user_input: str, image_data: str = None, use_cache: bool = True, context=None,
+                         use_similar: bool = False) -> FallbackResult:
+    """
+    Same as get_ai_response, but returns a FallbackResult reporting which
+    backend answered and how long each backend took
+    """
     if not user_input.strip():
-        return "I'm here to help! Please ask me something."
+        return FallbackResult("I'm here to help! Please ask me something.", 'empty_input')
     
-    # Ensure Gemini is initialized (loads .env if not yet loaded)
-    global GEMINI_READY
-    if not GEMINI_READY:
-        print("[DEBUG] GEMINI_READY is False at runtime, attempting to initialize...")
-        initialize_gemini(force_reinit=True)
-        print(f"[DEBUG] After initialize attempt, GEMINI_READY = {GEMINI_READY}")
-    
-    print(f"\n=== GET_AI_RESPONSE CALLED ===")
-    print(f"Input: {user_input[:50]}...")
-    print(f"GEMINI_READY: {GEMINI_READY}")
-    
-    # Try Gemini API first (PRIMARY)
-    if GEMINI_READY:
-        try:
-            print("[...] Attempting Gemini API call...")
-            response = call_gemini_api(user_input, image_data)
-            if response:
-                print(f"[OK] Got Gemini response, returning it")
-                return response
-            else:
-                print("[!] Gemini returned None, trying fallbacks")
-        except Exception as e:
-            print(f"[!] Gemini API error: {e}, falling back to intelligent response")
-    else:
-        print("[...] GEMINI not ready, skipping to fallbacks")
+    image_data = _prepare_image(image_data)
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(user_input, DEFAULT_GEMINI_MODEL, image_data,
+                                   context.digest() if context else None)
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            log.debug("Response cache hit")
+            return FallbackResult(cached, 'cache')
+    similar_namespace = None
+    if use_cache and use_similar:
+        similar_namespace = make_namespace(DEFAULT_GEMINI_MODEL, image_digest(image_data),
+                                           context.digest() if context else None)
+        cached = get_similar_cache().get(user_input, similar_namespace)
+        if cached is not None:
+            log.debug("Similar prompt cache hit")
+            return FallbackResult(cached, 'similar_cache')
     
-    # Check if question matches knowledge base
-    print("[...] Checking knowledge base...")
-    lower_input = user_input.lower()
-    for keyword, content in KNOWLEDGE_BASE.items():
-        if keyword in lower_input:
-            print(f"[OK] Found keyword '{keyword}' in knowledge base, returning it")
-            return content
+    # Ensure Gemini is initialized (loads .env if not yet loaded), throttled by backoff
+    if not GEMINI_READY:
+        maybe_reinitialize_gemini()
     
-    print("[!] No keyword match in knowledge base")
+    log.debug("get_ai_response input=%.50r gemini_ready=%s", user_input, GEMINI_READY)
     
-    # Try external API (HuggingFace, etc.)
-    try:
-        print("[...] Attempting external API call...")
-        response = call_external_ai_api(user_input, image_data)
-        if response:
-            print(f"[OK] Got external API response, returning it")
-            return response
-        else:
-            print("[!] External API returned None")
-    except Exception as e:
-        print(f"[!] External API error: {e}")
+    result = _get_orchestrator('full').run(user_input, image_data, context)
+    log.info("Answered by %s in %.0fms %s", result.winner, result.elapsed_ms, result.timings(),
+             extra={'backend': result.winner, 'elapsed_ms': round(result.elapsed_ms, 1)})
     
-    # Fallback to intelligent response generation
-    print("[...] Using intelligent response generation fallback")
-    result = generate_intelligent_response(user_input, image_data)
-    print(f"[OK] Returning intelligent response")
+    # Only model answers are cached; fallbacks are cheap and shouldn't outlive an outage
+    if cache_key and result.winner == 'gemini':
+        get_response_cache().set(cache_key, result.text)
+        if similar_namespace is not None:
+            get_similar_cache().set(user_input, result.text, similar_namespace)
     return result
 
-def call_gemini_api(user_input: str, image_data: str = None) -> str:
+def get_fallback_response(user_input: str, image_data: str = None) -> str:
+    """
+    Answer without Gemini: knowledge base, then external API, then canned response
+    """
+    return _get_orchestrator('fallback').run(user_input, image_data).text
+
+def match_knowledge_base(user_input: str, image_data: str = None) -> str:
+    """Return the knowledge base entry for the highest-priority keyword in the input, or None"""
+    match = KNOWLEDGE_MATCHER.find(user_input)
+    if match is None:
+        return None
+    log.debug("Found keyword %r in knowledge base", match[0])
+    return match[1]
+
+# Fallback chain timing (seconds). AI_HEDGE_DELAY_MS launches the next backend early
+# when the current one is slow; unset keeps the chain strictly sequential.
+AI_DEADLINE = float(os.getenv('AI_DEADLINE', '15'))
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '12'))
+HUGGINGFACE_TIMEOUT = float(os.getenv('HUGGINGFACE_TIMEOUT', '10'))
+AI_HEDGE_DELAY = float(os.environ['AI_HEDGE_DELAY_MS']) / 1000 if os.getenv('AI_HEDGE_DELAY_MS') else None
+AI_FALLBACK_WORKERS = int(os.getenv('AI_FALLBACK_WORKERS', '64'))
+
+# Created up front so /health reports them before the first request
+GEMINI_BREAKER = get_breaker('gemini')
+HUGGINGFACE_BREAKER = get_breaker('huggingface')
+
+_ORCHESTRATORS = {}
+
+def _get_orchestrator(kind):
+    """Build (once) the backend chain: 'full' starts with Gemini, 'fallback' skips it"""
+    orchestrator = _ORCHESTRATORS.get(kind)
+    if orchestrator is None:
+        backends = [
+            Backend('knowledge_base', match_knowledge_base, local=True),
+            Backend('huggingface', call_external_ai_api, timeout=HUGGINGFACE_TIMEOUT,
+                    enabled=lambda: bool(os.getenv('HUGGINGFACE_API_KEY')),
+                    breaker=HUGGINGFACE_BREAKER, miss_is_failure=True),
+        ]
+        if kind == 'full':
+            backends.insert(0, Backend('gemini', call_gemini_api, timeout=GEMINI_TIMEOUT,
+                                       enabled=lambda: GEMINI_READY,
+                                       breaker=GEMINI_BREAKER, miss_is_failure=True,
+                                       uses_context=True))
+        orchestrator = FallbackOrchestrator(
+            backends,
+            final_backend=Backend('canned', generate_intelligent_response, local=True),
+            deadline=AI_DEADLINE,
+            hedge_delay=AI_HEDGE_DELAY,
+            executor=get_fallback_executor(AI_FALLBACK_WORKERS),
+        )
+        _ORCHESTRATORS[kind] = orchestrator
+    return orchestrator
+
+def _gemini_request_options():
+    # The orchestrator can only abandon a running call (threads can't be cancelled), so
+    # without an SDK deadline hedged losers and calls past AI_DEADLINE keep holding a
+    # fallback pool thread for as long as Gemini takes. Streams get the same deadline,
+    # or a stalled stream would hold its request thread indefinitely
+    return {'timeout': GEMINI_TIMEOUT}
+
+def call_gemini_api(user_input: str, image_data: str = None, context=None) -> str:
     """
     Call Google Gemini 2.5 Flash API for AI response
     Supports both text and image inputs
     
     Args:
         user_input: User's question or message
-        image_data: Optional base64 encoded image data
+        image_data: Optional image (PreparedImage, raw bytes or base64)
+        context: Optional ConversationContext sent as earlier turns
     
     Returns:
         Response text from Gemini, or None if failed
     """
     try:
         if not GEMINI_READY:
-            print("DEBUG: GEMINI_READY is False")
+            log.debug("Gemini not ready")
             return None
         
-        print(f"DEBUG: Calling Gemini API with input: {user_input[:50]}...")
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        log.debug("Calling Gemini with input=%.50r image=%s", user_input, bool(image_data))
+        model = get_gemini_model()
         
         if image_data:
             # Handle image analysis request
             try:
-                import base64
-                from PIL import Image
-                import io
-                
-                # Extract base64 data
-                if ',' in image_data:
-                    base64_str = image_data.split(',')[1]
-                else:
-                    base64_str = image_data
-                
-                # Decode base64 to image
-                image_bytes = base64.b64decode(base64_str)
-                image = Image.open(io.BytesIO(image_bytes))
+                image = prepare_image(image_data).to_part()
                 
-                print("DEBUG: Sending image + text to Gemini")
                 # Generate response with both text and image
-                response = model.generate_content([user_input, image])
+                response = model.generate_content(_with_context([user_input, image], context),
+                                                  request_options=_gemini_request_options())
                 
                 if response and response.text:
-                    print(f"DEBUG: Gemini returned image response: {response.text[:50]}...")
+                    log.debug("Gemini image response: %.50r", response.text)
                     return response.text
                     
             except Exception as e:
-                print(f"Image processing error: {e}")
                 # Fall back to text-only response
-                print("DEBUG: Falling back to text-only after image error")
-                response = model.generate_content(user_input)
+                log.warning("Image processing error, retrying text-only: %s", e)
+                response = model.generate_content(_with_context(user_input, context),
+                                                  request_options=_gemini_request_options())
                 result = response.text if response and response.text else None
-                if result:
-                    print(f"DEBUG: Text-only fallback returned: {result[:50]}...")
                 return result
         else:
             # Text-only response
-            print("DEBUG: Sending text-only request to Gemini")
-            response = model.generate_content(user_input)
-            
-            print(f"DEBUG: Response object type: {type(response)}")
-            print(f"DEBUG: Response object: {response}")
-            print(f"DEBUG: Response.text type: {type(response.text) if hasattr(response, 'text') else 'NO TEXT ATTR'}")
+            response = model.generate_content(_with_context(user_input, context),
+                                              request_options=_gemini_request_options())
             
             if response and response.text:
-                print(f"DEBUG: Gemini returned text response: {response.text[:50]}...")
+                log.debug("Gemini text response: %.50r", response.text)
                 return response.text
             else:
-                print(f"DEBUG: Gemini response is empty or missing text. Response: {response}")
+                # %r is only rendered if DEBUG records are actually emitted
+                log.debug("Gemini response is empty or missing text: %.500r", response)
         
         return None
         
     except Exception as e:
-        print(f"GEMINI API ERROR: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        # The circuit breaker tracks repeated failures; keep this to one line
+        log.warning("Gemini API error: %s: %s", type(e).__name__, e)
         return None
 
+def stream_ai_response(user_input: str, image_data: str = None, use_cache: bool = True, context=None,
+                       use_similar: bool = False):
+    """
+    Stream an AI response as text chunks
+    Yields Gemini chunks as they arrive; if Gemini is unavailable or fails before
+    producing anything, yields the fallback response as a single chunk
+    
+    Args:
+        user_input: User's message text
+        image_data: Optional base64 encoded image data
+        use_cache: Set False to bypass the response cache (e.g. personal data)
+        context: Optional ConversationContext (recent turns + summary) sent to Gemini
+        use_similar: Also serve replies to near-duplicate prompts (see utils/similar_cache.py)
+    
+    Yields:
+        Response text chunks
+    """
+    if not user_input.strip():
+        yield "I'm here to help! Please ask me something."
+        return
+    
+    image_data = _prepare_image(image_data)
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(user_input, DEFAULT_GEMINI_MODEL, image_data,
+                                   context.digest() if context else None)
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    similar_namespace = None
+    if use_cache and use_similar:
+        similar_namespace = make_namespace(DEFAULT_GEMINI_MODEL, image_digest(image_data),
+                                           context.digest() if context else None)
+        cached = get_similar_cache().get(user_input, similar_namespace)
+        if cached is not None:
+            yield cached
+            return
+    
+    if not GEMINI_READY:
+        maybe_reinitialize_gemini()
+    
+    breaker = GEMINI_BREAKER
+    if GEMINI_READY and breaker.allow_request():
+        parts = []
+        started = time.perf_counter()
+        recorded = False
+        try:
+            for chunk in stream_gemini_api(user_input, image_data, context):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            log.warning("Gemini streaming error: %s", e)
+            breaker.record_failure(e)
+            recorded = True
+            AI_BACKEND.observe(time.perf_counter() - started, backend='gemini_stream', status='error')
+            if parts:
+                # Can't switch backends mid-answer
+                yield "\n\n[Response interrupted]"
+                return
+        else:
+            if parts:
+                breaker.record_success()
+            else:
+                breaker.record_failure('empty response')
+            recorded = True
+            AI_BACKEND.observe(time.perf_counter() - started, backend='gemini_stream',
+                               status='ok' if parts else 'miss')
+        finally:
+            if not recorded:
+                # Closed mid-stream (a client disconnect raises GeneratorExit, which is not an
+                # Exception): no verdict on Gemini, but a half-open probe slot must be given back
+                breaker.release()
+        if parts:
+            if cache_key:
+                get_response_cache().set(cache_key, ''.join(parts))
+            if similar_namespace is not None:
+                get_similar_cache().set(user_input, ''.join(parts), similar_namespace)
+            return
+    
+    yield get_fallback_response(user_input, image_data)
+
+def stream_gemini_api(user_input: str, image_data: str = None, context=None):
+    """
+    Call Gemini with stream=True and yield text chunks as they arrive
+    
+    Args:
+        user_input: User's question or message
+        image_data: Optional image (PreparedImage, raw bytes or base64)
+        context: Optional ConversationContext sent as earlier turns
+    
+    Yields:
+        Text chunks from Gemini
+    """
+    model = get_gemini_model()
+    if model is None:
+        return
+    
+    contents = user_input
+    if image_data:
+        try:
+            contents = [user_input, prepare_image(image_data).to_part()]
+        except Exception as e:
+            log.warning("Image processing error, streaming text-only: %s", e)
+    
+    stream = model.generate_content(_with_context(contents, context), stream=True,
+                                    request_options=_gemini_request_options())
+    for chunk in stream:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata only)
+            continue
+        if text:
+            yield text
+
+def _with_context(contents, context):
+    """Prepend the conversation history to the current message, if there is any"""
+    if not context:
+        return contents
+    return context.to_contents(contents if isinstance(contents, list) else [contents])
+
+def _prepare_image(image_data):
+    """
+    Decode, downscale and re-encode an upload once per request (cached by content hash)
+    Unreadable images are passed through; the Gemini call then falls back to text-only
+    """
+    if not image_data:
+        return image_data
+    try:
+        return prepare_image(image_data)
+    except (InvalidImageData, ImageTooLarge) as e:
+        log.warning("Image processing error: %s", e)
+        return image_data
+
 def call_external_ai_api(user_input: str, image_data: str = None) -> str:
     """
     Call external AI API (HuggingFace or similar)
@@ -443,7 +745,7 @@ def call_external_ai_api(user_input: str, image_data: str = None) -> str:
                 }
             }
             
-            response = requests.post(api_url, headers=headers, json=payload, timeout=10)
+            response = requests.post(api_url, headers=headers, json=payload, timeout=HUGGINGFACE_TIMEOUT)
             
             if response.status_code == 200:
                 result = response.json()
@@ -453,37 +755,26 @@ def call_external_ai_api(user_input: str, image_data: str = None) -> str:
         return None
         
     except Exception as e:
-        print(f"HuggingFace API error: {e}")
+        log.warning("HuggingFace API error: %s", e)
         return None
 
 def generate_intelligent_response(user_input: str, image_data: str = None) -> str:
     """
     Generate intelligent response using pattern matching and enhanced logic
     """
-    lower_input = user_input.lower()
-    
     # Question type detection
-    if any(word in lower_input for word in ['what', 'who', 'where', 'when', 'why', 'how']):
+    if QUESTION_MATCHER.contains_any(user_input):
         response_type = "question"
     else:
         response_type = "statement"
     
     # Greeting responses
-    greetings = {
-        'hello': "Hello! 👋 How can I assist you today?",
-        'hi': "Hi there! 👋 What can I help you with?",
-        'hey': "Hey! 😊 What's on your mind?",
-        'good morning': "Good morning! ☀️ Ready to help!",
-        'good afternoon': "Good afternoon! ☀️ What do you need?",
-        'good evening': "Good evening! 🌙 How can I help?",
-    }
-    
-    for greeting, response in greetings.items():
-        if greeting in lower_input:
-            return response
+    greeting = GREETING_MATCHER.find(user_input)
+    if greeting:
+        return greeting[1]
     
     # Help/Support responses
-    if any(word in lower_input for word in ['help', 'support', 'assist', 'can you']):
+    if HELP_MATCHER.contains_any(user_input):
         return """I'm here to help! I can assist you with:
 
 📚 **Learning Topics:**
@@ -507,12 +798,11 @@ def generate_intelligent_response(user_input: str, image_data: str = None) -> st
 Just ask me anything specific and I'll provide detailed help! 😊"""
     
     # Thank you responses
-    thanks_words = ['thanks', 'thank you', 'appreciate', 'grateful']
-    if any(word in lower_input for word in thanks_words):
+    if THANKS_MATCHER.contains_any(user_input):
         return "You're welcome! 😊 Feel free to ask if you need anything else. I'm always here to help!"
     
     # Goodbye responses
-    if any(word in lower_input for word in ['bye', 'goodbye', 'see you', 'farewell']):
+    if GOODBYE_MATCHER.contains_any(user_input):
         return "Goodbye! 👋 Have a great day and happy coding! Feel free to reach out anytime."
     
     # Image-related responses
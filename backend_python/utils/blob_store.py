@@ -0,0 +1,178 @@
+"""
+Content-addressed local blob store for uploaded images
+Blobs are stored once per SHA-256 digest, sharded as <root>/ab/cd/<digest>,
+so identical uploads are deduplicated and rows only need to keep the digest.
+
+Images are private to the users who sent them: message rows expose a signed,
+expiring URL (see signed_image_url) that <img> tags can load without an
+Authorization header. Only payloads that look like a supported image format
+are stored.
+
+Configuration (environment):
+    BLOB_STORE_DIR   directory for blobs (default: instance/blobs)
+    IMAGE_URL_TTL    seconds a signed image URL stays valid, at least (default 86400)
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import re
+import tempfile
+import threading
+import time
+
+DEFAULT_BLOB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'instance', 'blobs')
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+IMAGE_URL_TTL = int(os.getenv('IMAGE_URL_TTL', str(24 * 60 * 60)))
+
+_IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+
+class InvalidImageData(ValueError):
+    """Raised when an image payload can't be decoded"""
+
+
+def decode_image_data(image_data):
+    """
+    Decode a base64 string or data URL into raw bytes
+
+    Raises:
+        InvalidImageData: if the payload isn't valid base64
+    """
+    if isinstance(image_data, bytes):
+        return image_data
+    if not isinstance(image_data, str):
+        raise InvalidImageData('Image data must be a base64 string')
+    base64_str = image_data.split(',', 1)[1] if ',' in image_data else image_data
+    try:
+        # Line breaks are common in pasted base64; anything else outside the alphabet is an error
+        return base64.b64decode(''.join(base64_str.split()), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidImageData(f'Invalid base64 image data: {e}')
+
+
+def sniff_image_type(head):
+    """Guess an image MIME type from its first bytes"""
+    for signature, mimetype in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+class BlobStore:
+    """Filesystem blob store keyed by SHA-256"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return bool(DIGEST_RE.match(digest)) and os.path.exists(self.path_for(digest))
+
+    def put(self, data):
+        """Store bytes (no-op if already present) and return their digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def read(self, digest):
+        with open(self.path_for(digest), 'rb') as f:
+            return f.read()
+
+    def content_type(self, digest):
+        with open(self.path_for(digest), 'rb') as f:
+            return sniff_image_type(f.read(16))
+
+
+_blob_store = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Process-wide blob store, created on first use"""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore(os.getenv('BLOB_STORE_DIR', DEFAULT_BLOB_DIR))
+    return _blob_store
+
+
+def store_image(image_data):
+    """
+    Decode a base64/data URL image, store it and return its digest
+
+    Raises:
+        InvalidImageData: if the payload isn't base64 or isn't a supported image format
+    """
+    data = decode_image_data(image_data)
+    if sniff_image_type(data[:16]) == 'application/octet-stream':
+        raise InvalidImageData('Not a supported image format')
+    return get_blob_store().put(data)
+
+
+def _image_signature(digest, user_id, expires):
+    from flask import current_app
+
+    key = current_app.config['JWT_SECRET_KEY'].encode('utf-8')
+    return hmac.new(key, f'{digest}:{user_id}:{expires}'.encode('ascii'), hashlib.sha256).hexdigest()[:32]
+
+
+def signed_image_url(digest, user_id, now=None):
+    """
+    /api/images URL for one user's image, signed with the app secret
+
+    The expiry is rounded up to an IMAGE_URL_TTL boundary, so a message keeps the
+    same URL (and stays in the browser cache) for a while; a URL is valid for
+    between one and two TTLs. Must be called inside an application context.
+    """
+    now = time.time() if now is None else now
+    expires = (int(now) // IMAGE_URL_TTL + 2) * IMAGE_URL_TTL
+    return f'/api/images/{digest}?u={user_id}&e={expires}&s={_image_signature(digest, user_id, expires)}'
+
+
+def verify_image_signature(digest, user_id, expires, signature, now=None):
+    """
+    Check the u/e/s parameters of a signed image URL
+
+    Returns:
+        Seconds until the URL expires, or None if it is invalid or expired
+    """
+    now = time.time() if now is None else now
+    try:
+        expires = int(expires)
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    if expires <= now or not signature:
+        return None
+    if not hmac.compare_digest(_image_signature(digest, user_id, expires), signature):
+        return None
+    return int(expires - now)
@@ -0,0 +1,177 @@
+"""
+Per-backend circuit breakers for the AI fallback chain
+
+closed     requests flow; outcomes are tracked in a rolling time window
+open       error rate crossed the threshold; the backend is skipped outright
+half_open  after the cool-down a few probe requests are let through; a
+           success closes the circuit, a failure re-opens it
+
+Configuration (environment):
+    CIRCUIT_WINDOW_SECONDS=60     rolling window for the error rate
+    CIRCUIT_MIN_REQUESTS=5        don't trip on fewer calls than this
+    CIRCUIT_ERROR_THRESHOLD=0.5   error rate that opens the circuit
+    CIRCUIT_OPEN_SECONDS=30       cool-down before probing again
+    CIRCUIT_HALF_OPEN_PROBES=1    concurrent probe requests in half_open
+"""
+import os
+import threading
+import time
+from collections import deque
+from utils.logger import get_logger
+
+log = get_logger('circuit_breaker')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a bucketed rolling error window"""
+
+    def __init__(self, name, window_seconds=60.0, buckets=10, min_requests=5,
+                 error_threshold=0.5, open_seconds=30.0, half_open_probes=1, clock=time.monotonic):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.bucket_seconds = window_seconds / buckets
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_inflight = 0
+        self._buckets = deque()  # [bucket_id, successes, failures]
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open(self._clock())
+            return self._state
+
+    def allow_request(self):
+        """Return True if a call may go to the backend right now"""
+        with self._lock:
+            now = self._clock()
+            self._maybe_half_open(now)
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_inflight < self.half_open_probes:
+                self._probes_inflight += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._record(self._clock(), ok=True)
+            if self._state == HALF_OPEN:
+                self._probes_inflight = max(0, self._probes_inflight - 1)
+                self._state = CLOSED
+                self._buckets.clear()
+
+    def record_failure(self, error=None):
+        with self._lock:
+            now = self._clock()
+            if error is not None:
+                self.last_error = str(error)[:200]
+            self._record(now, ok=False)
+            if self._state == HALF_OPEN:
+                self._probes_inflight = max(0, self._probes_inflight - 1)
+                self._open(now)
+            elif self._state == CLOSED and self._should_trip(now):
+                self._open(now)
+
+    def release(self):
+        """Give back a half-open probe slot whose outcome is unknown (e.g. abandoned call)"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_inflight = max(0, self._probes_inflight - 1)
+
+    def snapshot(self):
+        """State and rolling counters, for /health"""
+        with self._lock:
+            now = self._clock()
+            self._maybe_half_open(now)
+            successes, failures = self._totals(now)
+            total = successes + failures
+            data = {
+                'state': self._state,
+                'requests': total,
+                'failures': failures,
+                'error_rate': round(failures / total, 4) if total else 0.0,
+                'times_opened': self.times_opened,
+            }
+            if self._state == OPEN:
+                data['retry_in_seconds'] = round(max(0.0, self._opened_at + self.open_seconds - now), 1)
+            if self.last_error:
+                data['last_error'] = self.last_error
+            return data
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_inflight = 0
+        self.times_opened += 1
+        log.warning("Circuit for %s opened for %.0fs", self.name, self.open_seconds)
+
+    def _maybe_half_open(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_inflight = 0
+
+    def _record(self, now, ok):
+        bucket_id = int(now // self.bucket_seconds)
+        if self._buckets and self._buckets[-1][0] == bucket_id:
+            bucket = self._buckets[-1]
+        else:
+            bucket = [bucket_id, 0, 0]
+            self._buckets.append(bucket)
+        bucket[1 if ok else 2] += 1
+        self._prune(now)
+
+    def _prune(self, now):
+        oldest = int((now - self.window_seconds) // self.bucket_seconds)
+        while self._buckets and self._buckets[0][0] <= oldest:
+            self._buckets.popleft()
+
+    def _totals(self, now):
+        self._prune(now)
+        return sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets)
+
+    def _should_trip(self, now):
+        successes, failures = self._totals(now)
+        total = successes + failures
+        return total >= self.min_requests and failures / total >= self.error_threshold
+
+
+_BREAKERS = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Process-wide breaker for a backend, configured from the environment"""
+    breaker = _BREAKERS.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _BREAKERS.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    window_seconds=float(os.getenv('CIRCUIT_WINDOW_SECONDS', '60')),
+                    min_requests=int(os.getenv('CIRCUIT_MIN_REQUESTS', '5')),
+                    error_threshold=float(os.getenv('CIRCUIT_ERROR_THRESHOLD', '0.5')),
+                    open_seconds=float(os.getenv('CIRCUIT_OPEN_SECONDS', '30')),
+                    half_open_probes=int(os.getenv('CIRCUIT_HALF_OPEN_PROBES', '1')),
+                )
+                _BREAKERS[name] = breaker
+    return breaker
+
+
+def get_breaker_states():
+    """{backend: snapshot} for every breaker created so far"""
+    return {name: breaker.snapshot() for name, breaker in sorted(_BREAKERS.items())}
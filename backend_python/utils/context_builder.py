@@ -0,0 +1,142 @@
+"""
+Conversation context for chat-scoped AI calls
+Assembles the most recent turns of a chat under a token budget; turns that
+fall out of the window are folded into a rolling summary stored on the chat
+row, so building the context only ever reads the messages after it.
+
+Configuration (environment):
+    CONTEXT_TOKEN_BUDGET=2000     tokens of recent turns sent with each message (0 disables)
+    CONTEXT_SUMMARY_TOKENS=500    cap on the rolling summary; oldest lines are dropped first
+    CONTEXT_MAX_MESSAGES=50       most recent messages scanned per call; older ones are summarized
+"""
+import hashlib
+import os
+import re
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '2000'))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv('CONTEXT_SUMMARY_TOKENS', '500'))
+CONTEXT_MAX_MESSAGES = int(os.getenv('CONTEXT_MAX_MESSAGES', '50'))
+
+SUMMARY_LINE_CHARS = 160
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) that avoids a count_tokens round trip"""
+    return len(text) // 4 + 1 if text else 0
+
+
+class ConversationContext:
+    """Rolling summary plus recent (sender, text) turns, oldest first"""
+
+    def __init__(self, summary=None, turns=()):
+        self.summary = summary or None
+        self.turns = list(turns)
+
+    def __bool__(self):
+        return bool(self.summary or self.turns)
+
+    def digest(self):
+        """Stable hash of the context, so cached answers are only reused for the same conversation"""
+        h = hashlib.sha256((self.summary or '').encode('utf-8'))
+        for sender, text in self.turns:
+            h.update(f'\0{sender}\0{text}'.encode('utf-8'))
+        return h.hexdigest()
+
+    def to_contents(self, parts):
+        """
+        Build Gemini multi-turn `contents` ending with the current user parts
+
+        Args:
+            parts: Parts of the current message (text and optional image)
+        """
+        history = []
+        if self.summary:
+            history.append(('user', [f'Summary of the earlier conversation:\n{self.summary}']))
+        for sender, text in self.turns:
+            history.append(('model' if sender == 'bot' else 'user', [text]))
+        history.append(('user', list(parts)))
+
+        # Gemini expects alternating roles; merge consecutive turns from the same side
+        contents = []
+        for role, turn_parts in history:
+            if contents and contents[-1]['role'] == role:
+                contents[-1]['parts'].extend(turn_parts)
+            else:
+                contents.append({'role': role, 'parts': list(turn_parts)})
+        return contents
+
+
+def _summary_line(sender, text):
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    text = _SENTENCE_END_RE.split(text, 1)[0]
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 3].rstrip() + '...'
+    return f"{'Assistant' if sender == 'bot' else 'User'}: {text}"
+
+
+def fold_into_summary(summary, messages, max_tokens=None):
+    """
+    Append one line per message to a rolling summary, dropping the oldest
+    lines once it exceeds max_tokens
+
+    Args:
+        summary: Existing summary text (or None)
+        messages: Messages leaving the context window, oldest first
+    """
+    max_tokens = CONTEXT_SUMMARY_TOKENS if max_tokens is None else max_tokens
+    lines = summary.split('\n') if summary else []
+    lines.extend(_summary_line(m.sender, m.text) for m in messages if m.text)
+    while lines and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines) or None
+
+
+def build_context(chat, budget=None):
+    """
+    Context for the next message in a chat: the newest turns that fit the
+    token budget, plus the rolling summary of everything older
+
+    Turns pushed out of the budget are folded into chat.summary and
+    chat.summary_through_id is advanced past them; the caller commits the chat.
+    Call this before the new user message is added.
+
+    Returns:
+        ConversationContext (empty when the budget is 0 or the chat has no history)
+    """
+    from models import Message
+
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    if budget <= 0:
+        return ConversationContext()
+
+    query = Message.query.filter(Message.chat_id == chat.id)
+    if chat.summary_through_id:
+        query = query.filter(Message.id > chat.summary_through_id)
+    # Ids are the cursor, so they are the order too: created_at may tie or run backwards
+    recent = query.order_by(Message.id.desc()).limit(CONTEXT_MAX_MESSAGES).all()
+
+    evicted = []
+    if len(recent) == CONTEXT_MAX_MESSAGES:
+        # Unsummarized messages older than the scan window (a long chat's first call)
+        # are folded too, or advancing summary_through_id would skip them for good
+        evicted = (query.filter(Message.id < recent[-1].id)
+                   .with_entities(Message.id, Message.sender, Message.text)
+                   .order_by(Message.id).all())
+
+    turns, used = [], 0
+    for index, message in enumerate(recent):
+        cost = estimate_tokens(message.text)
+        if used + cost > budget:
+            evicted.extend(recent[index:][::-1])
+            break
+        turns.append(message)
+        used += cost
+
+    if evicted:
+        chat.summary = fold_into_summary(chat.summary, evicted)
+        chat.summary_through_id = evicted[-1].id
+
+    return ConversationContext(chat.summary, [(m.sender, m.text) for m in reversed(turns)])
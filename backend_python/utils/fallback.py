@@ -0,0 +1,259 @@
+"""
+Fallback orchestrator for AI backends
+Runs an ordered chain of backends under a total deadline with per-backend
+timeouts and optional hedging, and reports which backend won and how long
+each one took.
+
+Priority is preserved when hedging: a secondary backend is launched early if
+the one ahead of it hasn't answered within the hedge delay, but its answer
+only wins once every higher-priority backend has failed or timed out (or the
+overall deadline is reached). Losing backends are cancelled if they haven't
+started yet and abandoned otherwise; their results are discarded.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.metrics import AI_BACKEND
+
+
+class Backend:
+    """One step in the fallback chain"""
+
+    def __init__(self, name, fn, timeout=None, local=False, enabled=None, breaker=None, miss_is_failure=False,
+                 uses_context=False):
+        """
+        Args:
+            name: Backend name used in reports
+            fn: Callable(user_input, image_data) returning text, or None/'' on a miss
+            timeout: Seconds before the backend is abandoned (None = only the deadline applies)
+            local: Run inline instead of on the worker pool (cheap in-process lookups)
+            enabled: Optional callable; the backend is skipped when it returns False
+            breaker: Optional CircuitBreaker; the backend is skipped while it is open
+            miss_is_failure: Count an empty result as a failure for the breaker
+                             (for backends that swallow their own errors)
+            uses_context: Also pass the conversation context as a third argument
+        """
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+        self.local = local
+        self.enabled = enabled
+        self.breaker = breaker
+        self.miss_is_failure = miss_is_failure
+        self.uses_context = uses_context
+
+    def is_enabled(self):
+        return self.enabled is None or bool(self.enabled())
+
+
+class Attempt:
+    """Outcome of one backend in a single run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = 'not_started'  # ok | miss | error | timeout | cancelled | skipped | circuit_open
+        self.started_at = None
+        self.elapsed_ms = None
+        self.error = None
+
+    def finish(self, status, error=None):
+        self.status = status
+        if self.started_at is not None:
+            self.elapsed_ms = (time.perf_counter() - self.started_at) * 1000
+            AI_BACKEND.observe(self.elapsed_ms / 1000, backend=self.name, status=status)
+        if error is not None:
+            self.error = str(error)
+
+    def to_dict(self):
+        data = {'backend': self.name, 'status': self.status, 'elapsed_ms': self.elapsed_ms}
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class FallbackResult:
+    """Text of the winning answer plus a per-backend timing report"""
+
+    def __init__(self, text, winner, attempts=None, elapsed_ms=0.0):
+        self.text = text
+        self.winner = winner
+        self.attempts = attempts or []
+        self.elapsed_ms = elapsed_ms
+
+    def timings(self):
+        """{backend: elapsed_ms} for every backend that ran"""
+        return {a.name: round(a.elapsed_ms, 2) for a in self.attempts if a.elapsed_ms is not None}
+
+    def server_timing_header(self):
+        """Format the timings as a Server-Timing header value"""
+        return ', '.join(f"{name};dur={ms}" for name, ms in self.timings().items())
+
+    def response_headers(self):
+        """Headers exposing the winning backend and per-backend timings to clients"""
+        headers = {'X-AI-Backend': self.winner}
+        if self.timings():
+            headers['Server-Timing'] = self.server_timing_header()
+        return headers
+
+    def to_dict(self):
+        return {
+            'winner': self.winner,
+            'elapsed_ms': round(self.elapsed_ms, 2),
+            'attempts': [a.to_dict() for a in self.attempts],
+        }
+
+
+class FallbackOrchestrator:
+    """Runs a prioritized backend chain with deadlines and hedging"""
+
+    def __init__(self, backends, final_backend, deadline, hedge_delay=None, executor=None):
+        """
+        Args:
+            backends: Ordered list of Backend, highest priority first
+            final_backend: Backend that always answers (used when everything else misses)
+            deadline: Total seconds allowed before falling back to final_backend
+            hedge_delay: Seconds to wait on a backend before also launching the next one
+                         (None disables hedging: backends run strictly in sequence)
+            executor: ThreadPoolExecutor for remote backends
+        """
+        self.backends = backends
+        self.final_backend = final_backend
+        self.deadline = deadline
+        self.hedge_delay = hedge_delay
+        self.executor = executor or ThreadPoolExecutor(max_workers=16, thread_name_prefix='ai-fallback')
+
+    def run(self, user_input, image_data=None, context=None):
+        start = time.perf_counter()
+        deadline_at = start + self.deadline
+        attempts = [Attempt(b.name) for b in self.backends]
+        answers = {}      # index -> text
+        running = {}      # future -> index
+        next_index = 0
+        last_launch = start
+
+        def launch(index):
+            """Start a backend; returns True if it is now running on the pool"""
+            backend, attempt = self.backends[index], attempts[index]
+            if not backend.is_enabled():
+                attempt.status = 'skipped'
+                return False
+            if backend.breaker is not None and not backend.breaker.allow_request():
+                attempt.status = 'circuit_open'
+                return False
+            attempt.started_at = time.perf_counter()
+            args = (user_input, image_data, context) if backend.uses_context else (user_input, image_data)
+            if backend.local:
+                self._collect(backend, attempt, index, answers, lambda: backend.fn(*args))
+                return False
+            running[self.executor.submit(backend.fn, *args)] = index
+            return True
+
+        def winner_index():
+            """Best answer that no still-running higher-priority backend could beat"""
+            for index in sorted(answers):
+                if all(i > index for i in running.values()):
+                    return index
+            return None
+
+        while True:
+            # Launch the next backend when nothing is running (sequential fallback)
+            # or when the hedge delay on the running ones has passed
+            while next_index < len(self.backends) and (not answers or min(answers) > next_index):
+                now = time.perf_counter()
+                hedge_due = self.hedge_delay is not None and now - last_launch >= self.hedge_delay
+                if running and not hedge_due:
+                    break
+                if launch(next_index):
+                    last_launch = time.perf_counter()
+                next_index += 1
+
+            index = winner_index()
+            if index is not None:
+                break
+            if not running:
+                break
+
+            now = time.perf_counter()
+            if now >= deadline_at:
+                break
+
+            # Sleep until something finishes, a backend times out, the hedge fires or the deadline passes
+            wake_at = deadline_at
+            for future, i in running.items():
+                timeout = self.backends[i].timeout
+                if timeout is not None:
+                    wake_at = min(wake_at, attempts[i].started_at + timeout)
+            if self.hedge_delay is not None and next_index < len(self.backends):
+                wake_at = min(wake_at, last_launch + self.hedge_delay)
+
+            done, _ = wait(list(running), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                self._collect(self.backends[i], attempts[i], i, answers, future.result)
+
+            now = time.perf_counter()
+            for future, i in list(running.items()):
+                timeout = self.backends[i].timeout
+                if timeout is not None and now - attempts[i].started_at >= timeout:
+                    running.pop(future)
+                    future.cancel()
+                    attempts[i].finish('timeout')
+                    if self.backends[i].breaker is not None:
+                        self.backends[i].breaker.record_failure('timeout')
+
+        # Cancel or abandon the losers
+        for future, i in running.items():
+            future.cancel()
+            attempts[i].finish('cancelled' if time.perf_counter() < deadline_at else 'timeout')
+            if self.backends[i].breaker is not None:
+                self.backends[i].breaker.release()
+
+        index = min(answers) if answers else None
+        if index is not None:
+            text, winner = answers[index], self.backends[index].name
+        else:
+            final = Attempt(self.final_backend.name)
+            final.started_at = time.perf_counter()
+            text = self.final_backend.fn(user_input, image_data)
+            final.finish('ok')
+            attempts.append(final)
+            winner = self.final_backend.name
+
+        return FallbackResult(text, winner, attempts, (time.perf_counter() - start) * 1000)
+
+    @staticmethod
+    def _collect(backend, attempt, index, answers, get_result):
+        breaker = backend.breaker
+        try:
+            text = get_result()
+        except Exception as e:
+            attempt.finish('error', e)
+            if breaker is not None:
+                breaker.record_failure(e)
+            return
+        if text:
+            answers[index] = text
+            attempt.finish('ok')
+            if breaker is not None:
+                breaker.record_success()
+        else:
+            attempt.finish('miss')
+            if breaker is not None:
+                if backend.miss_is_failure:
+                    breaker.record_failure('empty response')
+                else:
+                    breaker.release()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_fallback_executor(max_workers):
+    """Shared worker pool for remote backends, created on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-fallback')
+    return _executor
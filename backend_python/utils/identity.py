@@ -0,0 +1,132 @@
+"""
+Request-scoped identity and chat-ownership checks for JWT-protected routes
+
+The JWT user loader turns the token's identity into a CurrentUser without a
+query; its User row is loaded only if a route asks for it, once per request.
+Chat ownership checks go through a small per-worker TTL cache of
+(user_id, chat_id) pairs, so polling a chat doesn't repeat the same ownership
+query. Chats never change owner, so the only stale case is a chat deleted in
+another worker: callers should still filter message queries by user_id, which
+keeps a stale entry from exposing anything (it yields an empty result until
+the entry expires). Deleting a chat drops its entry in the current worker.
+
+Configuration (environment):
+    CHAT_OWNERSHIP_TTL=60            seconds a confirmed ownership is trusted (0 disables)
+    CHAT_OWNERSHIP_MAX_ENTRIES=10000
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask_jwt_extended import current_user
+from flask_jwt_extended.config import config
+from database import db
+
+CHAT_OWNERSHIP_TTL = float(os.getenv('CHAT_OWNERSHIP_TTL', '60'))
+CHAT_OWNERSHIP_MAX_ENTRIES = int(os.getenv('CHAT_OWNERSHIP_MAX_ENTRIES', '10000'))
+
+
+class CurrentUser:
+    """Identity from a verified JWT; the User row is loaded on first access"""
+
+    __slots__ = ('id', '_user')
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self._user = None
+
+    @property
+    def user(self):
+        """The User row, or None if the account no longer exists"""
+        if self._user is None:
+            from models import User
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+
+class OwnershipCache:
+    """LRU of (user_id, chat_id) pairs confirmed by a query, each trusted for `ttl` seconds"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contains(self, user_id, chat_id):
+        key = (user_id, chat_id)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+            if expires_at is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False
+
+    def add(self, user_id, chat_id):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, chat_id)] = time.monotonic() + self.ttl
+            self._entries.move_to_end((user_id, chat_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id, chat_id):
+        with self._lock:
+            self._entries.pop((user_id, chat_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_ownership = OwnershipCache(CHAT_OWNERSHIP_TTL, CHAT_OWNERSHIP_MAX_ENTRIES)
+
+
+def get_ownership_cache():
+    return _ownership
+
+
+def init_identity(jwt):
+    """Register the user loader on the app's JWTManager"""
+
+    @jwt.user_lookup_loader
+    def load_current_user(jwt_header, jwt_data):
+        return CurrentUser(int(jwt_data[config.identity_claim_key]))
+
+
+def get_owned_chat(chat_id):
+    """The current user's ChatHistory row, or None; a hit also primes the ownership cache"""
+    from models import ChatHistory
+
+    chat = ChatHistory.query.filter_by(id=chat_id, user_id=current_user.id).first()
+    if chat is not None:
+        _ownership.add(current_user.id, chat_id)
+    return chat
+
+
+def owns_chat(chat_id):
+    """Whether the current user owns the chat, answered from the cache when possible"""
+    from models import ChatHistory
+
+    user_id = current_user.id
+    if _ownership.contains(user_id, chat_id):
+        return True
+    owned = db.session.query(ChatHistory.id).filter_by(id=chat_id, user_id=user_id).first() is not None
+    if owned:
+        _ownership.add(user_id, chat_id)
+    return owned
+
+
+def forget_chat(chat_id):
+    """Drop a deleted chat from this worker's ownership cache"""
+    _ownership.discard(current_user.id, chat_id)
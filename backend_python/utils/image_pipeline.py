@@ -0,0 +1,252 @@
+"""
+Image preparation for model calls
+Decodes an upload once from its raw bytes, caps its resolution (JPEG files are
+downscaled during decoding via draft()), applies the EXIF orientation, drops
+all metadata and re-encodes it compactly (JPEG, or WebP when there is
+transparency). Results are cached by the SHA-256 of the original bytes, so the
+same image is only processed once per process.
+
+Uploads are validated before any pixels are decoded: check_image() rejects
+payloads over IMAGE_MAX_BYTES and images whose header declares more than
+IMAGE_MAX_PIXELS.
+
+Configuration (environment):
+    IMAGE_MAX_BYTES=10485760            largest accepted image upload
+    IMAGE_MAX_PIXELS=40000000           largest accepted width x height
+    IMAGE_MAX_SIDE=1536                 longest side sent to the model, in pixels
+    IMAGE_JPEG_QUALITY=85
+    IMAGE_CACHE_MAX_BYTES=33554432      processed images kept in memory (0 disables)
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from utils.blob_store import decode_image_data, InvalidImageData
+from utils.metrics import IMAGE_DECODE
+
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', '40000000'))
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', '1536'))
+IMAGE_JPEG_QUALITY = int(os.getenv('IMAGE_JPEG_QUALITY', '85'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an upload exceeds IMAGE_MAX_BYTES or IMAGE_MAX_PIXELS (HTTP 413)"""
+
+
+class PreparedImage:
+    """A processed image ready to send to the model"""
+
+    def __init__(self, data, mime_type, size, digest):
+        self.data = data
+        self.mime_type = mime_type
+        self.size = size        # (width, height) after resizing
+        self.digest = digest    # SHA-256 of the original upload
+
+    def to_part(self):
+        """Inline blob part for Gemini; the SDK sends the bytes as-is instead of re-encoding a PIL image"""
+        return {'mime_type': self.mime_type, 'data': self.data}
+
+
+class _PreparedImageCache:
+    """Small LRU of PreparedImage objects, bounded by total bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._items.get(key)
+            if image is not None:
+                self._items.move_to_end(key)
+            return image
+
+    def set(self, key, image):
+        if len(image.data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.data)
+            self._items[key] = image
+            self._bytes += len(image.data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted.data)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+_cache = _PreparedImageCache(IMAGE_CACHE_MAX_BYTES)
+
+
+def _stream_size(stream):
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def hash_stream(stream, chunk_size=1024 * 1024):
+    """SHA-256 of a file-like object, read in chunks and rewound"""
+    h = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def _open_image(source):
+    """PIL image with only its header parsed"""
+    from PIL import Image, UnidentifiedImageError
+    try:
+        return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise InvalidImageData(f'Unreadable image: {e}')
+
+
+def _check_pixels(image):
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f'Image is {width}x{height}; the limit is {IMAGE_MAX_PIXELS} pixels')
+
+
+def check_encoded_size(image_data):
+    """Reject a base64 string / data URL whose decoded size would exceed IMAGE_MAX_BYTES, without decoding it"""
+    if isinstance(image_data, str) and len(image_data) * 3 // 4 > IMAGE_MAX_BYTES + 3:
+        raise ImageTooLarge(f'Image is larger than {IMAGE_MAX_BYTES} bytes')
+
+
+def check_image(source):
+    """
+    Validate an upload from its size and header only (no pixel decoding)
+
+    Args:
+        source: Raw bytes or a seekable file-like object (rewound afterwards)
+
+    Returns:
+        (format, (width, height))
+
+    Raises:
+        ImageTooLarge: over IMAGE_MAX_BYTES or IMAGE_MAX_PIXELS
+        InvalidImageData: not a readable image
+    """
+    size = len(source) if isinstance(source, bytes) else _stream_size(source)
+    if size > IMAGE_MAX_BYTES:
+        raise ImageTooLarge(f'Image is larger than {IMAGE_MAX_BYTES} bytes')
+    try:
+        image = _open_image(source)
+        _check_pixels(image)
+        return image.format, image.size
+    finally:
+        if not isinstance(source, bytes):
+            source.seek(0)
+
+
+def decode_upload(image_data):
+    """Size-check, decode and header-check a base64 / data URL image; returns the raw bytes"""
+    check_encoded_size(image_data)
+    raw = decode_image_data(image_data)
+    check_image(raw)
+    return raw
+
+
+def _webp_supported():
+    from PIL import features
+    return features.check('webp')
+
+
+def process_image(source, max_side=None, quality=None):
+    """
+    Downscale and re-encode an image
+
+    Args:
+        source: Raw bytes or a file-like object
+
+    Returns:
+        (data, mime_type, (width, height))
+
+    Raises:
+        InvalidImageData: if PIL can't read the image
+        ImageTooLarge: if the header declares more than IMAGE_MAX_PIXELS
+    """
+    with IMAGE_DECODE.time():
+        return _process_image(source, max_side or IMAGE_MAX_SIDE, quality or IMAGE_JPEG_QUALITY)
+
+
+def _process_image(source, max_side, quality):
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    image = _open_image(source)
+    _check_pixels(image)
+    try:
+        # JPEG only: let the decoder scale by 1/2..1/8 so full-size pixels are never
+        # materialized. draft() keeps the result at least as large as the box it is
+        # given, so pass the aspect-correct target rather than a square
+        width, height = image.size
+        scale = min(1.0, max_side / max(width, height))
+        image.draft('RGB', (max(1, int(width * scale)), max(1, int(height * scale))))
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        # Rotate after shrinking; exif_transpose copies the image
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise InvalidImageData(f'Unreadable image: {e}')
+
+    out = io.BytesIO()
+    # Saving without exif/info drops all metadata
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        if _webp_supported():
+            image.convert('RGBA').save(out, format='WEBP', quality=quality, method=2)
+            mime_type = 'image/webp'
+        else:
+            image.save(out, format='PNG', compress_level=3)
+            mime_type = 'image/png'
+    else:
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(out, format='JPEG', quality=quality, optimize=True)
+        mime_type = 'image/jpeg'
+    return out.getvalue(), mime_type, image.size
+
+
+def prepare_image(image_data, digest=None):
+    """
+    Decode and process an image for the model, using the cache when possible
+
+    Args:
+        image_data: Raw bytes, a base64 string / data URL, a seekable file-like
+                    object (e.g. a spooled upload, read in chunks) or a PreparedImage
+        digest: SHA-256 of the raw bytes, if the caller already computed it
+
+    Raises:
+        InvalidImageData: if the payload isn't a readable image
+        ImageTooLarge: if the header declares more than IMAGE_MAX_PIXELS
+    """
+    if isinstance(image_data, PreparedImage):
+        return image_data
+    if hasattr(image_data, 'read'):
+        source = image_data
+        digest = digest or hash_stream(source)
+    else:
+        source = decode_image_data(image_data)
+        digest = digest or hashlib.sha256(source).hexdigest()
+    key = f'{digest}:{IMAGE_MAX_SIDE}:{IMAGE_JPEG_QUALITY}'
+
+    prepared = _cache.get(key)
+    if prepared is None:
+        data, mime_type, size = process_image(source)
+        prepared = PreparedImage(data, mime_type, size, digest)
+        _cache.set(key, prepared)
+    return prepared
@@ -0,0 +1,94 @@
+"""
+Precompiled keyword/phrase matcher for the knowledge base and canned replies
+
+Phrases are tokenized once and indexed by their first token, so matching an
+input costs O(input tokens) hash lookups regardless of how many phrases are
+loaded, and only whole words match ("hi" no longer matches "this", "api" no
+longer matches "rapid").
+"""
+import json
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens; punctuation other than + and # separates words"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class PhraseMatcher:
+    """Whole-word matcher over a prioritized set of phrases"""
+
+    def __init__(self, phrases=(), match_plurals=True):
+        """
+        Args:
+            phrases: Iterable of phrase strings or (phrase, value) pairs;
+                     earlier phrases win when several match
+            match_plurals: Also match a simple plural of a one-word phrase ("apis" -> "api")
+        """
+        self.match_plurals = match_plurals
+        self._index = {}  # first token -> [(tokens, priority, phrase, value)]
+        self._count = 0
+        for item in phrases:
+            phrase, value = item if isinstance(item, tuple) else (item, item)
+            self.add(phrase, value)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, phrase, value=None):
+        """Add a phrase with lower priority than every phrase added before it"""
+        tokens = tuple(tokenize(phrase))
+        if not tokens:
+            return
+        entry = (tokens, self._count, phrase, phrase if value is None else value)
+        self._index.setdefault(tokens[0], []).append(entry)
+        self._count += 1
+
+    def find(self, text):
+        """
+        Return (phrase, value) for the highest-priority phrase in text, or None
+        """
+        index = self._index
+        tokens = tokenize(text)
+        best = None
+        for i, token in enumerate(tokens):
+            entries = index.get(token)
+            if self.match_plurals and len(token) > 3 and token[-1] == 's' and token[:-1] in index:
+                # A plural only stands in for single-word phrases
+                entries = (entries or []) + [e for e in index[token[:-1]] if len(e[0]) == 1]
+            if not entries:
+                continue
+            for phrase_tokens, priority, phrase, value in entries:
+                if best is not None and priority >= best[0]:
+                    continue
+                n = len(phrase_tokens)
+                if n == 1 or tuple(tokens[i + 1:i + n]) == phrase_tokens[1:]:
+                    best = (priority, phrase, value)
+        return (best[1], best[2]) if best else None
+
+    def contains_any(self, text):
+        """True if any phrase occurs in text"""
+        return self.find(text) is not None
+
+
+def load_knowledge_file(path):
+    """
+    Load knowledge base entries from a JSON file, either
+        {"keyword": "answer", ...}
+    or
+        [{"keywords": ["k1", "k2"], "content": "answer"}, ...]
+
+    Returns:
+        List of (keyword, content) pairs in file order
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return list(data.items())
+    entries = []
+    for item in data:
+        for keyword in item.get('keywords', []):
+            entries.append((keyword, item['content']))
+    return entries
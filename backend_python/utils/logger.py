@@ -0,0 +1,146 @@
+"""
+Structured, leveled logging that keeps log I/O off the request thread
+
+Loggers from get_logger() live under the `chatbot` namespace. Records are
+handed to a bounded in-memory queue; a single listener thread formats them and
+writes to stderr. Formatting is lazy: use %-style arguments
+(`log.debug("got %s", value)`) so nothing is formatted for disabled levels,
+and record arguments are only rendered on the listener thread. If the queue is
+full the record is dropped rather than blocking the request.
+
+Configuration (environment):
+    LOG_LEVEL=INFO                DEBUG | INFO | WARNING | ERROR
+    LOG_FORMAT=text               text | json (one JSON object per line)
+    LOG_DEBUG_SAMPLE_RATE=1.0     fraction of DEBUG records kept (e.g. 0.01)
+    LOG_QUEUE_SIZE=10000          records buffered before new ones are dropped
+    LOG_ASYNC=true                false writes synchronously (useful in scripts)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+ROOT_LOGGER = 'chatbot'
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+
+def get_logger(name):
+    """Logger under the chatbot namespace, e.g. get_logger('ai_service')"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with ts, level, logger, msg and any `extra` fields"""
+
+    def format(self, record):
+        data = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Keep only a fraction of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never formats or blocks on the calling thread"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record needn't be made picklable;
+        # formatting (including getMessage()) happens on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level=None, fmt=None, sample_rate=None, use_queue=None, stream=None):
+    """
+    Set up the chatbot logger; safe to call again to reconfigure
+
+    Arguments override the corresponding environment variables.
+    """
+    global _listener, _queue_handler
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.getenv('LOG_FORMAT', 'text')
+    sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0') if sample_rate is None else sample_rate)
+    if use_queue is None:
+        use_queue = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    with _lock:
+        shutdown_logging()
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.handlers.clear()
+        logger.setLevel(level)
+        logger.propagate = False
+
+        if use_queue:
+            _queue_handler = NonBlockingQueueHandler(queue.Queue(int(os.getenv('LOG_QUEUE_SIZE', '10000'))))
+            _queue_handler.addFilter(DebugSampler(sample_rate))
+            _listener = logging.handlers.QueueListener(_queue_handler.queue, output)
+            _listener.start()
+            logger.addHandler(_queue_handler)
+        else:
+            output.addFilter(DebugSampler(sample_rate))
+            logger.addHandler(output)
+    return logger
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
+
+
+def get_logging_stats():
+    """Queue depth and dropped-record count, for /health"""
+    if _queue_handler is None:
+        return {'async': False}
+    return {'async': True, 'queued': _queue_handler.queue.qsize(), 'dropped': _queue_handler.dropped}
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,156 @@
+"""
+Append-only login history (the login_events table)
+
+Logins are buffered per worker and written by a background thread in one
+multi-row INSERT per batch, so a login never does a read-modify-write of the
+user row and concurrent logins can't overwrite each other's history. Events
+older than the retention window are pruned by `flask prune-login-events`
+(run it from cron), in small chunks so it never holds the write lock for long.
+
+Configuration (environment):
+    LOGIN_EVENTS_BATCH_SIZE=100         flush as soon as this many events are buffered
+    LOGIN_EVENTS_FLUSH_INTERVAL=1.0     seconds between background flushes (0 writes inline)
+    LOGIN_EVENTS_RETENTION_DAYS=90
+"""
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+from database import db
+from utils.logger import get_logger
+
+log = get_logger('login_events')
+
+LOGIN_EVENTS_BATCH_SIZE = int(os.getenv('LOGIN_EVENTS_BATCH_SIZE', '100'))
+LOGIN_EVENTS_FLUSH_INTERVAL = float(os.getenv('LOGIN_EVENTS_FLUSH_INTERVAL', '1.0'))
+LOGIN_EVENTS_RETENTION_DAYS = int(os.getenv('LOGIN_EVENTS_RETENTION_DAYS', '90'))
+PRUNE_CHUNK_SIZE = 5000
+
+
+class LoginEventWriter:
+    """Buffers login events and inserts them in batches from a daemon thread"""
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    def init_app(self, app):
+        self._app = app
+
+    def record(self, user_id, provider, user_agent=None, timestamp=None):
+        event = {
+            'user_id': user_id,
+            'provider': provider,
+            'user_agent': (user_agent or '')[:500],
+            'timestamp': timestamp or datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(event)
+            pending = len(self._buffer)
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows inserted"""
+        from models import LoginEvent
+
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events:
+                return 0
+            try:
+                with self._app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(LoginEvent.__table__.insert(), events)
+            except Exception as e:
+                self.dropped += len(events)
+                log.error("Dropped %d login events: %s", len(events), e)
+                return 0
+            self.written += len(events)
+            return len(events)
+
+    def _ensure_thread(self):
+        # The flush thread doesn't survive fork; each worker starts its own
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name='login-events', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self):
+        return {'pending': len(self._buffer), 'written': self.written, 'dropped': self.dropped}
+
+
+_writer = LoginEventWriter(LOGIN_EVENTS_BATCH_SIZE, LOGIN_EVENTS_FLUSH_INTERVAL)
+
+
+@atexit.register
+def _flush_at_exit():
+    if _writer._app is not None:
+        _writer.flush()
+
+
+def get_login_event_writer():
+    return _writer
+
+
+def record_login(user_id, provider, user_agent=None):
+    """Queue a login event; it is written with the next batch"""
+    _writer.record(user_id, provider, user_agent)
+
+
+def prune_login_events(days=LOGIN_EVENTS_RETENTION_DAYS, chunk_size=PRUNE_CHUNK_SIZE):
+    """
+    Delete events older than `days`, a chunk per transaction
+    Must be called inside an application context
+
+    Returns:
+        Number of rows deleted
+    """
+    from models import LoginEvent
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    table = LoginEvent.__table__
+    deleted = 0
+    while True:
+        ids = db.select(table.c.id).where(table.c.timestamp < cutoff).limit(chunk_size).scalar_subquery()
+        with db.engine.begin() as conn:
+            count = conn.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+        deleted += count
+        if count < chunk_size:
+            return deleted
+
+
+def init_app(app):
+    """Bind the writer to the app and register the `flask prune-login-events` command"""
+    import click
+
+    _writer.init_app(app)
+
+    @app.cli.command('prune-login-events')
+    @click.option('--days', default=LOGIN_EVENTS_RETENTION_DAYS, show_default=True,
+                  help='Keep events newer than this many days')
+    def prune_command(days):
+        """Delete login events past the retention window"""
+        log.info("Pruned %d login events older than %d days", prune_login_events(days), days)
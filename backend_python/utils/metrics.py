@@ -0,0 +1,210 @@
+"""
+Request timing and per-stage latency metrics in Prometheus text format
+Histograms cover whole requests plus the stages inside them: JWT verification,
+database queries, each AI backend, image decoding and JSON serialization, along
+with request/response payload sizes. GET /metrics renders them for a scraper.
+
+Disabled by default. When off, init_app() installs no hooks and Histogram.observe()
+and .time() return immediately, so the only cost is one flag check per call site.
+
+Metrics are kept per process: with several gunicorn workers each one reports
+its own numbers (scrape workers individually, or run one worker per target).
+
+Configuration (environment):
+    METRICS_ENABLED=false
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import JWTManager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608, 33554432)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+_enabled = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+_NULL_TIMER = nullcontext()
+
+
+def is_enabled():
+    return _enabled
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.labelnames = tuple(labelnames)
+        self._bound_labels = [f'le="{float(b)!r}"' for b in buckets] + ['le="+Inf"']
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds of its block"""
+        if not _enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self._bound_labels, values):
+                cumulative += count
+                bucket_labels = ','.join(labels + [bound])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            suffix = f'{{{",".join(labels)}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {values[-2]!r}')
+            lines.append(f'{self.name}_count{suffix} {values[-1]}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time to produce the response (headers, for streams)',
+                             LATENCY_BUCKETS, ('method', 'endpoint', 'status'))
+REQUEST_SIZE = Histogram('http_request_size_bytes', 'Request body size', SIZE_BUCKETS, ('endpoint',))
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size (streamed responses excluded)',
+                          SIZE_BUCKETS, ('endpoint',))
+JWT_VERIFY = Histogram('jwt_verify_duration_seconds', 'JWT decode and signature verification', LATENCY_BUCKETS)
+DB_QUERY = Histogram('db_query_duration_seconds', 'Single SQL statement execution', LATENCY_BUCKETS)
+DB_QUERIES_PER_REQUEST = Histogram('db_queries_per_request', 'SQL statements executed per request',
+                                   COUNT_BUCKETS, ('endpoint',))
+DB_TIME_PER_REQUEST = Histogram('db_time_per_request_seconds', 'Total SQL time per request',
+                                LATENCY_BUCKETS, ('endpoint',))
+AI_BACKEND = Histogram('ai_backend_duration_seconds', 'AI backend call latency by outcome',
+                       LATENCY_BUCKETS, ('backend', 'status'))
+IMAGE_DECODE = Histogram('image_decode_duration_seconds', 'Image decode, downscale and re-encode', LATENCY_BUCKETS)
+JSON_SERIALIZE = Histogram('json_serialize_duration_seconds', 'JSON response serialization', LATENCY_BUCKETS)
+
+HISTOGRAMS = [REQUEST_DURATION, REQUEST_SIZE, RESPONSE_SIZE, JWT_VERIFY, DB_QUERY, DB_QUERIES_PER_REQUEST,
+              DB_TIME_PER_REQUEST, AI_BACKEND, IMAGE_DECODE, JSON_SERIALIZE]
+
+
+def render_metrics():
+    """All histograms in Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+class TimedJWTManager(JWTManager):
+    """JWTManager that records how long decoding and verifying each token takes"""
+
+    def _decode_jwt_from_config(self, *args, **kwargs):
+        with JWT_VERIFY.time():
+            return super()._decode_jwt_from_config(*args, **kwargs)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that records serialization time"""
+
+    def dumps(self, obj, **kwargs):
+        with JSON_SERIALIZE.time():
+            return super().dumps(obj, **kwargs)
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _before_request():
+    if _enabled:
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_query_time = 0.0
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    endpoint = _endpoint()
+    REQUEST_DURATION.observe(time.perf_counter() - start, method=request.method, endpoint=endpoint,
+                             status=response.status_code)
+    REQUEST_SIZE.observe(request.content_length or 0, endpoint=endpoint)
+    if not response.is_streamed:
+        RESPONSE_SIZE.observe(response.calculate_content_length() or 0, endpoint=endpoint)
+    DB_QUERIES_PER_REQUEST.observe(g.pop('metrics_queries', 0), endpoint=endpoint)
+    DB_TIME_PER_REQUEST.observe(g.pop('metrics_query_time', 0.0), endpoint=endpoint)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _enabled and context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    DB_QUERY.observe(elapsed)
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
+        g.metrics_query_time += elapsed
+
+
+def init_app(app, db):
+    """Install the request, database and JSON hooks; a no-op unless metrics are enabled"""
+    if not _enabled:
+        return
+    from sqlalchemy import event
+
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
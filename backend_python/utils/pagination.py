@@ -0,0 +1,99 @@
+"""
+Keyset (cursor) pagination helpers
+Cursors are opaque base64url strings wrapping the sort key of a row, so each
+page is an index range scan instead of an OFFSET that grows with the page number.
+"""
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor or limit parameter can't be parsed"""
+
+
+def encode_cursor(*values):
+    """Encode sort-key values (datetimes, ints, floats) into an opaque cursor"""
+    parts = [v.isoformat() if isinstance(v, datetime) else str(v) for v in values]
+    return base64.urlsafe_b64encode('|'.join(parts).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """
+    Decode a cursor back into typed sort-key values
+
+    Args:
+        cursor: Cursor string from encode_cursor
+        types: Converter per value (datetime, int, float, str)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        if len(parts) != len(types):
+            raise ValueError('wrong number of fields')
+        return tuple(
+            datetime.fromisoformat(part) if kind is datetime else kind(part)
+            for part, kind in zip(parts, types)
+        )
+    except (ValueError, binascii.Error, UnicodeDecodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ?limit= value, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        return max(1, min(int(value), maximum))
+    except ValueError:
+        raise InvalidCursor('limit must be an integer')
+
+
+def message_cursor(message):
+    return encode_cursor(message.created_at, message.id)
+
+
+def paginate_messages(query, limit=DEFAULT_PAGE_SIZE, before=None, after=None):
+    """
+    Page through a Message query in (created_at, id) order
+
+    With no cursor the most recent page is returned; `before` returns the page
+    just older than a cursor and `after` the page just newer. Items are always
+    returned oldest first.
+
+    Returns:
+        dict with 'messages' (Message objects), 'prev_cursor' (pass as `before`
+        for older messages) and 'next_cursor' (pass as `after` for newer ones);
+        a cursor is None when there is nothing more in that direction
+    """
+    from models import Message
+
+    key = tuple_(Message.created_at, Message.id)
+
+    if after:
+        after_key = decode_cursor(after, datetime, int)
+        rows = (query.filter(key > after_key)
+                .order_by(Message.created_at.asc(), Message.id.asc())
+                .limit(limit + 1).all())
+        has_newer = len(rows) > limit
+        rows = rows[:limit]
+        has_older = True
+    else:
+        if before:
+            before_key = decode_cursor(before, datetime, int)
+            query = query.filter(key < before_key)
+        rows = (query.order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(limit + 1).all())
+        has_older = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_newer = bool(before)
+
+    return {
+        'messages': rows,
+        'prev_cursor': message_cursor(rows[0]) if rows and has_older else None,
+        'next_cursor': message_cursor(rows[-1]) if rows and has_newer else None,
+    }
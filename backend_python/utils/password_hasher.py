@@ -0,0 +1,156 @@
+"""
+Password hashing off the request thread
+
+PBKDF2/scrypt are deliberately slow; hashing inline lets a burst of logins pin
+every worker's CPU and starve chat traffic. Hashes run in a small process pool
+instead (its processes can be niced below the web workers), with a cap on
+queued hashes: past it, register/login fail fast with PasswordHasherBusy (503)
+rather than piling up behind the pool.
+
+The algorithm and cost are configurable. A successful login with a hash made
+under other parameters is re-hashed with the current ones (see needs_rehash).
+
+Configuration (environment):
+    PASSWORD_HASH_METHOD=pbkdf2:sha256:600000   any werkzeug method, e.g. scrypt:32768:8:1
+    PASSWORD_HASH_WORKERS=2         hashing processes per app worker (0 hashes inline)
+    PASSWORD_HASH_MAX_PENDING=32    running + queued hashes before 503
+    PASSWORD_HASH_NICE=10           niceness added to the hashing processes
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils.logger import get_logger
+
+log = get_logger('password_hasher')
+
+# Werkzeug's defaults for the bare method names, so they compare equal to stored hashes
+_DEFAULT_PARAMS = {
+    'pbkdf2': ['sha256', '600000'],
+    'scrypt': ['32768', '8', '1'],
+}
+
+
+def normalize_method(method):
+    """Fill in werkzeug's default parameters: 'pbkdf2' -> 'pbkdf2:sha256:600000'"""
+    name, *params = method.split(':')
+    defaults = _DEFAULT_PARAMS.get(name, [])
+    return ':'.join([name, *params, *defaults[len(params):]])
+
+
+PASSWORD_HASH_METHOD = normalize_method(os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+PASSWORD_HASH_NICE = int(os.getenv('PASSWORD_HASH_NICE', '10'))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING hashes are already running or queued"""
+
+
+def _pool_context():
+    # Forking a threaded web worker copies locks other threads may be holding (logging,
+    # the DB pool) into the child; forkserver children fork from a clean process instead
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _lower_priority(niceness):
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+
+
+class PasswordHasher:
+    """Bounded hashing pool; created lazily so each forked web worker gets its own"""
+
+    def __init__(self, method, workers, max_pending, niceness=0):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.niceness = niceness
+        self.rejected = 0
+        self.pool_restarts = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _executor(self):
+        # A pool inherited through fork belongs to the parent; start a fresh one
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context(),
+                                             initializer=_lower_priority, initargs=(self.niceness,))
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _replace_pool(self, broken):
+        """Swap out a pool whose worker died; concurrent callers share one replacement"""
+        with self._lock:
+            if self._pool is broken:
+                broken.shutdown(wait=False)
+                self._pool = None
+                self.pool_restarts += 1
+            return self._executor()
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy(f'Too many password hashes pending (limit {self.max_pending})')
+            self._pending += 1
+            executor = self._executor() if self.workers > 0 else None
+        try:
+            if executor is None:
+                return fn(*args)
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A hashing process died (e.g. OOM-killed); the pool rejects all work from
+                # then on, so replace it and retry once
+                log.warning("Password hashing pool broke; starting a new one")
+                return self._replace_pool(executor).submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with a different method or cost"""
+        return normalize_method(password_hash.split('$', 1)[0]) != self.method
+
+    def stats(self):
+        return {
+            'method': self.method.split(':', 1)[0],
+            'workers': self.workers,
+            'pending': self._pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'pool_restarts': self.pool_restarts,
+        }
+
+
+_hasher = PasswordHasher(PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING,
+                         PASSWORD_HASH_NICE)
+
+
+def get_password_hasher():
+    return _hasher
+
+
+def hash_password(password):
+    return _hasher.hash(password)
+
+
+def verify_password(password_hash, password):
+    return _hasher.verify(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return _hasher.needs_rehash(password_hash)
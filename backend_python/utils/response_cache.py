@@ -0,0 +1,295 @@
+"""
+Response cache for get_ai_response
+Keyed by normalized prompt, model and image digest, with TTL + LRU eviction
+and a memory cap in bytes.
+
+Backends:
+    memory  - per-process OrderedDict (default)
+    sqlite  - local SQLite file shared between gunicorn workers
+    off     - caching disabled
+
+Configuration (environment):
+    RESPONSE_CACHE_BACKEND=memory|sqlite|off
+    RESPONSE_CACHE_TTL=3600            seconds
+    RESPONSE_CACHE_MAX_BYTES=33554432  total size of cached replies
+    RESPONSE_CACHE_PATH=...            SQLite file (sqlite backend only)
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.image_pipeline import hash_stream
+from utils.logger import get_logger
+
+log = get_logger('response_cache')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_TRAILING_PUNCT_RE = re.compile(r'[\s?!.]+$')
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'instance', 'response_cache.db')
+
+
+def normalize_prompt(text):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    text = _WHITESPACE_RE.sub(' ', text.strip().lower())
+    return _TRAILING_PUNCT_RE.sub('', text)
+
+
+def image_digest(image_data):
+    """SHA-256 of the image payload, or empty string when there is no image"""
+    if not image_data:
+        return ''
+    if hasattr(image_data, 'digest'):
+        return image_data.digest  # PreparedImage: digest of the original upload
+    if hasattr(image_data, 'read'):
+        return hash_stream(image_data)  # Spooled upload the pipeline couldn't process
+    if isinstance(image_data, str):
+        image_data = image_data.encode('utf-8')
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def make_cache_key(prompt, model, image_data=None, context=None):
+    """
+    Build the cache key for a prompt/model/image combination
+    `context` is the conversation context digest, so answers are only shared
+    between requests with the same history
+    """
+    parts = [model, normalize_prompt(prompt), image_digest(image_data)]
+    if context:
+        parts.append(context)
+    raw = '\0'.join(parts)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def cache_allowed(request, data=None):
+    """
+    Per-request opt-out for personal data: {"cache": false} in the JSON body,
+    a `cache=false` form field, or a `Cache-Control: no-store` request header
+    """
+    if 'no-store' in request.headers.get('Cache-Control', ''):
+        return False
+    if isinstance(data, dict) and data.get('cache') is False:
+        return False
+    return request.form.get('cache', '').lower() != 'false'
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with TTL and a byte cap"""
+
+    name = 'memory'
+
+    def __init__(self, ttl, max_bytes):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.time() + self.ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self.evictions}
+
+
+class SQLiteCacheBackend:
+    """LRU + TTL cache in a local SQLite file, shared by every worker on the host"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, ttl, max_bytes):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_last_access ON response_cache (last_access)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + self.ttl, now)
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+            while total > self.max_bytes:
+                oldest = conn.execute(
+                    "SELECT key, size FROM response_cache ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (oldest[0],))
+                total -= oldest[1]
+                self.evictions += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._conn().execute("DELETE FROM response_cache")
+
+    def stats(self):
+        entries, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()
+        return {'entries': entries, 'bytes': total, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    """Front end over a cache backend that tracks hit/miss counters"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # Guards the counters; backends lock their own entries
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            log.warning("Response cache read error: %s", e)
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.backend is None or not value:
+            return
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            log.warning("Response cache write error: %s", e)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Counters for /health (hits/misses are per worker)"""
+        if self.backend is None:
+            return {'backend': 'off'}
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        stats = {
+            'backend': self.backend.name,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
+        try:
+            stats.update(self.backend.stats())
+        except Exception as e:
+            stats['error'] = str(e)
+        return stats
+
+
+def create_cache_from_env():
+    """Build the response cache configured by RESPONSE_CACHE_* environment variables"""
+    kind = os.getenv('RESPONSE_CACHE_BACKEND', 'memory').lower()
+    ttl = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+    max_bytes = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+    if kind == 'sqlite':
+        backend = SQLiteCacheBackend(os.getenv('RESPONSE_CACHE_PATH', DEFAULT_CACHE_PATH), ttl, max_bytes)
+    elif kind == 'memory':
+        backend = MemoryCacheBackend(ttl, max_bytes)
+    else:
+        backend = None
+    return ResponseCache(backend)
+
+
+_response_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache, created on first use"""
+    global _response_cache
+    if _response_cache is None:
+        with _cache_lock:
+            if _response_cache is None:
+                _response_cache = create_cache_from_env()
+    return _response_cache
@@ -0,0 +1,159 @@
+"""
+Full-text search over a user's messages (SQLite FTS5)
+
+messages_fts is an external-content FTS5 index over messages.text and
+messages.user_id (created by migration 006). Triggers on messages keep it in
+sync, so every insert path (ORM, bulk inserts, deletes cascading from a chat)
+is covered. Searches match the user's id column as well as the query terms, so
+FTS5 intersects the two posting lists instead of ranking everyone's matches
+and filtering afterwards.
+
+Results are ranked by bm25 over the text column and keyset-paginated on
+(score, id). Snippets are HTML-escaped with matches wrapped in <mark>.
+
+`flask rebuild-search-index` repopulates the index from the messages table
+(after a restore or a bulk load with the triggers dropped).
+"""
+import html
+import re
+from sqlalchemy import text
+from database import db
+from utils.logger import get_logger
+from utils.pagination import encode_cursor, decode_cursor
+
+log = get_logger('search')
+
+FTS_TABLE = 'messages_fts'
+SNIPPET_TOKENS = 16
+PREFIX_MIN_CHARS = 3
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'  # Replaced by <mark> tags after escaping
+
+# Rank first, then build snippets and join the rows for the page only: SQLite would
+# otherwise compute every match's snippet before sorting
+_SEARCH_SQL = f"""
+    WITH page AS (
+        SELECT rowid AS id, bm25({FTS_TABLE}, 1.0, 0.0) AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH :match {{after}}
+        ORDER BY score, rowid
+        LIMIT :limit
+    )
+    SELECT m.id, m.chat_id, c.title, m.sender, m.created_at, page.score,
+           snippet({FTS_TABLE}, 0, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet
+    FROM page
+    JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = page.id
+    JOIN messages m ON m.id = page.id
+    JOIN chat_histories c ON c.id = m.chat_id
+    WHERE {FTS_TABLE} MATCH :match AND m.user_id = :user_id
+    ORDER BY page.score, page.id
+"""
+
+FTS_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "text, user_id, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, user_id) VALUES ('delete', old.id, old.text, old.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF text, user_id ON messages BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, user_id) VALUES ('delete', old.id, old.text, old.user_id);
+        INSERT INTO {FTS_TABLE} (rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+    END""",
+]
+
+
+class SearchUnavailable(Exception):
+    """Raised when the database has no FTS5 index (not SQLite)"""
+
+
+def is_supported(conn):
+    return conn.dialect.name == 'sqlite'
+
+
+def build_match_query(q, user_id):
+    """
+    Turn free text into an FTS5 query scoped to one user
+
+    Every word must match; the last one also as a prefix (search-as-you-type) if
+    it is at least PREFIX_MIN_CHARS long, since shorter prefixes match much of the
+    vocabulary.
+    Words are quoted, so FTS5 operators and column filters in the input are
+    treated as plain text. Returns None if the input has no searchable words.
+    """
+    terms = _TERM_RE.findall(q.lower())
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= PREFIX_MIN_CHARS:
+        phrases[-1] += '*'
+    return f'user_id : "{int(user_id)}" AND text : ({" ".join(phrases)})'
+
+
+def _render_snippet(snippet):
+    return html.escape(snippet).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def search_messages(user_id, q, limit, after=None):
+    """
+    A page of the user's messages matching `q`, best match first
+
+    Args:
+        after: Cursor from a previous page's next_cursor
+
+    Returns:
+        dict with 'results' (list of dicts) and 'next_cursor' (None on the last page)
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise SearchUnavailable('Message search requires SQLite FTS5')
+    match = build_match_query(q, user_id)
+    if match is None:
+        return {'results': [], 'next_cursor': None}
+
+    params = {'match': match, 'user_id': int(user_id), 'limit': limit + 1}
+    after_sql = ''
+    if after:
+        params['after_score'], params['after_id'] = decode_cursor(after, float, int)
+        after_sql = 'AND (score > :after_score OR (score = :after_score AND rowid > :after_id))'
+    query = text(_SEARCH_SQL.format(after=after_sql)).columns(created_at=db.DateTime)
+    rows = db.session.execute(query, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].score, rows[-1].id)
+    return {
+        'results': [{
+            'message_id': row.id,
+            'chat_id': row.chat_id,
+            'chat_title': row.title,
+            'who': row.sender,
+            'time': row.created_at.isoformat(),
+            'snippet': _render_snippet(row.snippet),
+            'score': round(-row.score, 4),
+        } for row in rows],
+        'next_cursor': next_cursor,
+    }
+
+
+def rebuild_index(conn):
+    """Repopulate messages_fts from the messages table and merge its segments"""
+    conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+    conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def init_app(app):
+    """Register the `flask rebuild-search-index` command"""
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_command():
+        """Rebuild the message search index from the messages table"""
+        with db.engine.begin() as conn:
+            if not is_supported(conn):
+                log.error("Message search requires SQLite FTS5")
+                return
+            rebuild_index(conn)
+            count = conn.execute(text("SELECT COUNT(*) FROM messages")).scalar()
+        log.info("Rebuilt the search index over %d messages", count)
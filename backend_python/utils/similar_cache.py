@@ -0,0 +1,242 @@
+"""
+Near-duplicate prompt cache for get_ai_response
+Serves a stored Gemini reply when a new prompt is a paraphrase of one already
+answered ("what is react?" / "What's React"), with no network or model calls.
+
+Prompts are normalized (case, contractions, punctuation), reduced to their
+content words ("how do I", "what is the" carry no meaning here), cut into
+per-word character trigrams and fingerprinted with MinHash. LSH banding finds candidates sharing
+at least one band of the signature; each candidate's exact trigram Jaccard
+similarity is then checked against the threshold. Prompts whose numbers or
+negations differ never match ("2+2" vs "2+3", "is" vs "is not"), nor do prompts
+whose shared words come in a different order ("celsius to fahrenheit" vs
+"fahrenheit to celsius") or that differ by an opposite-forming prefix
+("install" vs "uninstall", "upload" vs "download"): trigrams alone ignore both.
+Entries are only compared within the same namespace (model, image, conversation
+context).
+
+Opt-in per route: only endpoints listed in SIMILAR_CACHE_ROUTES consult it
+(see similar_cache_allowed), and the per-request cache opt-out still applies.
+
+Configuration (environment):
+    SIMILAR_CACHE_ROUTES=                comma-separated endpoints, e.g. chat.send_message (empty = off)
+    SIMILAR_CACHE_THRESHOLD=0.7          trigram Jaccard similarity needed for a hit
+    SIMILAR_CACHE_MAX_ENTRIES=5000
+    SIMILAR_CACHE_MAX_BYTES=16777216     total size of cached replies
+    SIMILAR_CACHE_TTL=3600               seconds
+"""
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from utils.response_cache import cache_allowed
+
+SIMILAR_CACHE_ROUTES = {r.strip() for r in os.getenv('SIMILAR_CACHE_ROUTES', '').split(',') if r.strip()}
+SIMILAR_CACHE_THRESHOLD = float(os.getenv('SIMILAR_CACHE_THRESHOLD', '0.7'))
+SIMILAR_CACHE_MAX_ENTRIES = int(os.getenv('SIMILAR_CACHE_MAX_ENTRIES', '5000'))
+SIMILAR_CACHE_MAX_BYTES = int(os.getenv('SIMILAR_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+SIMILAR_CACHE_TTL = float(os.getenv('SIMILAR_CACHE_TTL', '3600'))
+
+# Small signatures keep fingerprinting well under a millisecond in pure Python. With
+# 8 bands of 2 rows, pairs at 0.6 Jaccard share a band ~97% of the time; the exact
+# check below filters the extra candidates that loose banding lets through.
+NUM_PERM = 16
+BANDS = 8
+_MASK64 = (1 << 64) - 1
+
+_CONTRACTIONS = [
+    (re.compile(r"\bwhat's\b"), 'what is'), (re.compile(r"\bit's\b"), 'it is'),
+    (re.compile(r"\bthat's\b"), 'that is'), (re.compile(r"\bcan't\b"), 'can not'),
+    (re.compile(r"\bwon't\b"), 'will not'), (re.compile(r"n't\b"), ' not'),
+    (re.compile(r"'re\b"), ' are'), (re.compile(r"'m\b"), ' am'), (re.compile(r"'ll\b"), ' will'),
+    (re.compile(r"'ve\b"), ' have'), (re.compile(r"'d\b"), ' would'), (re.compile(r"'s\b"), ''),
+]
+_NON_WORD_RE = re.compile(r'[^\w+\-*/=]+')
+_OPERATOR_RE = re.compile(r'\s*([+\-*/=])\s*')
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+_NEGATIONS = frozenset(['not', 'no', 'never', 'without'])
+_STOP_WORDS = frozenset(
+    'a an the is are was be do does did i you me my we it this that to of in on for can could would '
+    'should will how what whats please tell explain so just about like'.split()
+)
+# Prefixes that turn a word into its opposite, or into a word opposite to another prefix
+_OPPOSITE_PREFIXES = ('un', 'dis', 'de', 'non', 'anti', 'mis', 'en', 'in', 'im', 'ex', 'up', 'down')
+
+# XOR masks act as the MinHash permutations of the 64-bit shingle hashes. Shingles
+# are hashed with the built-in (per-process salted) str hash: the cache lives in one
+# process, so signatures only need to agree within it
+_MASKS = [random.Random(f'similar-cache-{i}').getrandbits(64) for i in range(NUM_PERM)]
+
+
+def normalize_for_similarity(text):
+    """Lowercase, expand contractions, and reduce punctuation to single spaces"""
+    text = text.lower().replace('’', "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    text = ' '.join(_NON_WORD_RE.sub(' ', text).split())
+    return _OPERATOR_RE.sub(r'\1', text)  # '2 + 2' -> '2+2'
+
+
+def _content_words(normalized):
+    """Words other than stop words, in order (all words if every one is a stop word)"""
+    words = normalized.split()
+    return [w for w in words if w not in _STOP_WORDS] or words
+
+
+def _shingles(words):
+    """Character trigrams of each word"""
+    shingles = set()
+    for word in words:
+        padded = f' {word} '
+        shingles.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return shingles or {''}
+
+
+def _stems(word):
+    """The word and what is left of it after one opposite-forming prefix ("uninstall" -> "install")"""
+    return {word} | {word[len(p):] for p in _OPPOSITE_PREFIXES if word.startswith(p) and len(word) - len(p) >= 4}
+
+
+def _words_conflict(words, other):
+    """
+    Whether two prompts' content words rule out a match, whatever their trigrams say:
+    shared words in a different order, or a word only one prompt has whose stem
+    matches a word only the other has ("install" / "uninstall", "encrypt" / "decrypt")
+    """
+    shared = set(words) & set(other)
+    if [w for w in words if w in shared] != [w for w in other if w in shared]:
+        return True
+    other_stems = [_stems(w) for w in set(other) - shared]
+    return any(_stems(w) & stems for w in set(words) - shared for stems in other_stems)
+
+
+class Fingerprint:
+    """Trigram hashes, MinHash band keys, content words and the must-match guard of one prompt"""
+
+    __slots__ = ('hashes', 'bands', 'words', 'guard')
+
+    def __init__(self, prompt):
+        normalized = normalize_for_similarity(prompt)
+        self.words = tuple(_content_words(normalized))
+        self.hashes = frozenset(hash(s) & _MASK64 for s in _shingles(self.words))
+        signature = [min(h ^ mask for h in self.hashes) for mask in _MASKS]
+        rows = NUM_PERM // BANDS
+        self.bands = [(band, hash(tuple(signature[band * rows:(band + 1) * rows]))) for band in range(BANDS)]
+        words = normalized.split()
+        self.guard = (tuple(_NUMBER_RE.findall(normalized)), bool(_NEGATIONS.intersection(words)))
+
+    def similarity(self, other):
+        """Jaccard similarity of the two trigram sets (0 when the guards differ or the words conflict)"""
+        if self.guard != other.guard or _words_conflict(self.words, other.words):
+            return 0.0
+        union = len(self.hashes | other.hashes)
+        return len(self.hashes & other.hashes) / union if union else 0.0
+
+
+class SimilarPromptCache:
+    """LRU + TTL cache of replies, looked up by prompt similarity via MinHash LSH"""
+
+    def __init__(self, threshold, max_entries, max_bytes, ttl):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # entry id -> (namespace, fingerprint, reply, expires_at, size)
+        self._buckets = {}  # (namespace, guard, band, band hash) -> set of entry ids
+        self._bytes = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def get(self, prompt, namespace=''):
+        """Stored reply for the most similar prompt at or above the threshold, or None"""
+        fingerprint = Fingerprint(prompt)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for band in fingerprint.bands:
+                candidates.update(self._buckets.get((namespace, fingerprint.guard, *band), ()))
+            best_id, best_score = None, self.threshold
+            for entry_id in candidates:
+                _, other, _, expires_at, _ = self._entries[entry_id]
+                if expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                score = fingerprint.similarity(other)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2]
+
+    def set(self, prompt, reply, namespace=''):
+        size = len(reply.encode('utf-8'))
+        if not reply or size > self.max_bytes:
+            return
+        fingerprint = Fingerprint(prompt)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, fingerprint, reply, time.time() + self.ttl, size)
+            self._bytes += size
+            for band in fingerprint.bands:
+                self._buckets.setdefault((namespace, fingerprint.guard, *band), set()).add(entry_id)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        namespace, fingerprint, _, _, size = self._entries.pop(entry_id)
+        self._bytes -= size
+        for band in fingerprint.bands:
+            key = (namespace, fingerprint.guard, *band)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Counters for /health (per worker)"""
+        lookups = self.hits + self.misses
+        return {
+            'routes': sorted(SIMILAR_CACHE_ROUTES),
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+_similar_cache = SimilarPromptCache(SIMILAR_CACHE_THRESHOLD, SIMILAR_CACHE_MAX_ENTRIES,
+                                    SIMILAR_CACHE_MAX_BYTES, SIMILAR_CACHE_TTL)
+
+
+def get_similar_cache():
+    return _similar_cache
+
+
+def similar_cache_allowed(request, data=None):
+    """Whether this request's endpoint opted in (SIMILAR_CACHE_ROUTES) and the client didn't opt out"""
+    return request.endpoint in SIMILAR_CACHE_ROUTES and cache_allowed(request, data)
+
+
+def make_namespace(model, image_digest='', context_digest=None):
+    """Only prompts asked under the same model, image and conversation context are compared"""
+    return '\0'.join([model, image_digest or '', context_digest or ''])
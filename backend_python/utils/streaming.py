@@ -0,0 +1,44 @@
+"""
+Server-Sent Events helpers for streaming AI responses
+"""
+import json
+from flask import Response, stream_with_context
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Disable proxy buffering (nginx, Render)
+}
+
+
+def wants_stream(request, data=None):
+    """
+    Check whether the client asked for a streamed response
+    via ?stream=1, {"stream": true} in the JSON body, or Accept: text/event-stream
+    """
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    if isinstance(data, dict) and data.get('stream') is True:
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse_event(data, event=None):
+    """Format one SSE event with a JSON payload"""
+    payload = json.dumps(data)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+def sse_response(generator, on_close=None):
+    """
+    Wrap a generator of SSE strings in a streaming Flask response
+
+    Args:
+        on_close: Called when the server closes the response, whether the stream
+                  finished, the client disconnected or it never started
+    """
+    response = Response(stream_with_context(generator), mimetype='text/event-stream', headers=SSE_HEADERS)
+    if on_close is not None:
+        response.call_on_close(on_close)
+    return response
@@ -0,0 +1,27 @@
+"""
+Bounded upload handling
+Multipart files are spooled to a temporary file above UPLOAD_SPOOL_BYTES, and
+non-file form fields (e.g. a base64 image in request.form['image']) are capped
+so an oversized body is rejected with 413 before it is buffered.
+
+Configuration (environment):
+    MAX_CONTENT_LENGTH=16777216   whole request body, checked against Content-Length up front
+    UPLOAD_SPOOL_BYTES=1048576    uploads larger than this go to a temp file instead of memory
+"""
+import os
+from tempfile import SpooledTemporaryFile
+from flask import Request
+from utils.image_pipeline import IMAGE_MAX_BYTES
+
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(1024 * 1024)))
+
+
+class UploadRequest(Request):
+    """Request class with a configurable spool threshold and a cap on in-memory form fields"""
+
+    # Base64 of the largest allowed image, plus room for a data URL prefix
+    max_form_memory_size = IMAGE_MAX_BYTES * 4 // 3 + 64 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode='rb+')
@@ -1,3 +1,3 @@
 #!/bin/bash
 cd /opt/render/project/src
-exec gunicorn wsgi:app --bind 0.0.0.0:$PORT
+exec gunicorn wsgi:app --bind 0.0.0.0:$PORT --config backend_python/gunicorn.conf.py